@@ -0,0 +1,40 @@
+"""Add device tokens
+
+Revision ID: 145e932524a9
+Revises: 48fa8a10e70b
+Create Date: 2026-10-19 09:02:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '145e932524a9'
+down_revision = '48fa8a10e70b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'device_tokens',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('token', sa.String(length=512), nullable=False),
+        sa.Column('provider', sa.String(length=20), nullable=False),
+        sa.Column('platform', sa.String(length=20), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('last_seen_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('token'),
+    )
+    op.create_index('ix_device_tokens_id', 'device_tokens', ['id'])
+    op.create_index('ix_device_tokens_user_id', 'device_tokens', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_device_tokens_user_id', table_name='device_tokens')
+    op.drop_index('ix_device_tokens_id', table_name='device_tokens')
+    op.drop_table('device_tokens')
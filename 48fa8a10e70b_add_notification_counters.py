@@ -0,0 +1,41 @@
+"""Add notification counters
+
+Revision ID: 48fa8a10e70b
+Revises: c5ef31c722b0
+Create Date: 2026-10-19 09:01:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '48fa8a10e70b'
+down_revision = 'c5ef31c722b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'notification_counters',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('unread_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+    # Start from the unread notifications already stored
+    notifications = sa.table('notifications', sa.column('user_id', sa.Integer), sa.column('is_read', sa.Boolean))
+    counters = sa.table('notification_counters', sa.column('user_id', sa.Integer), sa.column('unread_count', sa.Integer))
+    op.execute(counters.insert().from_select(
+        ['user_id', 'unread_count'],
+        sa.select(notifications.c.user_id, sa.func.count())
+        .where(notifications.c.is_read == sa.false())
+        .group_by(notifications.c.user_id),
+    ))
+
+
+def downgrade() -> None:
+    op.drop_table('notification_counters')
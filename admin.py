@@ -0,0 +1,47 @@
+"""
+Admin endpoints for browsing captured request profiles and running
+maintenance jobs
+"""
+
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from app.config import settings
+from app.services import aggregates
+from app.utils import profiling
+
+router = APIRouter()
+
+
+def require_admin_token(x_admin_token: str = Header(None)) -> None:
+    """Allow access only with the configured admin token"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    supplied = (x_admin_token or "").encode()
+    if not hmac.compare_digest(supplied, settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+
+@router.get("/admin/profiles", dependencies=[Depends(require_admin_token)])
+def list_profiles():
+    """List captured request profiles, newest first"""
+    return [profile.summary() for profile in reversed(profiling.profiles)]
+
+
+@router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin_token)])
+def get_profile(profile_id: int):
+    """Get the call tree and SQL statements of one profiled request"""
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return profile.to_dict()
+
+
+@router.post("/admin/analytics/rebuild", status_code=status.HTTP_202_ACCEPTED,
+             dependencies=[Depends(require_admin_token)])
+async def rebuild_analytics():
+    """Recount the product aggregates from products in the background"""
+    if not await aggregates.start_rebuild():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A rebuild is already running")
+    return {"status": "started"}
@@ -0,0 +1,488 @@
+"""
+Product analytics aggregates: maintenance triggers, the daily expiry step
+and the rebuild job
+
+Triggers on products apply each insert, update and delete to
+product_aggregates as a delta, so every write path (API, bulk import,
+scripts) keeps the dashboard current without GROUP BY over products at
+read time. Products whose expiry date passes without any write are moved
+from active to expired once a day by expire_lapsed_products.
+"""
+
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import DDL, Date, bindparam, event, func, or_, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.session import get_async_session
+from app.models.product import Product
+from app.models.product_aggregate import AggregateWatermark, ProductAggregate
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("active_count", "consumed_count", "expired_count", "shelf_life_days", "shelf_life_count")
+
+# Columns whose changes move a product between aggregates
+TRACKED_COLUMNS = ("user_id", "category_id", "shop_name", "purchase_date", "expiration_date", "is_active")
+
+# Each dialect's spelling of the expressions below; {0}/{1} are operands
+_SQL: Dict[str, Dict[str, str]] = {
+    "sqlite": {
+        "today": "date('now')",
+        "watermark": "(SELECT expired_before FROM product_aggregate_watermark WHERE id = 1)",
+        "week": "date({0}, 'weekday 0', '-6 days')",
+        "days": "CAST(julianday({0}) - julianday({1}) AS INTEGER)",
+        "date": "date({0})",
+        # SQLite's two-argument max() is the scalar greatest()
+        "greatest": "max",
+    },
+    "postgresql": {
+        "today": "CAST(timezone('UTC', now()) AS date)",
+        # Read once per trigger call, under a share lock (see _POSTGRES_FUNCTION)
+        "watermark": "watermark",
+        "week": "CAST(CAST(date_trunc('week', {0}) AS date) AS text)",
+        "days": "({0} - {1})",
+        "date": "CAST({0} AS date)",
+        "greatest": "greatest",
+    },
+}
+
+
+def _flag(condition: str) -> str:
+    return f"CASE WHEN {condition} THEN 1 ELSE 0 END"
+
+
+def _change(user_id: str, dimension: str, bucket: str, active="0", consumed="0",
+            expired="0", shelf_life_days="0", shelf_life_count="0") -> str:
+    return (
+        f"SELECT {user_id} AS user_id, '{dimension}' AS dimension, {bucket} AS bucket, "
+        f"{active} AS active_count, {consumed} AS consumed_count, {expired} AS expired_count, "
+        f"{shelf_life_days} AS shelf_life_days, {shelf_life_count} AS shelf_life_count"
+    )
+
+
+# Running totals are floored at zero: undoing a deactivation after moving
+# the product to another category or shop has nothing to undo there
+_RUNNING_TOTALS = ("consumed_count", "expired_count")
+
+
+def _upsert(dialect_name: str, changes: List[str]) -> str:
+    """Add the summed changes to product_aggregates, skipping buckets that net to zero"""
+    greatest = _SQL[dialect_name]["greatest"]
+    updates = [
+        f"{c} = {greatest}(product_aggregates.{c} + excluded.{c}, 0)" if c in _RUNNING_TOTALS
+        else f"{c} = product_aggregates.{c} + excluded.{c}"
+        for c in COUNTERS
+    ]
+    return (
+        f"INSERT INTO product_aggregates (user_id, dimension, bucket, {', '.join(COUNTERS)}) "
+        f"SELECT user_id, dimension, bucket, {', '.join(f'sum({c})' for c in COUNTERS)} "
+        f"FROM ({' UNION ALL '.join(changes)}) AS changes "
+        f"GROUP BY user_id, dimension, bucket "
+        f"HAVING {' OR '.join(f'sum({c}) != 0' for c in COUNTERS)} "
+        f"ON CONFLICT (user_id, dimension, bucket) DO UPDATE SET {', '.join(updates)}"
+    )
+
+
+class _Row:
+    """SQL expressions about one products row (a trigger's old/new, or a table alias)"""
+
+    def __init__(self, dialect_name: str, name: str, watermark: Optional[str] = None):
+        self.sql = _SQL[dialect_name]
+        self.name = name
+        watermark = watermark or self.sql["watermark"]
+        # Active and not yet counted as expired by the daily step
+        self.open = f"({name}.is_active AND {name}.expiration_date >= {watermark})"
+        self.lapsed = f"({name}.is_active AND {name}.expiration_date < {watermark})"
+        self.inactive = f"(NOT {name}.is_active)"
+        self.in_time = f"({name}.expiration_date >= {self.sql['today']})"
+
+    def col(self, column: str) -> str:
+        return f"{self.name}.{column}"
+
+    @property
+    def category(self) -> str:
+        return f"coalesce(CAST({self.name}.category_id AS TEXT), '')"
+
+    @property
+    def shop(self) -> str:
+        return f"coalesce({self.name}.shop_name, '')"
+
+    @property
+    def week(self) -> str:
+        return self.sql["week"].format(self.col("expiration_date"))
+
+    def state(self, sign: str) -> List[str]:
+        """The row's contribution to the active counts and shelf life averages"""
+        active = f"{sign}{_flag(self.open)}"
+        has_shelf_life = f"{self.name}.purchase_date IS NOT NULL"
+        days = self.sql["days"].format(self.col("expiration_date"), self.col("purchase_date"))
+        shelf_life = f"CASE WHEN {has_shelf_life} THEN {days} ELSE 0 END"
+        return [
+            _change(self.col("user_id"), "category", self.category, active=active),
+            _change(self.col("user_id"), "shop", self.shop, active=active,
+                    shelf_life_days=f"{sign}{shelf_life}", shelf_life_count=f"{sign}{_flag(has_shelf_life)}"),
+            _change(self.col("user_id"), "week", self.week, active=active),
+        ]
+
+    def history(self, consumed: str = "0", expired: str = "0") -> List[str]:
+        """Running totals, attributed to the row's category and shop"""
+        return [
+            _change(self.col("user_id"), "category", self.category, consumed=consumed, expired=expired),
+            _change(self.col("user_id"), "shop", self.shop, consumed=consumed, expired=expired),
+        ]
+
+
+def _trigger_statements(dialect_name: str) -> Dict[str, str]:
+    """The aggregate update run for each kind of write to products"""
+    old, new = _Row(dialect_name, "old"), _Row(dialect_name, "new")
+    return {
+        # An inactive insert (e.g. an imported history) counts as used up or
+        # gone off right away
+        "INSERT": _upsert(dialect_name, new.state("") + new.history(
+            consumed=_flag(f"{new.inactive} AND {new.in_time}"),
+            expired=f"{_flag(new.lapsed)} + {_flag(f'{new.inactive} AND NOT {new.in_time}')}",
+        )),
+        # Deactivated by its expiry date: consumed; later: expired. Editing
+        # the expiry date into the past counts as expired too. Reactivating,
+        # or moving the date forward again, undoes it where it was counted.
+        "UPDATE": _upsert(dialect_name, old.state("-") + new.state("") + new.history(
+            consumed=_flag(f"{old.open} AND {new.inactive} AND {new.in_time}"),
+            expired=(
+                f"{_flag(f'{old.open} AND {new.inactive} AND NOT {new.in_time}')}"
+                f" + {_flag(f'{old.open} AND {new.lapsed}')}"
+            ),
+        ) + old.history(
+            consumed=f"-{_flag(f'{old.inactive} AND {new.open} AND {new.in_time}')}",
+            expired=(
+                f"-{_flag(f'{old.lapsed} AND {new.open}')}"
+                f" - {_flag(f'{old.inactive} AND {new.open} AND NOT {new.in_time}')}"
+            ),
+        )),
+        # Running totals outlive the product
+        "DELETE": _upsert(dialect_name, old.state("-")),
+    }
+
+
+_SQLITE_EVENTS = {"INSERT": "INSERT", "UPDATE": f"UPDATE OF {', '.join(TRACKED_COLUMNS)}", "DELETE": "DELETE"}
+
+SQLITE_DDL = [
+    f"""CREATE TRIGGER IF NOT EXISTS products_aggregate_{operation.lower()}
+    AFTER {_SQLITE_EVENTS[operation]} ON products BEGIN
+        {statement};
+    END"""
+    for operation, statement in _trigger_statements("sqlite").items()
+]
+
+_POSTGRES_STATEMENTS = _trigger_statements("postgresql")
+
+# The share lock orders each product write against the daily step, which
+# takes the watermark row for update
+_POSTGRES_FUNCTION = f"""CREATE OR REPLACE FUNCTION products_aggregate() RETURNS trigger AS $$
+DECLARE
+    watermark date;
+BEGIN
+    SELECT expired_before INTO watermark FROM product_aggregate_watermark WHERE id = 1 FOR SHARE;
+    IF TG_OP = 'INSERT' THEN
+        {_POSTGRES_STATEMENTS["INSERT"]};
+    ELSIF TG_OP = 'UPDATE' THEN
+        {_POSTGRES_STATEMENTS["UPDATE"]};
+    ELSE
+        {_POSTGRES_STATEMENTS["DELETE"]};
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql"""
+
+POSTGRES_DDL = [
+    _POSTGRES_FUNCTION,
+    "DROP TRIGGER IF EXISTS products_aggregate ON products",
+    f"""CREATE TRIGGER products_aggregate
+    AFTER INSERT OR DELETE OR UPDATE OF {', '.join(TRACKED_COLUMNS)} ON products
+    FOR EACH ROW EXECUTE FUNCTION products_aggregate()""",
+]
+
+# Products expiring before the watermark have already been counted as
+# expired; a new database starts counting today
+WATERMARK_DDL = {
+    "sqlite": "INSERT OR IGNORE INTO product_aggregate_watermark (id, expired_before) VALUES (1, date('now'))",
+    "postgresql": (
+        "INSERT INTO product_aggregate_watermark (id, expired_before) "
+        "VALUES (1, CAST(timezone('UTC', now()) AS date)) ON CONFLICT DO NOTHING"
+    ),
+}
+
+for statement in SQLITE_DDL:
+    event.listen(Product.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in POSTGRES_DDL:
+    event.listen(Product.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for dialect_name, statement in WATERMARK_DDL.items():
+    event.listen(AggregateWatermark.__table__, "after_create", DDL(statement).execute_if(dialect=dialect_name))
+
+
+def _lapsed_statement(dialect_name: str):
+    """Move active products expiring in [start, end) from active to expired"""
+    p = _Row(dialect_name, "p", watermark=":start")
+    changes = [
+        _change(p.col("user_id"), "category", p.category, active="-1", expired="1"),
+        _change(p.col("user_id"), "shop", p.shop, active="-1", expired="1"),
+        _change(p.col("user_id"), "week", p.week, active="-1"),
+    ]
+    where = " FROM products p WHERE p.is_active AND p.expiration_date >= :start AND p.expiration_date < :end"
+    return text(_upsert(dialect_name, [change + where for change in changes])).bindparams(
+        bindparam("start", type_=Date), bindparam("end", type_=Date)
+    )
+
+
+def _rebuild_statement(dialect_name: str):
+    """Aggregates of the users in [first, last] computed from their products
+
+    Products deactivated before this existed are classified by the date they
+    were last updated.
+    """
+    p = _Row(dialect_name, "p", watermark=":watermark")
+    deactivated = p.sql["date"].format("coalesce(p.updated_at, p.created_at)")
+    used_in_time = f"{p.inactive} AND coalesce({deactivated} <= p.expiration_date, TRUE)"
+    changes = p.state("") + p.history(
+        consumed=_flag(used_in_time),
+        expired=f"{_flag(p.lapsed)} + {_flag(f'{p.inactive} AND NOT ({used_in_time})')}",
+    )
+    where = " FROM products p WHERE p.user_id BETWEEN :first AND :last"
+    return text(_upsert(dialect_name, [change + where for change in changes])).bindparams(
+        bindparam("watermark", type_=Date)
+    )
+
+
+# Keep product writes out while a chunk is recounted; SQLite's write lock
+# already does
+_LOCK_AGGREGATES = {
+    "postgresql": "LOCK TABLE product_aggregates IN SHARE ROW EXCLUSIVE MODE",
+}
+
+_WATERMARK_FOR_UPDATE = {
+    "postgresql": " FOR UPDATE",
+}
+
+
+def install_aggregates(connection: Connection) -> None:
+    """Seed the watermark, create the triggers and count existing products
+
+    Run by the migration that creates the aggregate tables, in its
+    transaction, so no product write falls between the count and the
+    triggers.
+    """
+    dialect_name = connection.dialect.name
+    connection.execute(text(WATERMARK_DDL[dialect_name]))
+    for statement in SQLITE_DDL if dialect_name == "sqlite" else POSTGRES_DDL:
+        connection.execute(text(statement))
+
+    first, last = connection.execute(select(func.min(User.id), func.max(User.id))).one()
+    if first is not None:
+        watermark = connection.execute(
+            select(AggregateWatermark.expired_before).where(AggregateWatermark.id == 1)
+        ).scalar()
+        connection.execute(
+            _rebuild_statement(dialect_name), {"first": first, "last": last, "watermark": watermark}
+        )
+
+
+async def expire_lapsed_products(db: AsyncSession, today: Optional[date] = None) -> int:
+    """Count active products whose expiry date has passed as expired
+
+    Covers every day since the last run, so a missed day is caught up.
+    Returns the number of products moved.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    dialect_name = db.get_bind().dialect.name
+    watermark = (await db.execute(text(
+        "SELECT expired_before FROM product_aggregate_watermark WHERE id = 1"
+        + _WATERMARK_FOR_UPDATE.get(dialect_name, "")
+    ).columns(expired_before=Date))).scalar()
+    if watermark is None or watermark >= today:
+        await db.rollback()
+        return 0
+
+    moved = (await db.execute(
+        select(func.count(Product.id)).where(
+            Product.is_active == True,
+            Product.expiration_date >= watermark,
+            Product.expiration_date < today,
+        )
+    )).scalar()
+    if moved:
+        await db.execute(_lapsed_statement(dialect_name), {"start": watermark, "end": today})
+    # Weeks that ended before today have no active products left
+    await db.execute(
+        ProductAggregate.__table__.delete().where(
+            ProductAggregate.dimension == "week",
+            ProductAggregate.bucket < _week_start(today).isoformat(),
+        )
+    )
+    await db.execute(
+        AggregateWatermark.__table__.update().where(AggregateWatermark.id == 1).values(expired_before=today)
+    )
+    await db.commit()
+    logger.info(f"Counted {moved} products that expired since {watermark.isoformat()} as expired")
+    return moved
+
+
+async def rebuild_aggregates(db: AsyncSession, batch_size: Optional[int] = None) -> int:
+    """Recount every user's aggregates from products
+
+    Users are processed in id order, one chunk per transaction, so the job
+    streams through a large table without long locks and can be rerun at
+    any time. Returns the number of users processed.
+    """
+    batch_size = batch_size or settings.ANALYTICS_REBUILD_BATCH_USERS
+    dialect_name = db.get_bind().dialect.name
+    statement = _rebuild_statement(dialect_name)
+    lock = _LOCK_AGGREGATES.get(dialect_name)
+
+    processed = 0
+    last_id = 0
+    while True:
+        user_ids = (await db.execute(
+            select(User.id).where(User.id > last_id).order_by(User.id).limit(batch_size)
+        )).scalars().all()
+        if not user_ids:
+            break
+
+        if lock:
+            await db.execute(text(lock))
+        watermark = (await db.execute(
+            select(AggregateWatermark.expired_before).where(AggregateWatermark.id == 1)
+        )).scalar()
+        first, last = user_ids[0], user_ids[-1]
+        await db.execute(
+            ProductAggregate.__table__.delete().where(ProductAggregate.user_id.between(first, last))
+        )
+        await db.execute(statement, {"first": first, "last": last, "watermark": watermark})
+        await db.commit()
+
+        processed += len(user_ids)
+        last_id = last
+        # Let other tasks run between chunks
+        await asyncio.sleep(0)
+
+    logger.info(f"Rebuilt product aggregates for {processed} users")
+    return processed
+
+
+async def run_daily_aggregation():
+    """Move products that expired since the last run to the expired totals"""
+    async with get_async_session() as db:
+        try:
+            await expire_lapsed_products(db)
+        except Exception as e:
+            logger.error(f"Error counting expired products: {str(e)}")
+
+
+def _waste_rate(consumed: int, expired: int) -> Optional[float]:
+    total = consumed + expired
+    return round(expired / total, 4) if total else None
+
+
+def _week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def get_analytics(db: Session, user_id: int, weeks: int, today: Optional[date] = None) -> dict:
+    """Read a user's dashboard from the maintained aggregates (one index range scan)"""
+    today = today or datetime.now(timezone.utc).date()
+    this_week = _week_start(today)
+    rows = db.execute(
+        select(ProductAggregate).where(
+            ProductAggregate.user_id == user_id,
+            or_(
+                ProductAggregate.dimension != "week",
+                ProductAggregate.bucket.between(
+                    this_week.isoformat(), (this_week + timedelta(weeks=weeks - 1)).isoformat()
+                ),
+            ),
+        )
+    ).scalars().all()
+
+    categories, shops, expiring = [], [], {}
+    for row in rows:
+        if row.dimension == "category":
+            categories.append({
+                "category_id": int(row.bucket) if row.bucket else None,
+                "active": row.active_count,
+                "consumed": row.consumed_count,
+                "expired": row.expired_count,
+                "waste_rate": _waste_rate(row.consumed_count, row.expired_count),
+            })
+        elif row.dimension == "shop":
+            shops.append({
+                "shop_name": row.bucket or None,
+                "active": row.active_count,
+                "consumed": row.consumed_count,
+                "expired": row.expired_count,
+                "average_shelf_life_days": (
+                    round(row.shelf_life_days / row.shelf_life_count, 1) if row.shelf_life_count else None
+                ),
+            })
+        elif row.dimension == "week":
+            expiring[row.bucket] = row.active_count
+
+    upcoming_weeks = []
+    for offset in range(weeks):
+        week_start = this_week + timedelta(weeks=offset)
+        upcoming_weeks.append({"week_start": week_start, "expiring": expiring.get(week_start.isoformat(), 0)})
+    return {"categories": categories, "shops": shops, "upcoming_weeks": upcoming_weeks}
+
+
+# Strong references to running rebuilds; the loop only keeps weak ones
+_rebuild_tasks = set()
+
+
+async def _set_rebuild_started(db: AsyncSession, started_at: Optional[datetime], *conditions) -> bool:
+    """Update the watermark row's rebuild claim if it matches; True if it did"""
+    result = await db.execute(
+        AggregateWatermark.__table__.update()
+        .where(AggregateWatermark.id == 1, *conditions)
+        .values(rebuild_started_at=started_at)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def _run_rebuild(started_at: datetime):
+    async with get_async_session() as db:
+        try:
+            await rebuild_aggregates(db)
+        except Exception as e:
+            logger.error(f"Error rebuilding product aggregates: {str(e)}")
+            await db.rollback()
+        finally:
+            await _set_rebuild_started(db, None, AggregateWatermark.rebuild_started_at == started_at)
+
+
+async def start_rebuild() -> bool:
+    """Start a background rebuild; False if one is running in any process
+
+    The claim is a conditional update of the watermark row, so API workers
+    and the scheduler all see it. A claim older than
+    ANALYTICS_REBUILD_TIMEOUT_SECONDS is taken over, in case the process
+    running that rebuild died.
+    """
+    started_at = datetime.now(timezone.utc)
+    expired = started_at - timedelta(seconds=settings.ANALYTICS_REBUILD_TIMEOUT_SECONDS)
+    async with get_async_session() as db:
+        claimed = await _set_rebuild_started(db, started_at, or_(
+            AggregateWatermark.rebuild_started_at.is_(None),
+            AggregateWatermark.rebuild_started_at < expired,
+        ))
+    if not claimed:
+        return False
+    task = asyncio.get_running_loop().create_task(_run_rebuild(started_at))
+    _rebuild_tasks.add(task)
+    task.add_done_callback(_rebuild_tasks.discard)
+    return True
@@ -0,0 +1,29 @@
+"""
+Consumption and waste analytics endpoints
+"""
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user
+from app.config import settings
+from app.database.session import get_db
+from app.models.user import User
+from app.schemas.product import ProductAnalyticsResponse
+from app.services.aggregates import get_analytics
+
+router = APIRouter()
+
+
+@router.get("/analytics", response_model=ProductAnalyticsResponse)
+def get_product_analytics(
+    weeks: int = Query(settings.ANALYTICS_DEFAULT_WEEKS, ge=1, le=settings.ANALYTICS_MAX_WEEKS),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Per-category and per-shop consumption and waste, and expirations per upcoming week
+
+    Served from counters maintained on every product write, so the cost does
+    not grow with the size of the inventory.
+    """
+    return get_analytics(db, current_user.id, weeks)
@@ -56,6 +56,12 @@ export const API_ENDPOINTS = {
   PRODUCTS: getApiEndpoint('products'),
   PRODUCTS_EXPIRING: getApiEndpoint('products/expiring'),
   PRODUCT_BY_ID: (id: number) => getApiEndpoint(`products/${id}`),
+  PRODUCTS_SEARCH: getApiEndpoint('products/search'),
+  PRODUCTS_EXPORT: getApiEndpoint('products/export'),
+  PRODUCTS_IMPORT: getApiEndpoint('products/import'),
+
+  // Analytics
+  ANALYTICS: getApiEndpoint('analytics'),
 
   // Categories endpoints
   CATEGORIES: getApiEndpoint('categories'),
@@ -65,6 +71,17 @@ export const API_ENDPOINTS = {
   NOTIFICATIONS: getApiEndpoint('notifications'),
   NOTIFICATIONS_UNREAD: getApiEndpoint('notifications/unread'),
   NOTIFICATION_BY_ID: (id: number) => getApiEndpoint(`notifications/${id}`),
+  NOTIFICATIONS_HISTORY: getApiEndpoint('notifications/history'),
+  NOTIFICATIONS_UNREAD_COUNT: getApiEndpoint('notifications/unread-count'),
+  NOTIFICATIONS_READ_ALL: getApiEndpoint('notifications/read-all'),
+  NOTIFICATION_READ: (id: number) => getApiEndpoint(`notifications/${id}/read`),
+
+  // Push devices
+  DEVICES: getApiEndpoint('devices'),
+  DEVICE_BY_TOKEN: (token: string) => getApiEndpoint(`devices/${encodeURIComponent(token)}`),
+
+  // Event stream (Server-Sent Events)
+  STREAM: getApiEndpoint('stream'),
 };
 
 /**
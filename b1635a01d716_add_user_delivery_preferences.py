@@ -0,0 +1,28 @@
+"""Add user delivery preferences
+
+Revision ID: b1635a01d716
+Revises: 145e932524a9
+Create Date: 2026-10-19 09:03:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1635a01d716'
+down_revision = '145e932524a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULL means the defaults (UTC, NOTIFICATION_DEFAULT_DELIVERY_HOUR)
+    op.add_column('user_settings', sa.Column('timezone', sa.String(length=64), nullable=True))
+    op.add_column('user_settings', sa.Column('delivery_hour', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('user_settings') as batch_op:
+        batch_op.drop_column('delivery_hour')
+        batch_op.drop_column('timezone')
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Local barcode lookup service for development and benchmarks
+
+Answers the Open Food Facts product endpoint
+(GET /api/v0/product/{barcode}.json) and the barcode API lookup
+(GET /v1/lookup?upc={barcode}) with a made-up product derived from the
+barcode, so scans can be load-tested without calling the real services.
+Barcodes starting with "000" are reported as unknown.
+
+Usage:
+    python barcode_stub.py --port 9098
+    OPEN_FOOD_FACTS_API=http://127.0.0.1:9098/api/v0/product/ \
+        BARCODE_API_URL=http://127.0.0.1:9098/v1 uvicorn app.main:app
+"""
+
+import argparse
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+OFF_PATH = re.compile(r"^/api/v0/product/(?P<barcode>[^/]+?)(\.json)?$")
+LOOKUP_PATH = "/v1/lookup"
+
+NAMES = ["Hazelnut Spread", "Greek Yogurt", "Oat Milk", "Tomato Sauce", "Rye Bread", "Orange Juice"]
+CATEGORIES = ["Spreads", "Dairies", "Beverages", "Sauces", "Breads", "Juices"]
+
+
+def _product(barcode: str) -> Dict[str, str]:
+    index = sum(map(ord, barcode)) % len(NAMES)
+    return {
+        "name": NAMES[index],
+        "brand": f"Brand {barcode[-3:]}",
+        "category": CATEGORIES[index],
+        "image_url": f"https://images.example.com/{barcode}.jpg",
+    }
+
+
+def settings_for(base_url: str) -> Dict[str, str]:
+    """Settings that point the app's barcode lookups at a stub at base_url"""
+    return {
+        "OPEN_FOOD_FACTS_API": f"{base_url}/api/v0/product/",
+        "BARCODE_API_URL": f"{base_url}/v1",
+    }
+
+
+class BarcodeStubHandler(BaseHTTPRequestHandler):
+    """Request handler for both lookup APIs"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        match = OFF_PATH.match(url.path)
+        if match:
+            barcode = match.group("barcode")
+            code, body = 200, {"code": barcode, "status": 0, "status_verbose": "product not found"}
+            if not barcode.startswith("000"):
+                product = _product(barcode)
+                body.update(status=1, status_verbose="product found", product={
+                    "code": barcode,
+                    "product_name": product["name"],
+                    "brands": product["brand"],
+                    "categories": product["category"],
+                    "image_url": product["image_url"],
+                })
+        elif url.path == LOOKUP_PATH:
+            barcode = parse_qs(url.query).get("upc", [""])[0]
+            if not barcode or barcode.startswith("000"):
+                code, body = 404, {"item_response": {"code": 404, "status": "Not Found", "message": "No data"}}
+            else:
+                product = _product(barcode)
+                code, body = 200, {
+                    "item_response": {"code": 200, "status": "OK", "message": "Data returned"},
+                    "item_attributes": {
+                        "upc": barcode,
+                        "title": product["name"],
+                        "brand": product["brand"],
+                        "category": product["category"],
+                        "image": product["image_url"],
+                    },
+                }
+        else:
+            code, body = 404, {"error": "Unknown endpoint"}
+
+        with self.server.lock:
+            self.server.lookups += 1
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _create_server(host: str, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), BarcodeStubHandler)
+    server.daemon_threads = True
+    server.lookups = 0
+    server.lock = threading.Lock()
+    return server
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stub in a background thread; returns the server and its base URL"""
+    server = _create_server(host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local barcode lookup service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9098)
+    args = parser.parse_args()
+
+    server = _create_server(args.host, args.port)
+    print(f"Barcode stub listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
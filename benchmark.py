@@ -0,0 +1,739 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the Food Expiration Tracker backend
+
+Usage:
+    python benchmark.py email [--messages 100000]
+    python benchmark.py push [--messages 100000]
+    python benchmark.py startup [--runs 10] [--budget-ms 1500]
+    python benchmark.py metrics [--requests 20000]
+    python benchmark.py ratelimit [--requests 200000]
+    python benchmark.py sweep-query [--database-url sqlite:///./benchmark.db]
+    python benchmark.py search [--database-url sqlite:///./benchmark.db] [--budget-ms 20]
+    python benchmark.py analytics [--database-url sqlite:///./benchmark.db]
+    python benchmark.py patch [--database-url sqlite:///./benchmark.db] [--edits 2000]
+
+sweep-query, search, analytics and patch need a seeded database, e.g. 100k users with
+`python loadtest.py seed --scale 1m --products-per-user 10`.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).parent))
+
+
+def _fake_products(count):
+    """Build lightweight product stand-ins with a realistic field mix"""
+    today = date.today()
+    return [
+        SimpleNamespace(
+            id=i,
+            name=f"Product {i}",
+            expiration_date=today + timedelta(days=i % 4),
+            shop_name="Corner Shop" if i % 2 else None,
+            amount=Decimal("1.5") if i % 3 else None,
+            unit="kg",
+        )
+        for i in range(count)
+    ]
+
+
+def _legacy_email_template(product, days_until: int) -> str:
+    """The f-string email body that the Jinja2 templates replaced"""
+    return f"""
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background-color: #f44336; color: white; padding: 20px; text-align: center; }}
+            .content {{ background-color: #f9f9f9; padding: 20px; border-radius: 5px; }}
+            .product-info {{ background-color: white; padding: 15px; margin: 15px 0; border-radius: 5px; }}
+            .footer {{ text-align: center; color: #666; font-size: 12px; margin-top: 20px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>Food Expiration Alert</h1>
+            </div>
+            <div class="content">
+                <p>Hello,</p>
+                <p>This is a reminder that one of your food items is approaching its expiration date:</p>
+                
+                <div class="product-info">
+                    <h3>{product.name}</h3>
+                    <p><strong>Expires in:</strong> {days_until} days</p>
+                    <p><strong>Expiration Date:</strong> {product.expiration_date}</p>
+                    {f'<p><strong>Shop:</strong> {product.shop_name}</p>' if product.shop_name else ''}
+                    {f'<p><strong>Amount:</strong> {product.amount} {product.unit}</p>' if product.amount and product.unit else ''}
+                </div>
+                
+                <p>Please check your food items and consider using them soon or disposing of them properly.</p>
+            </div>
+            <div class="footer">
+                <p>This is an automated message from your Food Expiration Tracker app.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+
+def bench_email(args):
+    """Renders per second: legacy f-string + MIME tree vs Jinja2 batch + prebuilt envelope"""
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
+    from app.config import settings
+    from app.utils import email_templates
+
+    products = _fake_products(args.messages)
+    items = [(product, (product.expiration_date - date.today()).days) for product in products]
+
+    start = time.perf_counter()
+    email_templates.load_templates()
+    compile_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for product, days_until in items:
+        msg = MIMEMultipart()
+        msg['From'] = settings.EMAIL_FROM
+        msg['To'] = "user@example.com"
+        msg['Subject'] = "Food Expiration Reminder"
+        msg.attach(MIMEText(_legacy_email_template(product, days_until), 'html'))
+        msg.as_string()
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bodies = email_templates.render_expiration_batch(items)
+    for body in bodies:
+        email_templates.build_email_message("user@example.com", "Food Expiration Reminder", body)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "messages": args.messages,
+        "template_compile_seconds": round(compile_seconds, 4),
+        "mime_tree_per_second": round(args.messages / legacy_seconds),
+        "batch_prebuilt_per_second": round(args.messages / batch_seconds),
+    }
+
+
+def bench_push(args):
+    """Pushes per second through the batched sender against the local FCM stand-in"""
+    import asyncio
+
+    from app.utils.push import FCMProvider, PushMessage
+    from fcm_stub import PROJECT_ID, StubCredentials, start_stub_server
+
+    server, url = start_stub_server()
+    provider = FCMProvider(
+        url, PROJECT_ID, StubCredentials(),
+        batch_size=args.batch_size, max_concurrency=args.concurrency,
+    )
+    messages = [
+        PushMessage(
+            token=f"invalid-{i}" if i % 100 == 0 else f"token-{i}",
+            title="Expiration Reminder",
+            body=f"Reminder: Product {i} expires in 2 days",
+        )
+        for i in range(args.messages)
+    ]
+
+    start = time.perf_counter()
+    result = asyncio.run(provider.send(messages))
+    seconds = time.perf_counter() - start
+
+    provider.close()
+    server.shutdown()
+    return {
+        "messages": args.messages,
+        "batch_size": args.batch_size,
+        "concurrency": args.concurrency,
+        "sent": len(result.sent),
+        "invalid_tokens": len(result.invalid_tokens),
+        "pushes_per_second": round(args.messages / seconds),
+    }
+
+
+STARTUP_PROBE = """
+import asyncio, time
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def startup():
+    async with app.router.lifespan_context(app):
+        pass
+
+asyncio.run(startup())
+print(imported - start, time.perf_counter() - start)
+"""
+
+
+def bench_startup(args):
+    """Cold import and lifespan startup time of app.main, checked against a budget"""
+    import_times, startup_times = [], []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_PROBE],
+            capture_output=True, text=True, check=True, env=os.environ.copy(),
+        ).stdout.split()
+        import_times.append(float(output[0]) * 1000)
+        startup_times.append(float(output[1]) * 1000)
+
+    median_startup = statistics.median(startup_times)
+    return {
+        "runs": args.runs,
+        "import_ms_median": round(statistics.median(import_times), 1),
+        "startup_ms_median": round(median_startup, 1),
+        "startup_ms_max": round(max(startup_times), 1),
+        "budget_ms": args.budget_ms,
+        "within_budget": median_startup <= args.budget_ms,
+    }
+
+
+async def _drive_asgi(app, path, count):
+    """Call an ASGI app directly, without a server or HTTP client in the way"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(count):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - start
+
+
+def bench_metrics(args):
+    """Cost of the metrics middleware and SQL hooks, isolated and on a typical list route"""
+    import asyncio
+    import tempfile
+
+    from fastapi import FastAPI
+    from sqlalchemy import create_engine, text
+
+    from app.utils.metrics import MetricsMiddleware, instrument_engine
+
+    async def bare_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    database = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+    seed = create_engine(f"sqlite:///{database}")
+    with seed.begin() as conn:
+        conn.execute(text("CREATE TABLE products (id INTEGER PRIMARY KEY, user_id INTEGER, name TEXT, expiration_date DATE)"))
+        conn.execute(
+            text("INSERT INTO products (user_id, name, expiration_date) VALUES (:user_id, :name, '2030-01-01')"),
+            [{"user_id": i % 50, "name": f"Product {i}"} for i in range(1000)],
+        )
+
+    def build(instrumented):
+        engine = create_engine(f"sqlite:///{database}")
+        if instrumented:
+            instrument_engine(engine)
+        app = FastAPI()
+        if instrumented:
+            app.add_middleware(MetricsMiddleware)
+
+        # Shaped like the product list: a user lookup plus a page of rows
+        @app.get("/products/{user_id}")
+        async def list_products(user_id: int):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT id FROM products WHERE id = :id"), {"id": user_id}).first()
+                rows = conn.execute(
+                    text("SELECT id, name, expiration_date FROM products WHERE user_id = :user_id LIMIT 20"),
+                    {"user_id": user_id},
+                ).mappings().all()
+                return [dict(row) for row in rows]
+
+        return app
+
+    baseline_app, instrumented_app = build(False), build(True)
+    asyncio.run(_drive_asgi(baseline_app, "/products/1", 500))
+    asyncio.run(_drive_asgi(instrumented_app, "/products/1", 500))
+
+    # Interleave rounds so drift affects both variants equally, and keep
+    # the fastest round of each to filter out scheduler noise
+    per_round = args.requests // args.rounds
+    bare = wrapped = baseline = instrumented = float("inf")
+    for _ in range(args.rounds):
+        bare = min(bare, asyncio.run(_drive_asgi(bare_app, "/", per_round)))
+        wrapped = min(wrapped, asyncio.run(_drive_asgi(MetricsMiddleware(bare_app), "/", per_round)))
+        baseline = min(baseline, asyncio.run(_drive_asgi(baseline_app, "/products/1", per_round)))
+        instrumented = min(instrumented, asyncio.run(_drive_asgi(instrumented_app, "/products/1", per_round)))
+
+    os.unlink(database)
+    return {
+        "requests": per_round * args.rounds,
+        "middleware_us_per_request": round((wrapped - bare) / per_round * 1e6, 2),
+        "baseline_us_per_request": round(baseline / per_round * 1e6, 2),
+        "instrumented_us_per_request": round(instrumented / per_round * 1e6, 2),
+        "overhead_percent": round((instrumented - baseline) / baseline * 100, 2),
+    }
+
+
+def bench_ratelimit(args):
+    """Per-request cost of the token-bucket middleware with the in-process store"""
+    import asyncio
+
+    from app.services.auth import create_access_token
+    from app.utils.rate_limit import MemoryBucketStore, RateLimitMiddleware
+
+    async def bare_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    limited = RateLimitMiddleware(bare_app, store=MemoryBucketStore())
+    # Effectively unlimited, so every request takes the full allow path
+    limited.ip_limit = limited.user_limit = (1e9, 1e9)
+
+    # A valid token, so requests take the cached-user path rather than
+    # verifying a bad signature and falling back to the IP bucket
+    token = create_access_token({"sub": "user1"})
+    scope = {
+        "type": "http", "method": "GET", "path": "/api/v1/products",
+        "client": ("10.0.0.1", 1234),
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    }
+    bucket, _ = limited._bucket(scope)
+    if not bucket.startswith("user:"):
+        raise SystemExit(f"Benchmark token was not accepted (bucket {bucket})")
+
+    async def drive(app, count):
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            pass
+
+        start = time.perf_counter()
+        for _ in range(count):
+            await app(scope, receive, send)
+        return time.perf_counter() - start
+
+    bare = limited_time = float("inf")
+    per_round = args.requests // args.rounds
+    for _ in range(args.rounds):
+        bare = min(bare, asyncio.run(drive(bare_app, per_round)))
+        limited_time = min(limited_time, asyncio.run(drive(limited, per_round)))
+
+    overhead_us = (limited_time - bare) / per_round * 1e6
+    return {
+        "requests": per_round * args.rounds,
+        "overhead_us_per_request": round(overhead_us, 2),
+        "budget_us": args.budget_us,
+        "within_budget": overhead_us <= args.budget_us,
+    }
+
+
+def bench_sweep_query(args):
+    """Plan and time of the per-user-window sweep query vs one query per user"""
+    os.environ["DATABASE_URL"] = args.database_url
+    import random
+
+    from sqlalchemy import event, func, select, text
+    from sqlalchemy.orm import Session
+
+    from app.database.session import engine
+    from app.models.product import Product
+    from app.models.user_settings import UserSettings
+    from app.services.expiry_window import SWEEP_INDEXES, expiring_products_query, window_days
+
+    with engine.begin() as conn:
+        for index in SWEEP_INDEXES:
+            index.create(conn, checkfirst=True)
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE"))
+
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, parameters, context, executemany:
+                 statements.append((statement, parameters)))
+
+    today = date.today()
+    dialect = engine.dialect.name
+
+    def timed(query):
+        best, rows = float("inf"), []
+        for _ in range(args.rounds):
+            with Session(engine) as session:
+                start = time.perf_counter()
+                rows = session.execute(query).all()
+                best = min(best, time.perf_counter() - start)
+        return best, rows
+
+    with Session(engine) as session:
+        window_mix = dict(session.execute(
+            select(UserSettings.notification_days, func.count()).group_by(UserSettings.notification_days)
+        ).all())
+        all_settings = session.scalars(select(UserSettings)).all()
+        session.expunge_all()
+
+    def explain_last():
+        statement, parameters = statements[-1]
+        prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+        with engine.connect() as conn:
+            return [
+                " ".join(str(column) for column in row)
+                for row in conn.exec_driver_sql(prefix + statement, parameters).all()
+            ]
+
+    statements.clear()
+    sweep_seconds, rows = timed(expiring_products_query(dialect, today))
+    sweep_statements = len(statements) // args.rounds
+    plan = explain_last()
+
+    bucket = random.Random(42).sample([s.user_id for s in all_settings], min(args.bucket_users, len(all_settings)))
+    bucket_seconds, _ = timed(expiring_products_query(dialect, today, bucket))
+    bucket_plan = explain_last()
+
+    # The naive alternative: one window query per user, timed on a sample
+    sample = random.Random(42).sample(all_settings, min(args.naive_users, len(all_settings)))
+    start = time.perf_counter()
+    with Session(engine) as session:
+        for user_settings in sample:
+            session.execute(select(Product).where(
+                Product.user_id == user_settings.user_id,
+                Product.is_active == True,
+                Product.expiration_date >= today,
+                Product.expiration_date <= today + timedelta(days=window_days(user_settings)),
+            )).all()
+    naive_per_user = (time.perf_counter() - start) / max(len(sample), 1)
+
+    return {
+        "users": len(all_settings),
+        "window_mix": {str(days): count for days, count in sorted(window_mix.items(), key=lambda item: str(item[0]))},
+        "rows": len(rows),
+        "statements_per_sweep": sweep_statements,
+        "sweep_ms": round(sweep_seconds * 1000, 1),
+        "bucket_users": len(bucket),
+        "bucket_ms": round(bucket_seconds * 1000, 2),
+        "naive_estimated_ms": round(naive_per_user * len(all_settings) * 1000, 1),
+        "plan": plan,
+        "bucket_plan": bucket_plan,
+    }
+
+
+def bench_search(args):
+    """Latency of prefix, multi-word and misspelled product searches"""
+    os.environ["DATABASE_URL"] = args.database_url
+    import random
+
+    from sqlalchemy import func, select
+    from sqlalchemy.orm import Session
+
+    from app.database.session import engine
+    from app.models.product import Product
+    from app.services.search_index import create_search_index, search_products, tokenize
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        create_search_index(conn)
+    index_seconds = time.perf_counter() - start
+
+    rng = random.Random(42)
+    with Session(engine) as session:
+        max_id = session.scalar(select(func.max(Product.id)))
+        names = [
+            session.execute(select(Product.user_id, Product.name).where(Product.id >= rng.randint(1, max_id))
+                            .limit(1)).one()
+            for _ in range(args.queries)
+        ]
+
+    def misspell(word):
+        i = rng.randrange(1, len(word))
+        return word[:i] + rng.choice("aeiourst") + word[i + 1:]
+
+    # What a user types while looking for one of their own products
+    kinds = {
+        "prefix": lambda words: words[-1][:3],
+        "words": lambda words: " ".join(word[:4] for word in words),
+        "typo": lambda words: misspell(max(words, key=len)),
+    }
+    results = {}
+    with Session(engine) as session:
+        search_products(session, names[0][0], "warm", args.limit)
+        for kind, make_query in kinds.items():
+            latencies, hits = [], 0
+            for user_id, name in names:
+                query = make_query(tokenize(name))
+                start = time.perf_counter()
+                found = search_products(session, user_id, query, args.limit)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += any(product.name == name for product in found)
+                session.expunge_all()
+            latencies.sort()
+            results[kind] = {
+                "p50_ms": round(statistics.median(latencies), 2),
+                "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+                "max_ms": round(latencies[-1], 2),
+                "found_rate": round(hits / len(names), 3),
+            }
+
+    return {
+        "products": max_id,
+        "queries_per_kind": len(names),
+        "index_ms": round(index_seconds * 1000, 1),
+        **results,
+        "budget_ms": args.budget_ms,
+        "within_budget": all(result["p95_ms"] <= args.budget_ms for result in results.values()),
+    }
+
+
+def bench_analytics(args):
+    """Dashboard reads from the aggregates vs GROUP BY over products, and the write cost of the triggers"""
+    os.environ["DATABASE_URL"] = args.database_url
+    import random
+
+    from sqlalchemy import case, func, insert, select, text
+    from sqlalchemy.orm import Session
+
+    from app.database.session import engine
+    from app.models.product import Product
+    from app.services.aggregates import SQLITE_DDL, get_analytics
+
+    if engine.dialect.name != "sqlite":
+        raise SystemExit("analytics benchmark supports SQLite only")
+
+    today = date.today()
+    week = func.date(Product.expiration_date, "weekday 0", "-6 days")
+    open_product = case((Product.is_active & (Product.expiration_date >= today), 1), else_=0)
+
+    def group_by(session, user_id):
+        """What the dashboard would run without the aggregates"""
+        for key in (Product.category_id, Product.shop_name, week):
+            session.execute(
+                select(key, func.sum(open_product), func.count(), func.avg(
+                    func.julianday(Product.expiration_date) - func.julianday(Product.purchase_date)
+                )).where(Product.user_id == user_id).group_by(key)
+            ).all()
+
+    def percentiles(run, user_ids):
+        latencies = []
+        with Session(engine) as session:
+            for user_id in user_ids:
+                start = time.perf_counter()
+                run(session, user_id)
+                latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        return {
+            "p50_ms": round(statistics.median(latencies), 3),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        }
+
+    with Session(engine) as session:
+        max_user = session.scalar(select(func.max(Product.user_id)))
+        heaviest = session.execute(
+            select(Product.user_id).group_by(Product.user_id).order_by(func.count().desc()).limit(1)
+        ).scalar()
+        heaviest_products = session.scalar(select(func.count()).where(Product.user_id == heaviest))
+    rng = random.Random(42)
+    user_ids = [rng.randint(1, max_user) for _ in range(args.users)]
+
+    results = {
+        "aggregates": percentiles(lambda session, user_id: get_analytics(session, user_id, 8), user_ids),
+        "group_by": percentiles(group_by, user_ids),
+        "heaviest_user_products": heaviest_products,
+        "heaviest_aggregates": percentiles(lambda session, user_id: get_analytics(session, user_id, 8), [heaviest] * 20),
+        "heaviest_group_by": percentiles(group_by, [heaviest] * 20),
+    }
+
+    # Write cost: the same inserts and updates with and without the
+    # triggers, each rolled back
+    def writes(drop_triggers):
+        with engine.connect() as conn:
+            transaction = conn.begin()
+            if drop_triggers:
+                for name in ("insert", "update", "delete"):
+                    conn.execute(text(f"DROP TRIGGER IF EXISTS products_aggregate_{name}"))
+            start = time.perf_counter()
+            for i in range(args.writes):
+                conn.execute(insert(Product).values(
+                    user_id=rng.randint(1, max_user), name="Benchmark", shop_name="Corner Shop",
+                    purchase_date=today, expiration_date=today + timedelta(days=i % 30), amount=1, unit="pcs",
+                    is_active=True,
+                ))
+            for product_id in conn.execute(
+                select(Product.id).where(Product.name == "Benchmark").limit(args.writes)
+            ).scalars().all():
+                conn.execute(Product.__table__.update().where(Product.id == product_id).values(is_active=False))
+            elapsed = time.perf_counter() - start
+            transaction.rollback()
+            return elapsed / (2 * args.writes) * 1e6
+
+    with_triggers = writes(drop_triggers=False)
+    without_triggers = writes(drop_triggers=True)
+    results.update({
+        "write_us_with_triggers": round(with_triggers, 1),
+        "write_us_without_triggers": round(without_triggers, 1),
+        "trigger_overhead_us": round(with_triggers - without_triggers, 1),
+        "triggers": len(SQLITE_DDL),
+    })
+    return results
+
+
+def bench_patch(args):
+    """Product edits: one versioned UPDATE ... RETURNING vs loading, mutating and flushing the row"""
+    os.environ["DATABASE_URL"] = args.database_url
+    import random
+
+    from sqlalchemy import event, func, select
+
+    from app.database.session import SessionLocal, engine
+    from app.models.product import Product
+    from app.models.user import User  # noqa: F401 (target of products.user_id, for ORM flushes)
+    from app.services.product_updates import update_product
+
+    with SessionLocal() as session:
+        rows = session.execute(select(Product.id, Product.user_id).order_by(func.random()).limit(args.edits)).all()
+
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+
+    def read_modify_write(session, product_id, user_id, notes):
+        product = session.get(Product, product_id)
+        product.notes = notes
+        session.commit()
+        # The response reads the row back
+        return product.version
+
+    versions = {}
+
+    def versioned(session, product_id, user_id, notes):
+        # The version the client read along with the product
+        return update_product(session, user_id, product_id, versions[product_id], {"notes": notes})
+
+    def run(edit):
+        nonlocal statements
+        latencies = []
+        statements = 0
+        for i, (product_id, user_id) in enumerate(rows):
+            with SessionLocal() as session:
+                start = time.perf_counter()
+                edit(session, product_id, user_id, f"edit {i}")
+                latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        return {
+            "p50_ms": round(statistics.median(latencies), 3),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+            "statements_per_edit": round(statements / len(rows), 2),
+        }
+
+    rng = random.Random(42)
+    rng.shuffle(rows)
+    results = {"read_modify_write": run(read_modify_write)}
+    with SessionLocal() as session:
+        versions.update(session.execute(
+            select(Product.id, Product.version).where(Product.id.in_([product_id for product_id, _ in rows]))
+        ).all())
+    results["versioned_update"] = run(versioned)
+
+    # Two clients editing the same product from the same version: the
+    # second is rejected instead of overwriting the first
+    product_id, user_id = rows[0]
+    with SessionLocal() as session:
+        version = session.scalar(select(Product.version).where(Product.id == product_id))
+        first = update_product(session, user_id, product_id, version, {"notes": "first"})
+        second = update_product(session, user_id, product_id, version, {"notes": "second"})
+    results["concurrent_edit"] = {"first_applied": first is not None, "second_rejected": second is None}
+    return results
+
+
+BENCHMARKS = {
+    "email": bench_email,
+    "push": bench_push,
+    "startup": bench_startup,
+    "metrics": bench_metrics,
+    "ratelimit": bench_ratelimit,
+    "sweep-query": bench_sweep_query,
+    "search": bench_search,
+    "analytics": bench_analytics,
+    "patch": bench_patch,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    email = subparsers.add_parser("email", help=bench_email.__doc__)
+    email.add_argument("--messages", type=int, default=100_000)
+
+    push = subparsers.add_parser("push", help=bench_push.__doc__)
+    push.add_argument("--messages", type=int, default=100_000)
+    push.add_argument("--batch-size", type=int, default=500)
+    push.add_argument("--concurrency", type=int, default=16)
+
+    startup = subparsers.add_parser("startup", help=bench_startup.__doc__)
+    startup.add_argument("--runs", type=int, default=10)
+    startup.add_argument("--budget-ms", type=float, default=1500)
+
+    metrics = subparsers.add_parser("metrics", help=bench_metrics.__doc__)
+    metrics.add_argument("--requests", type=int, default=20_000)
+    metrics.add_argument("--rounds", type=int, default=10)
+
+    ratelimit = subparsers.add_parser("ratelimit", help=bench_ratelimit.__doc__)
+    ratelimit.add_argument("--requests", type=int, default=200_000)
+    ratelimit.add_argument("--rounds", type=int, default=5)
+    ratelimit.add_argument("--budget-us", type=float, default=50)
+
+    sweep_query = subparsers.add_parser("sweep-query", help=bench_sweep_query.__doc__)
+    sweep_query.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    sweep_query.add_argument("--rounds", type=int, default=3)
+    sweep_query.add_argument("--bucket-users", type=int, default=500)
+    sweep_query.add_argument("--naive-users", type=int, default=1000)
+
+    search = subparsers.add_parser("search", help=bench_search.__doc__)
+    search.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    search.add_argument("--queries", type=int, default=500)
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--budget-ms", type=float, default=20)
+
+    analytics = subparsers.add_parser("analytics", help=bench_analytics.__doc__)
+    analytics.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    analytics.add_argument("--users", type=int, default=500)
+    analytics.add_argument("--writes", type=int, default=2000)
+
+    patch = subparsers.add_parser("patch", help=bench_patch.__doc__)
+    patch.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    patch.add_argument("--edits", type=int, default=2000)
+
+    args = parser.parse_args()
+    results = {"benchmark": args.benchmark, **BENCHMARKS[args.benchmark](args)}
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if results.get("within_budget") is False:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
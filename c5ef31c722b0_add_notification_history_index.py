@@ -0,0 +1,29 @@
+"""Add notification history index
+
+Revision ID: c5ef31c722b0
+Revises: 
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5ef31c722b0'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Per-user history listing, newest first
+    op.create_index(
+        'ix_notifications_user_id_created_at',
+        'notifications',
+        ['user_id', sa.text('created_at DESC')],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notifications_user_id_created_at', table_name='notifications')
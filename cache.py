@@ -0,0 +1,74 @@
+"""
+Per-process caches with invalidation shared across worker processes
+"""
+
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional
+
+from app.utils import channel
+
+INVALIDATE = "cache.invalidate"
+
+_caches: Dict[str, "LocalCache"] = {}
+
+
+class LocalCache:
+    """Small TTL cache held in this process
+
+    Every worker keeps its own copy, so reads never leave the process.
+    invalidate() drops a key here and in every other process connected to
+    the local channel; the TTL bounds staleness for changes that are not
+    invalidated explicitly. Keys must be strings or integers so they
+    survive the trip over the channel.
+    """
+
+    def __init__(self, name: str, ttl: float, maxsize: int):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: Dict[Hashable, tuple] = {}
+        self._lock = threading.Lock()
+        _caches[name] = self
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.maxsize:
+                # Evict the oldest insertion
+                self._entries.pop(next(iter(self._entries)), None)
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a key in this and every other process"""
+        self._entries.pop(key, None)
+        channel.broadcast(INVALIDATE, {"cache": self.name, "key": key})
+
+    def clear(self) -> None:
+        """Drop every key in this and every other process"""
+        self._entries.clear()
+        channel.broadcast(INVALIDATE, {"cache": self.name, "key": None})
+
+    def _drop(self, key: Optional[Hashable]) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+
+def _on_invalidate(data: Dict[str, Any]) -> None:
+    cache = _caches.get(data["cache"])
+    if cache is not None:
+        cache._drop(data["key"])
+
+
+channel.subscribe(INVALIDATE, _on_invalidate)
@@ -0,0 +1,33 @@
+"""Add product search index
+
+Revision ID: ce21fac99fe0
+Revises: ec76b9765ed7
+Create Date: 2026-10-19 09:05:00.000000
+
+"""
+from alembic import op
+
+from app.services.search_index import create_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = 'ce21fac99fe0'
+down_revision = 'ec76b9765ed7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # SQLite: products_fts, its vocabulary and sync triggers, filled from
+    # existing products; PostgreSQL: the pg_trgm index
+    create_search_index(op.get_bind())
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('products_fts_insert', 'products_fts_delete', 'products_fts_update'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS products_fts_vocab')
+        op.execute('DROP TABLE IF EXISTS products_fts')
+    else:
+        op.execute('DROP INDEX IF EXISTS ix_products_search_trgm')
@@ -0,0 +1,73 @@
+"""
+Local message channel between the processes started by serve.py
+
+Each process holds one end of a Unix datagram socket pair whose other end
+is read by the supervisor, which relays every message to all the other
+processes. Delivery is best effort: a message is dropped (and logged) if
+a peer is not keeping up. Without the launcher nothing is connected and
+broadcast is a no-op.
+"""
+
+import asyncio
+import json
+import logging
+import socket
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_SIZE = 64 * 1024
+
+_socket: Optional[socket.socket] = None
+_handlers: Dict[str, List[Callable[[Any], None]]] = defaultdict(list)
+
+
+def subscribe(kind: str, handler: Callable[[Any], None]) -> None:
+    """Call handler(data) on the event loop for each message of this kind from another process"""
+    _handlers[kind].append(handler)
+
+
+def broadcast(kind: str, data: Any) -> None:
+    """Send a message to every other process; safe to call from any thread"""
+    if _socket is None:
+        return
+    message = json.dumps({"kind": kind, "data": data}, separators=(",", ":")).encode()
+    if len(message) > MAX_MESSAGE_SIZE:
+        logger.warning(f"Dropped {kind} message of {len(message)} bytes: too large for the channel")
+        return
+    try:
+        _socket.send(message)
+    except OSError as e:
+        logger.warning(f"Dropped {kind} message: {str(e)}")
+
+
+def connect(sock: socket.socket) -> None:
+    """Attach this process's end of the channel to the running event loop"""
+    global _socket
+    sock.setblocking(False)
+    _socket = sock
+    asyncio.get_running_loop().add_reader(sock.fileno(), _receive)
+
+
+def is_connected() -> bool:
+    return _socket is not None
+
+
+def _receive() -> None:
+    while True:
+        try:
+            message = _socket.recv(MAX_MESSAGE_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        try:
+            envelope = json.loads(message)
+            handlers = _handlers.get(envelope["kind"], ())
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignored malformed channel message")
+            continue
+        for handler in handlers:
+            try:
+                handler(envelope["data"])
+            except Exception as e:
+                logger.error(f"Error handling {envelope['kind']} message: {str(e)}")
@@ -1,58 +1,306 @@
 """
 Application configuration settings
+
+Every setting below can be overridden by an environment variable of the
+same name or a line in .env (ENV_FILE), which is parsed once at startup;
+the environment wins over .env. Values are converted to the annotated
+type: booleans accept 1/true/yes/on and 0/false/no/off, lists and dicts are JSON, and lists
+also accept a comma-separated string. An invalid value fails at startup.
+
+SIGHUP re-reads both sources and applies the RELOADABLE settings in the
+running process; serve.py forwards it to every worker and the scheduler.
+The rest only take effect after a restart.
 """
 
+import asyncio
+import ipaddress
+import json
+import logging
 import os
-from typing import List
+import signal
+from typing import Any, Callable, Dict, FrozenSet, List, get_type_hints
+
+from dotenv import dotenv_values
+
+logger = logging.getLogger(__name__)
+
+ENV_FILE = os.getenv("ENV_FILE", ".env")
+
+_TRUE = ("1", "true", "yes", "on")
+_FALSE = ("0", "false", "no", "off")
+
+
+def _parse(name: str, kind: Any, raw: str) -> Any:
+    """Convert a raw environment string to a setting's annotated type"""
+    try:
+        if kind is bool:
+            value = raw.strip().lower()
+            if value not in _TRUE + _FALSE:
+                raise ValueError(f"expected one of {', '.join(_TRUE + _FALSE)}")
+            return value in _TRUE
+        if kind in (int, float):
+            return kind(raw.strip())
+        if kind is str:
+            return raw
+        container = getattr(kind, "__origin__", None)
+        if container is list and not raw.strip().startswith("["):
+            return [item.strip() for item in raw.split(",") if item.strip()]
+        value = json.loads(raw)
+        if container is not None and not isinstance(value, container):
+            raise ValueError(f"expected a JSON {container.__name__}")
+        return value
+    except ValueError as e:
+        raise ValueError(f"Invalid value for {name}: {raw!r} ({str(e)})") from None
+
+
+def _validate(values: Dict[str, Any]) -> None:
+    """Checks beyond the type, run before any value is applied"""
+    for proxy in values["RATE_LIMIT_TRUSTED_PROXIES"]:
+        try:
+            ipaddress.ip_network(proxy, strict=False)
+        except ValueError as e:
+            raise ValueError(f"Invalid value for RATE_LIMIT_TRUSTED_PROXIES: {proxy!r} ({str(e)})") from None
 
 
 class Settings:
     """Application settings"""
-    
+
     # Application
     APP_NAME: str = "Food Expiration Tracker"
-    DEBUG: bool = True
+    DEBUG: bool = False  # uvicorn auto-reload only; SQL logging is SQL_ECHO
     API_V1_STR: str = "/api/v1"
-    
+
     # Database (SQLite for development without PostgreSQL dependency)
-    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./food_tracker.db")
-    DATABASE_TEST_URL: str = os.getenv("DATABASE_TEST_URL", "sqlite+aiosqlite:///./food_tracker_test.db")
-    
+    DATABASE_URL: str = "sqlite+aiosqlite:///./food_tracker.db"
+    DATABASE_TEST_URL: str = "sqlite+aiosqlite:///./food_tracker_test.db"
+    SQL_ECHO: bool = False
+    # Development convenience only; use `alembic upgrade head` in production
+    AUTO_CREATE_TABLES: bool = False
+
+    # Connection pool, per process (serve.py runs one per worker)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = -1  # seconds; -1 keeps connections indefinitely
+    DB_POOL_PRE_PING: bool = False
+
+    # SQLite pragmas, applied to every new connection ('' or 0 keeps SQLite's default)
+    SQLITE_JOURNAL_MODE: str = "WAL"  # readers do not block the writer
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # durable with WAL except on power loss
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # wait for other workers' write locks
+    SQLITE_CACHE_SIZE_KB: int = 8192
+    SQLITE_MMAP_SIZE_MB: int = 0
+
     # Security
-    SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
+    SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
-    
+
     # CORS
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8080"]
-    
+
     # Notifications
-    NOTIFICATION_DAYS_BEFORE: int = 3
+    NOTIFICATION_DAYS_BEFORE: int = 3  # for users without their own notification_days
+    NOTIFICATION_MAX_DAYS_BEFORE: int = 30
     EMAIL_ENABLED: bool = True
     PUSH_ENABLED: bool = True
-    
+
+    # Per-user delivery schedule (users without preferences get these)
+    NOTIFICATION_DEFAULT_TIMEZONE: str = "UTC"
+    NOTIFICATION_DEFAULT_DELIVERY_HOUR: int = 9
+    SCHEDULER_BUCKET_SECONDS: int = 60
+    SCHEDULER_MAX_BATCH_USERS: int = 500
+    SCHEDULER_REFRESH_SECONDS: int = 300
+    SCHEDULER_RETRY_SECONDS: int = 300
+
+    # Notification history retention
+    NOTIFICATION_RETENTION_DAYS: int = 90
+    NOTIFICATION_ARCHIVE_DIR: str = "archive/notifications"
+    NOTIFICATION_ARCHIVE_BATCH_SIZE: int = 5000
+    NOTIFICATION_COMPACTION_INTERVAL_HOURS: int = 24
+    NOTIFICATION_PAGE_SIZE: int = 20
+    NOTIFICATION_MAX_PAGE_SIZE: int = 100
+
+    # Bulk import/export
+    EXPORT_BATCH_SIZE: int = 1000
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_MAX_ERRORS: int = 100
+
+    # Product search
+    SEARCH_DEFAULT_LIMIT: int = 20
+    SEARCH_MAX_LIMIT: int = 100
+    SEARCH_MAX_TERMS: int = 8
+    SEARCH_MAX_CORRECTIONS: int = 20
+    SEARCH_VOCABULARY_SECONDS: float = 300.0
+
+    # Analytics aggregates
+    ANALYTICS_DEFAULT_WEEKS: int = 8
+    ANALYTICS_MAX_WEEKS: int = 52
+    ANALYTICS_REBUILD_BATCH_USERS: int = 1000
+    ANALYTICS_REBUILD_TIMEOUT_SECONDS: int = 3600  # a rebuild claimed longer ago is presumed dead
+
+    # Process model (serve.py)
+    WEB_CONCURRENCY: int = 0  # 0 = one worker per CPU core
+    THREADPOOL_SIZE: int = 40  # threads per worker for sync endpoints
+    WORKER_GRACEFUL_TIMEOUT: float = 30.0
+    SCHEDULER_METRICS_HOST: str = "127.0.0.1"
+    SCHEDULER_METRICS_PORT: int = 9101  # the scheduler's own /metrics; 0 = off
+    USER_CACHE_SECONDS: float = 60.0
+    USER_CACHE_SIZE: int = 10000
+
+    # Health probes
+    HEALTH_CACHE_SECONDS: float = 5.0
+    HEALTH_DB_TIMEOUT_SECONDS: float = 2.0
+    HEALTH_SMTP_TIMEOUT_SECONDS: float = 2.0
+    HEALTH_MIN_POOL_HEADROOM: int = 1
+    SCHEDULER_HEARTBEAT_FILE: str = "scheduler.heartbeat"
+    SCHEDULER_MAX_LAG_SECONDS: int = 2 * 3600
+
+    # Rate limiting (token buckets; cost = tokens per request)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STORE: str = "memory"  # or sqlite:///path shared by workers
+    # Peers whose X-Forwarded-For is honoured (addresses or CIDR ranges),
+    # e.g. the local reverse proxy; other peers are limited by their own IP
+    RATE_LIMIT_TRUSTED_PROXIES: List[str] = ["127.0.0.1", "::1"]
+    # Requests with a valid access token are limited per user; the IP
+    # buckets cover the anonymous ones (login, registration)
+    RATE_LIMIT_IP_PER_SECOND: float = 20.0
+    RATE_LIMIT_IP_BURST: float = 200.0
+    RATE_LIMIT_USER_PER_SECOND: float = 5.0
+    RATE_LIMIT_USER_BURST: float = 50.0
+    RATE_LIMIT_ROUTE_COSTS: Dict[str, float] = {
+        "POST /api/v1/auth/login": 10,
+        "POST /api/v1/products/scan": 5,
+        "POST /api/v1/products/import": 25,
+        "POST /api/v1/notifications/test": 25,
+    }
+    RATE_LIMIT_EXEMPT_PATHS: List[str] = ["/health", "/metrics"]  # and everything below them
+
+    # Profiling and slow query log
+    ADMIN_TOKEN: str = ""
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_HEADER: str = "X-Profile"
+    PROFILING_BUFFER_SIZE: int = 100
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+
+    # Event stream (Server-Sent Events)
+    STREAM_HEARTBEAT_SECONDS: int = 25
+    STREAM_RETRY_MS: int = 5000
+    STREAM_QUEUE_SIZE: int = 100
+    STREAM_MAX_CONNECTIONS: int = 10000
+
     # Email Settings
-    SMTP_SERVER: str = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+    SMTP_SERVER: str = "smtp.gmail.com"
     SMTP_PORT: int = 587
-    SMTP_USERNAME: str = os.getenv("SMTP_USERNAME", "")
-    SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
-    EMAIL_FROM: str = os.getenv("EMAIL_FROM", "noreply@foodtracker.com")
-    
+    SMTP_USE_TLS: bool = True
+    SMTP_USERNAME: str = ""
+    SMTP_PASSWORD: str = ""
+    EMAIL_FROM: str = "noreply@foodtracker.com"
+
+    EMAIL_TEMPLATE_CACHE_DIR: str = ".cache/jinja2"
+
     # Firebase (Push Notifications)
     FIREBASE_CREDENTIALS_PATH: str = "firebase-credentials.json"
-    
+    FIREBASE_PROJECT_ID: str = ""  # defaults to the service account's project
+    PUSH_PROVIDER_URL: str = "https://fcm.googleapis.com"
+    PUSH_MULTICAST_LIMIT: int = 500
+    PUSH_MAX_CONCURRENCY: int = 16
+
     # Barcode API
     BARCODE_API_URL: str = "https://api.barcodespider.com/v1"
     BARCODE_API_KEY: str = ""
-    
+
     # File Storage
     STATIC_FILES_DIR: str = "static"
     MAX_FILE_SIZE: int = 5 * 1024 * 1024  # 5MB
     ALLOWED_IMAGE_TYPES: List[str] = ["image/jpeg", "image/png", "image/jpg"]
-    
+
     # External APIs
     OPEN_FOOD_FACTS_API: str = "https://world.openfoodfacts.org/api/v0/product/"
 
+    # Settings read each time they are used, so a reload applies them at
+    # once. Anything used to build the engine, middleware, routes or
+    # long-lived clients is missing here and needs a restart.
+    RELOADABLE: FrozenSet[str] = frozenset({
+        "NOTIFICATION_DAYS_BEFORE",
+        "SCHEDULER_MAX_BATCH_USERS", "SCHEDULER_REFRESH_SECONDS", "SCHEDULER_RETRY_SECONDS",
+        "NOTIFICATION_RETENTION_DAYS", "NOTIFICATION_ARCHIVE_BATCH_SIZE",
+        "EXPORT_BATCH_SIZE", "IMPORT_BATCH_SIZE", "IMPORT_MAX_ERRORS",
+        "SEARCH_MAX_TERMS", "SEARCH_MAX_CORRECTIONS", "SEARCH_VOCABULARY_SECONDS",
+        "ANALYTICS_REBUILD_BATCH_USERS", "ANALYTICS_REBUILD_TIMEOUT_SECONDS",
+        "USER_CACHE_SECONDS",
+        "HEALTH_CACHE_SECONDS", "HEALTH_DB_TIMEOUT_SECONDS", "HEALTH_SMTP_TIMEOUT_SECONDS",
+        "HEALTH_MIN_POOL_HEADROOM", "SCHEDULER_MAX_LAG_SECONDS",
+        "RATE_LIMIT_TRUSTED_PROXIES", "RATE_LIMIT_IP_PER_SECOND", "RATE_LIMIT_IP_BURST",
+        "RATE_LIMIT_USER_PER_SECOND", "RATE_LIMIT_USER_BURST", "RATE_LIMIT_ROUTE_COSTS",
+        "RATE_LIMIT_EXEMPT_PATHS",
+        "PROFILING_SAMPLE_RATE", "SLOW_QUERY_THRESHOLD_MS",
+        "SMTP_SERVER", "SMTP_PORT", "SMTP_USE_TLS", "SMTP_USERNAME", "SMTP_PASSWORD", "EMAIL_FROM",
+    })
+
+    def __init__(self):
+        self._listeners: List[Callable[[FrozenSet[str]], None]] = []
+        for name, value in self._load().items():
+            setattr(self, name, value)
+
+    @classmethod
+    def fields(cls) -> Dict[str, Any]:
+        """Setting names and their types"""
+        hints = get_type_hints(cls)
+        hints.pop("RELOADABLE")
+        return hints
+
+    def _load(self) -> Dict[str, Any]:
+        """Every setting: the environment, else .env, else the default"""
+        env_file = {name: value for name, value in dotenv_values(ENV_FILE).items() if value is not None}
+        source = {**env_file, **os.environ}
+        values = {
+            name: _parse(name, kind, source[name]) if name in source else getattr(type(self), name)
+            for name, kind in self.fields().items()
+        }
+        _validate(values)
+        return values
+
+    def on_reload(self, listener: Callable[[FrozenSet[str]], None]) -> Callable[[FrozenSet[str]], None]:
+        """Call listener with the changed names after each reload that changes something
+
+        Usable as a decorator.
+        """
+        self._listeners.append(listener)
+        return listener
+
+    def reload(self) -> FrozenSet[str]:
+        """Re-read the environment and .env and apply the RELOADABLE settings
+
+        An invalid value leaves every setting as it was.
+        """
+        try:
+            values = self._load()
+        except ValueError as e:
+            logger.error(f"Settings not reloaded: {str(e)}")
+            return frozenset()
+        changed = frozenset(name for name, value in values.items() if value != getattr(self, name))
+        for name in sorted(changed - self.RELOADABLE):
+            logger.warning(f"{name} changed; restart to apply it")
+        applied = changed & self.RELOADABLE
+        for name in applied:
+            setattr(self, name, values[name])
+        if applied:
+            logger.info(f"Reloaded settings: {', '.join(sorted(applied))}")
+            for listener in self._listeners:
+                listener(applied)
+        return applied
+
 
 settings = Settings()
+
+
+def handle_reload_signal() -> None:
+    """Reload settings on SIGHUP; call from inside the process's event loop"""
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, settings.reload)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        # No SIGHUP on Windows, and only the main thread can take signals
+        logger.debug("Settings reload on SIGHUP is not available here")
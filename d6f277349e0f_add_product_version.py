@@ -0,0 +1,27 @@
+"""Add product version
+
+Revision ID: d6f277349e0f
+Revises: ea9c03a292ec
+Create Date: 2026-10-19 09:07:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6f277349e0f'
+down_revision = 'ea9c03a292ec'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Optimistic-concurrency version for PATCH /products/{id}
+    op.add_column('products', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    # Not a batch operation: recreating the table would drop the search and
+    # aggregate triggers on it (SQLite supports DROP COLUMN since 3.35)
+    op.drop_column('products', 'version')
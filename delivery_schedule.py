@@ -0,0 +1,146 @@
+"""
+Per-user delivery schedule for expiration reminders
+
+Each user gets their reminders once a day at a preferred local hour. The
+scheduler keeps every user in a min-heap keyed by their next delivery
+time and pops them in small time buckets, so sends follow the users'
+clocks around the day instead of piling up at the top of each hour.
+"""
+
+import heapq
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.config import settings
+
+
+@lru_cache(maxsize=None)
+def get_zone(name: Optional[str]) -> ZoneInfo:
+    """Get a user's timezone, falling back to the default for unknown names"""
+    try:
+        return ZoneInfo(name or settings.NOTIFICATION_DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(settings.NOTIFICATION_DEFAULT_TIMEZONE)
+
+
+def local_today(zone_name: Optional[str], now: Optional[datetime] = None) -> date:
+    """Current date in the user's timezone"""
+    return (now or datetime.now(timezone.utc)).astimezone(get_zone(zone_name)).date()
+
+
+def delivery_offset(user_id: int) -> timedelta:
+    """Stable offset within the delivery hour, spreading users evenly over it"""
+    # Multiplicative hashing scatters consecutive ids across the hour
+    return timedelta(seconds=(user_id * 2654435761) % 3600)
+
+
+def next_delivery(
+    user_id: int,
+    zone_name: Optional[str],
+    delivery_hour: Optional[int],
+    after: datetime,
+    not_on: Optional[date] = None
+) -> datetime:
+    """Next UTC time after `after` at the user's local delivery hour
+
+    `not_on` skips a local date that has already been delivered.
+    """
+    zone = get_zone(zone_name)
+    if delivery_hour is None:
+        delivery_hour = settings.NOTIFICATION_DEFAULT_DELIVERY_HOUR
+    day = after.astimezone(zone).date()
+    while True:
+        due = datetime.combine(day, dt_time(delivery_hour), tzinfo=zone) + delivery_offset(user_id)
+        due = due.astimezone(timezone.utc)
+        if due > after and day != not_on:
+            return due
+        day += timedelta(days=1)
+
+
+class DeliveryQueue:
+    """Users ordered by their next delivery time
+
+    Rescheduling pushes a new heap entry and leaves the old one behind;
+    stale entries are recognised by their time and skipped when popped.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int]] = []
+        self._due: Dict[int, float] = {}
+        self._preferences: Dict[int, Tuple[Optional[str], Optional[int]]] = {}
+        self._delivered_on: Dict[int, date] = {}
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def set_preferences(
+        self,
+        user_id: int,
+        zone_name: Optional[str],
+        delivery_hour: Optional[int],
+        now: datetime
+    ) -> None:
+        """Add a user or apply changed timezone/delivery hour"""
+        preferences = (zone_name, delivery_hour)
+        if self._preferences.get(user_id) == preferences and user_id in self._due:
+            return
+        self._preferences[user_id] = preferences
+        self._schedule(user_id, next_delivery(
+            user_id, zone_name, delivery_hour, now, self._delivered_on.get(user_id)
+        ))
+
+    def remove(self, user_id: int) -> None:
+        self._due.pop(user_id, None)
+        self._preferences.pop(user_id, None)
+        self._delivered_on.pop(user_id, None)
+
+    def next_due(self) -> Optional[float]:
+        """Timestamp of the earliest delivery, if any"""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, until: float, limit: int) -> List[int]:
+        """Remove and return up to `limit` users due at or before `until`"""
+        user_ids = []
+        while len(user_ids) < limit:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > until:
+                break
+            _, user_id = heapq.heappop(self._heap)
+            del self._due[user_id]
+            user_ids.append(user_id)
+        return user_ids
+
+    def mark_delivered(self, user_ids: List[int], now: datetime) -> None:
+        """Record today's delivery and schedule each user for their next local day"""
+        for user_id in user_ids:
+            if user_id not in self._preferences:
+                continue
+            zone_name, delivery_hour = self._preferences[user_id]
+            delivered_on = local_today(zone_name, now)
+            self._delivered_on[user_id] = delivered_on
+            self._schedule(user_id, next_delivery(
+                user_id, zone_name, delivery_hour, now, delivered_on
+            ))
+
+    def retry(self, user_ids: List[int], at: datetime) -> None:
+        """Put users back after a failed sweep"""
+        for user_id in user_ids:
+            if user_id in self._preferences:
+                self._schedule(user_id, at)
+
+    def _schedule(self, user_id: int, due: datetime) -> None:
+        timestamp = due.timestamp()
+        if self._due.get(user_id) == timestamp:
+            return
+        self._due[user_id] = timestamp
+        heapq.heappush(self._heap, (timestamp, user_id))
+        if len(self._heap) > 2 * len(self._due) + 1024:
+            self._heap = [(timestamp, user_id) for user_id, timestamp in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def _drop_stale(self) -> None:
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
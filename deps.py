@@ -0,0 +1,88 @@
+"""
+Shared API dependencies
+"""
+
+from typing import Optional
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.config import settings
+from app.database.session import get_db
+from app.models.user import User
+from app.services.auth import verify_token, get_user_by_username
+from app.utils.cache import LocalCache
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+
+# Column values of authenticated users by username, so token checks skip
+# the user query; invalidated on every committed change to a user
+user_cache = LocalCache("users", ttl=settings.USER_CACHE_SECONDS, maxsize=settings.USER_CACHE_SIZE)
+
+
+@settings.on_reload
+def _update_user_cache_ttl(changed):
+    user_cache.ttl = settings.USER_CACHE_SECONDS
+
+
+def _load_user(db: Session, username: str) -> Optional[User]:
+    values = user_cache.get(username)
+    if values is not None:
+        user = User(**values)
+        make_transient_to_detached(user)
+        # Attaches the cached row to this session without a SELECT
+        return db.merge(user, load=False)
+
+    user = get_user_by_username(db, username)
+    if user is not None:
+        user_cache.set(username, {
+            attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs
+        })
+    return user
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    # Both the old and new username if it was renamed
+    usernames = {target.username, *inspect(target).attrs.username.history.deleted}
+    inspect(target).session.info.setdefault("stale_usernames", set()).update(usernames)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_users(session):
+    for username in session.info.pop("stale_usernames", ()):
+        user_cache.invalidate(username)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_stale_users(session):
+    session.info.pop("stale_usernames", None)
+
+
+def get_user_from_token(db: Session, token: str) -> User:
+    """Resolve an access token to an active user"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    payload = verify_token(token)
+    if payload is None:
+        raise credentials_exception
+
+    user = _load_user(db, payload.get("sub"))
+    if user is None or not user.is_active:
+        raise credentials_exception
+    return user
+
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> User:
+    """Get the currently authenticated user"""
+    return get_user_from_token(db, token)
@@ -0,0 +1,32 @@
+"""
+Device token model for push notifications
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.models import Base
+
+
+class DeviceToken(Base):
+    """Push notification token registered by a user's device"""
+    
+    __tablename__ = "device_tokens"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token = Column(String(512), nullable=False, unique=True)
+    provider = Column(String(20), nullable=False, default="fcm")
+    platform = Column(String(20), nullable=True)  # 'android', 'ios', 'web'
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_seen_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "token": self.token,
+            "provider": self.provider,
+            "platform": self.platform,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
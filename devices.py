@@ -0,0 +1,50 @@
+"""
+Device token registration endpoints for push notifications
+"""
+
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user
+from app.database.session import get_db
+from app.models.device_token import DeviceToken
+from app.models.user import User
+from app.schemas.notification import DeviceTokenCreate, DeviceTokenResponse
+
+router = APIRouter()
+
+
+@router.post("/devices", response_model=DeviceTokenResponse, status_code=status.HTTP_201_CREATED)
+def register_device(
+    device: DeviceTokenCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Register (or re-assign) a device token for the current user"""
+    device_token = db.query(DeviceToken).filter(DeviceToken.token == device.token).first()
+    if device_token is None:
+        device_token = DeviceToken(token=device.token)
+        db.add(device_token)
+
+    # A token belongs to whichever user last signed in on the device
+    device_token.user_id = current_user.id
+    device_token.provider = device.provider
+    device_token.platform = device.platform
+
+    db.commit()
+    db.refresh(device_token)
+    return device_token
+
+
+@router.delete("/devices/{token}", status_code=status.HTTP_204_NO_CONTENT)
+def unregister_device(
+    token: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Remove a device token, e.g. on logout"""
+    db.query(DeviceToken).filter(
+        DeviceToken.token == token,
+        DeviceToken.user_id == current_user.id
+    ).delete(synchronize_session=False)
+    db.commit()
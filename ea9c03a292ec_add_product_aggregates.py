@@ -0,0 +1,53 @@
+"""Add product aggregates
+
+Revision ID: ea9c03a292ec
+Revises: ce21fac99fe0
+Create Date: 2026-10-19 09:06:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.aggregates import install_aggregates
+
+
+# revision identifiers, used by Alembic.
+revision = 'ea9c03a292ec'
+down_revision = 'ce21fac99fe0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'product_aggregates',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('dimension', sa.String(length=16), nullable=False),
+        sa.Column('bucket', sa.String(length=255), nullable=False),
+        sa.Column('active_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('consumed_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('expired_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('shelf_life_days', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('shelf_life_count', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'dimension', 'bucket'),
+    )
+    op.create_table(
+        'product_aggregate_watermark',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('expired_before', sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # Watermark, maintenance triggers and the counts of existing products
+    install_aggregates(op.get_bind())
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        for operation in ('insert', 'update', 'delete'):
+            op.execute(f'DROP TRIGGER IF EXISTS products_aggregate_{operation}')
+    else:
+        op.execute('DROP TRIGGER IF EXISTS products_aggregate ON products')
+        op.execute('DROP FUNCTION IF EXISTS products_aggregate()')
+    op.drop_table('product_aggregate_watermark')
+    op.drop_table('product_aggregates')
@@ -0,0 +1,34 @@
+"""Add expiration sweep indexes
+
+Revision ID: ec76b9765ed7
+Revises: b1635a01d716
+Create Date: 2026-10-19 09:04:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ec76b9765ed7'
+down_revision = 'b1635a01d716'
+branch_labels = None
+depends_on = None
+
+# Spelled as the sweep query compiles is_active == True, so SQLite can
+# match the partial index predicate
+ACTIVE = {'sqlite_where': sa.text('is_active = 1'), 'postgresql_where': sa.text('is_active = true')}
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_products_active_user_id_expiration_date', 'products', ['user_id', 'expiration_date'], **ACTIVE
+    )
+    op.create_index(
+        'ix_products_active_expiration_date_user_id', 'products', ['expiration_date', 'user_id'], **ACTIVE
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_active_expiration_date_user_id', table_name='products')
+    op.drop_index('ix_products_active_user_id_expiration_date', table_name='products')
@@ -0,0 +1,153 @@
+"""
+Precompiled Jinja2 email templates and prebuilt MIME envelopes
+"""
+
+import base64
+import os
+from email.header import Header
+from email.utils import formatdate, make_msgid
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional, Tuple
+
+from markupsafe import Markup
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    from jinja2 import Environment, Template
+
+EMAIL_STYLE = Markup("""
+        <style>
+            body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+            .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+            .header { background-color: #f44336; color: white; padding: 20px; text-align: center; }
+            .content { background-color: #f9f9f9; padding: 20px; border-radius: 5px; }
+            .product-info { background-color: white; padding: 15px; margin: 15px 0; border-radius: 5px; }
+            .footer { text-align: center; color: #666; font-size: 12px; margin-top: 20px; }
+        </style>""")
+
+EXPIRATION_TEMPLATE = """
+    <html>
+    <head>{{ style }}
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>Food Expiration Alert</h1>
+            </div>
+            <div class="content">
+                <p>Hello,</p>
+                <p>This is a reminder that one of your food items is approaching its expiration date:</p>
+
+                <div class="product-info">
+                    <h3>{{ product.name }}</h3>
+                    <p><strong>Expires in:</strong> {{ days_until }} days</p>
+                    <p><strong>Expiration Date:</strong> {{ product.expiration_date }}</p>
+                    {% if product.shop_name %}<p><strong>Shop:</strong> {{ product.shop_name }}</p>{% endif %}
+                    {% if product.amount and product.unit %}<p><strong>Amount:</strong> {{ product.amount }} {{ product.unit }}</p>{% endif %}
+                </div>
+
+                <p>Please check your food items and consider using them soon or disposing of them properly.</p>
+            </div>
+            <div class="footer">
+                <p>This is an automated message from your Food Expiration Tracker app.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+TEMPLATES = {
+    "expiration.html": EXPIRATION_TEMPLATE,
+}
+
+
+@lru_cache(maxsize=None)
+def get_environment() -> "Environment":
+    """Build the template environment once per process"""
+    from jinja2 import DictLoader, Environment, FileSystemBytecodeCache, select_autoescape
+
+    bytecode_cache = None
+    if settings.EMAIL_TEMPLATE_CACHE_DIR:
+        os.makedirs(settings.EMAIL_TEMPLATE_CACHE_DIR, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(settings.EMAIL_TEMPLATE_CACHE_DIR)
+
+    env = Environment(
+        loader=DictLoader(TEMPLATES),
+        autoescape=select_autoescape(default=True),
+        bytecode_cache=bytecode_cache,
+        auto_reload=False,
+    )
+    env.globals["style"] = EMAIL_STYLE
+    return env
+
+
+@lru_cache(maxsize=None)
+def get_template(name: str) -> "Template":
+    """Get a compiled template, compiling it on first use only"""
+    return get_environment().get_template(name)
+
+
+def load_templates() -> None:
+    """Compile every email template up front (called at scheduler startup)"""
+    for name in TEMPLATES:
+        get_template(name)
+
+
+def render_expiration_email(product: Any, days_until: int) -> str:
+    """Render the expiration reminder for a single product"""
+    return get_template("expiration.html").render(product=product, days_until=days_until)
+
+
+def render_expiration_batch(items: Iterable[Tuple[Any, int]]) -> List[str]:
+    """Render expiration reminders for a whole sweep in one call"""
+    render = get_template("expiration.html").render
+    return [render(product=product, days_until=days_until) for product, days_until in items]
+
+
+@lru_cache(maxsize=None)
+def _envelope_headers() -> str:
+    """Headers shared by every outgoing message"""
+    return (
+        f"From: {settings.EMAIL_FROM}\r\n"
+        "MIME-Version: 1.0\r\n"
+        'Content-Type: text/html; charset="utf-8"\r\n'
+        "Content-Transfer-Encoding: base64\r\n"
+    )
+
+
+@lru_cache(maxsize=None)
+def _message_id_domain() -> str:
+    # make_msgid() without a domain resolves the FQDN on every call
+    return settings.EMAIL_FROM.rpartition("@")[2] or "localhost"
+
+
+@settings.on_reload
+def _clear_sender_caches(changed):
+    if "EMAIL_FROM" in changed:
+        _envelope_headers.cache_clear()
+        _message_id_domain.cache_clear()
+
+
+@lru_cache(maxsize=256)
+def _encode_subject(subject: str) -> str:
+    return Header(subject, "utf-8").encode() if not subject.isascii() else subject
+
+
+def build_email_message(to_email: str, subject: str, html: str,
+                        message_id: Optional[str] = None) -> str:
+    """Assemble a ready-to-send message from the prebuilt envelope
+
+    Equivalent to a single-part MIMEText message, without building and
+    flattening an email.message tree for every recipient.
+    """
+    body = base64.encodebytes(html.encode("utf-8")).decode("ascii").replace("\n", "\r\n")
+    return (
+        f"{_envelope_headers()}"
+        f"To: {to_email}\r\n"
+        f"Subject: {_encode_subject(subject)}\r\n"
+        f"Date: {formatdate(localtime=False, usegmt=True)}\r\n"
+        f"Message-ID: {message_id or make_msgid(domain=_message_id_domain())}\r\n"
+        "\r\n"
+        f"{body}"
+    )
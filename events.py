@@ -0,0 +1,211 @@
+"""
+In-process event bus for pushing product and notification changes to clients
+"""
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from app.config import settings
+from app.models.product import Product
+from app.utils import channel
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_CHANGED = "product.changed"
+NOTIFICATION_CREATED = "notification.created"
+RELAYED_EVENT = "stream.event"
+
+
+class Subscription:
+    """A single client connection listening for one user's events"""
+
+    __slots__ = ("user_id", "queue", "loop", "dropped")
+
+    def __init__(self, user_id: int, maxsize: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.loop = asyncio.get_running_loop()
+        self.dropped = 0
+
+    def offer(self, message: str) -> None:
+        """Queue a message from any thread"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._put(message)
+        else:
+            # Sync route handlers run in the threadpool
+            self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message: str) -> None:
+        """Queue a message, dropping the oldest one if the client is slow"""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(message)
+
+
+class EventBroker:
+    """In-process publish/subscribe broker keyed by user ID
+
+    Subclasses can override ``forward`` to relay published events to a
+    broker shared between workers and call ``deliver`` for events that
+    arrive from it.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscriptions: Dict[int, Set[Subscription]] = defaultdict(set)
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(subs) for subs in self._subscriptions.values())
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """Register a new subscription for a user"""
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscription"""
+        subs = self._subscriptions.get(subscription.user_id)
+        if subs is None:
+            return
+        subs.discard(subscription)
+        if not subs:
+            del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id: int, event_type: str, data: Dict[str, Any]) -> None:
+        """Publish an event to every connection of a user"""
+        message = format_event(event_type, data)
+        self.deliver(user_id, message)
+        self.forward(user_id, message)
+
+    def deliver(self, user_id: int, message: str) -> None:
+        """Hand an encoded event to the local subscriptions of a user"""
+        for subscription in tuple(self._subscriptions.get(user_id, ())):
+            subscription.offer(message)
+
+    def forward(self, user_id: int, message: str) -> None:
+        """Relay an encoded event to other workers (no-op in-process)"""
+
+
+class ChannelEventBroker(EventBroker):
+    """Broker that relays events to the other processes started by serve.py
+
+    Clients of one user may be connected to different workers, and
+    notifications are created in the scheduler process.
+    """
+
+    def forward(self, user_id: int, message: str) -> None:
+        channel.broadcast(RELAYED_EVENT, {"user_id": user_id, "message": message})
+
+
+def format_event(event_type: str, data: Dict[str, Any]) -> str:
+    """Encode an event as a Server-Sent Events frame"""
+    payload = json.dumps(data, default=_json_default, separators=(",", ":"))
+    return f"event: {event_type}\ndata: {payload}\n\n"
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime) or hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+broker = EventBroker(queue_size=settings.STREAM_QUEUE_SIZE)
+
+
+def set_broker(new_broker: EventBroker) -> None:
+    """Replace the process-wide broker (e.g. with one backed by a local broker)"""
+    global broker
+    broker = new_broker
+
+
+def _deliver_relayed(data: Dict[str, Any]) -> None:
+    broker.deliver(data["user_id"], data["message"])
+
+
+channel.subscribe(RELAYED_EVENT, _deliver_relayed)
+
+
+def publish_product_changed(user_id: int, product_id: int, action: str,
+                            product: Optional[Dict[str, Any]] = None) -> None:
+    """Notify a user's clients that one of their products changed"""
+    try:
+        broker.publish(user_id, PRODUCT_CHANGED, {
+            "product_id": product_id,
+            "action": action,
+            "product": product,
+        })
+    except Exception as e:
+        logger.error(f"Failed to publish product event for user {user_id}: {str(e)}")
+
+
+def _queue_product_change(target: Product, action: str, connection=None) -> None:
+    state = inspect(target)
+    values = None
+    if action != "deleted":
+        values = {
+            attr.key: state.dict[attr.key] for attr in state.mapper.column_attrs if attr.key in state.dict
+        }
+        # Columns the flush set in SQL (the version bump, updated_at) are
+        # expired; read them on the flush's connection, since loading them
+        # through the session here would start another flush
+        missing = [attr for attr in state.mapper.column_attrs if attr.key not in values]
+        if missing:
+            row = connection.execute(
+                select(*(attr.columns[0] for attr in missing)).where(Product.id == target.id)
+            ).one()
+            values.update(zip((attr.key for attr in missing), row))
+    object_session(target).info.setdefault("product_changes", []).append(
+        (target.user_id, target.id, action, values)
+    )
+
+
+@event.listens_for(Product, "after_insert")
+def _product_created(mapper, connection, target):
+    _queue_product_change(target, "created", connection)
+
+
+@event.listens_for(Product, "after_update")
+def _product_updated(mapper, connection, target):
+    _queue_product_change(target, "updated", connection)
+
+
+@event.listens_for(Product, "after_delete")
+def _product_deleted(mapper, connection, target):
+    _queue_product_change(target, "deleted")
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_product_changes(session):
+    # Clients only hear about committed changes
+    for user_id, product_id, action, values in session.info.pop("product_changes", ()):
+        publish_product_changed(user_id, product_id, action, values)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_product_changes(session):
+    session.info.pop("product_changes", None)
+
+
+def publish_notification_created(user_id: int, notification: Dict[str, Any]) -> None:
+    """Notify a user's clients that a notification was created"""
+    try:
+        broker.publish(user_id, NOTIFICATION_CREATED, notification)
+    except Exception as e:
+        logger.error(f"Failed to publish notification event for user {user_id}: {str(e)}")
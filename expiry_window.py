@@ -0,0 +1,86 @@
+"""
+Set-based selection of products inside each owner's reminder window
+"""
+
+from datetime import date, timedelta
+from typing import List, Optional
+
+from sqlalchemy import Index, func, literal, select
+
+from app.config import settings
+from app.models.product import Product
+from app.models.user import User
+from app.models.user_settings import UserSettings
+
+# Bucketed sweeps seek each owner's active products by expiry date
+products_owner_expiry_index = Index(
+    "ix_products_active_user_id_expiration_date",
+    Product.user_id,
+    Product.expiration_date,
+    sqlite_where=Product.is_active == True,
+    postgresql_where=Product.is_active == True,
+)
+
+# Full sweeps range-scan the active products expiring soon; user_id is
+# included so the join to the owner needs no table lookup
+products_expiry_index = Index(
+    "ix_products_active_expiration_date_user_id",
+    Product.expiration_date,
+    Product.user_id,
+    sqlite_where=Product.is_active == True,
+    postgresql_where=Product.is_active == True,
+)
+
+SWEEP_INDEXES = [products_owner_expiry_index, products_expiry_index]
+
+
+def _notification_days():
+    return func.coalesce(UserSettings.notification_days, settings.NOTIFICATION_DAYS_BEFORE)
+
+
+# Each dialect's spelling of "date + notification_days days"
+_WINDOW_END = {
+    "sqlite": lambda start: func.date(
+        start.isoformat(), literal("+").concat(_notification_days()).concat(" days")
+    ),
+    "postgresql": lambda start: literal(start) + _notification_days(),
+}
+
+
+def window_days(user_settings: UserSettings) -> int:
+    """Days ahead a user wants to be reminded of, capped like the query"""
+    days = user_settings.notification_days
+    if days is None:
+        days = settings.NOTIFICATION_DAYS_BEFORE
+    return min(days, settings.NOTIFICATION_MAX_DAYS_BEFORE)
+
+
+def expiring_products_query(
+    dialect_name: str,
+    utc_today: date,
+    user_ids: Optional[List[int]] = None
+):
+    """Select (Product, User, UserSettings) rows inside their owner's window
+
+    One statement covers every user: the window is a join predicate on
+    user_settings.notification_days. The constant bounds a day either side
+    of the UTC date cover every timezone's local today and let the index
+    range-scan; callers narrow each row to its owner's local date.
+    """
+    start = utc_today - timedelta(days=1)
+    end = utc_today + timedelta(days=1)
+    query = (
+        select(Product, User, UserSettings)
+        .join(User, Product.user_id == User.id)
+        .join(UserSettings, User.id == UserSettings.user_id)
+        .where(
+            Product.is_active == True,
+            User.is_active == True,
+            Product.expiration_date >= start,
+            Product.expiration_date <= end + timedelta(days=settings.NOTIFICATION_MAX_DAYS_BEFORE),
+            Product.expiration_date <= _WINDOW_END[dialect_name](end)
+        )
+    )
+    if user_ids is not None:
+        query = query.where(Product.user_id.in_(user_ids))
+    return query
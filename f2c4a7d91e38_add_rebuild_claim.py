@@ -0,0 +1,30 @@
+"""Add rebuild claim to the aggregate watermark
+
+Revision ID: f2c4a7d91e38
+Revises: d6f277349e0f
+Create Date: 2026-10-19 11:42:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c4a7d91e38'
+down_revision = 'd6f277349e0f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Start time of the running analytics rebuild, shared by all processes
+    op.add_column(
+        'product_aggregate_watermark',
+        sa.Column('rebuild_started_at', sa.DateTime(timezone=True), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    # Not a batch operation: recreating the table would break the product
+    # triggers that read it (SQLite supports DROP COLUMN since 3.35)
+    op.drop_column('product_aggregate_watermark', 'rebuild_started_at')
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Local FCM HTTP v1 endpoint for development and benchmarks
+
+Serves POST /v1/projects/{project_id}/messages:send like the real API:
+a bearer token is required, success returns the message name, tokens
+starting with "invalid" get 404 NOT_FOUND with FcmError UNREGISTERED, and
+a message without a token gets 400 INVALID_ARGUMENT.
+
+Usage:
+    python fcm_stub.py --port 9099
+    PUSH_PROVIDER_URL=http://127.0.0.1:9099 FIREBASE_PROJECT_ID=stub-project uvicorn app.main:app
+
+The server still needs service-account credentials to mint tokens; in
+benchmarks, install an FCMProvider built with StubCredentials instead.
+"""
+
+import argparse
+import itertools
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+PROJECT_ID = "stub-project"
+
+SEND_PATH = re.compile(r"^/v1/projects/(?P<project>[^/]+)/messages:send$")
+
+FCM_ERROR_TYPE = "type.googleapis.com/google.firebase.fcm.v1.FcmError"
+
+
+class StubCredentials:
+    """Stands in for google-auth service-account credentials"""
+
+    token = "stub-access-token"
+    valid = True
+
+    def refresh(self, request) -> None:
+        pass
+
+
+def _error(code: int, status: str, message: str, fcm_code: str = None) -> Tuple[int, dict]:
+    error = {"code": code, "message": message, "status": status}
+    if fcm_code:
+        error["details"] = [{"@type": FCM_ERROR_TYPE, "errorCode": fcm_code}]
+    return code, {"error": error}
+
+
+class FCMStubHandler(BaseHTTPRequestHandler):
+    """Request handler implementing messages:send"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real provider
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    message_ids = itertools.count(1)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        match = SEND_PATH.match(self.path)
+        message = payload.get("message") or {}
+        if match is None:
+            code, body = _error(404, "NOT_FOUND", "Unknown method")
+        elif not self.headers.get("Authorization", "").startswith("Bearer "):
+            code, body = _error(401, "UNAUTHENTICATED", "Request is missing a valid access token")
+        elif not message.get("token"):
+            code, body = _error(400, "INVALID_ARGUMENT", "Message has no target", "INVALID_ARGUMENT")
+        elif message["token"].startswith("invalid"):
+            code, body = _error(404, "NOT_FOUND", "Requested entity was not found.", "UNREGISTERED")
+        else:
+            code = 200
+            body = {"name": f"projects/{match.group('project')}/messages/{next(self.message_ids)}"}
+            with self.server.lock:
+                self.server.messages_received += 1
+
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _create_server(host: str, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), FCMStubHandler)
+    server.daemon_threads = True
+    server.messages_received = 0
+    server.lock = threading.Lock()
+    return server
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stub in a background thread; returns the server and its base URL"""
+    server = _create_server(host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local FCM HTTP v1 endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9099)
+    args = parser.parse_args()
+
+    server = _create_server(args.host, args.port)
+    print(f"FCM stub listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
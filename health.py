@@ -0,0 +1,138 @@
+"""
+Liveness and readiness probes with per-dependency latency
+"""
+
+import asyncio
+import os
+import socket
+import time
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+
+from app.config import settings
+from app.database.session import engine
+
+router = APIRouter()
+
+OK, DEGRADED, FAIL, UNKNOWN = "ok", "degraded", "fail", "unknown"
+
+_cached_result: Optional[Dict[str, Any]] = None
+_cached_at = 0.0
+_lock = asyncio.Lock()
+
+
+async def _timed(check: Callable[[], Dict[str, Any]], timeout: float) -> Dict[str, Any]:
+    """Run a blocking check in a thread and attach its latency"""
+    start = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(asyncio.to_thread(check), timeout)
+    except asyncio.TimeoutError:
+        result = {"status": FAIL, "error": f"timed out after {timeout}s"}
+    except Exception as e:
+        result = {"status": FAIL, "error": str(e)}
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return result
+
+
+def _check_database() -> Dict[str, Any]:
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return {"status": OK}
+
+
+def _check_pool() -> Dict[str, Any]:
+    pool = engine.pool
+    if not hasattr(pool, "checkedout") or not hasattr(pool, "size"):
+        return {"status": OK, "detail": f"{type(pool).__name__} does not report usage"}
+    if settings.DB_MAX_OVERFLOW < 0:
+        return {"status": OK, "in_use": pool.checkedout(), "detail": "overflow is unlimited"}
+    # max_overflow as configured: the pool only exposes its current overflow()
+    capacity = pool.size() + settings.DB_MAX_OVERFLOW
+    in_use = pool.checkedout()
+    headroom = capacity - in_use
+    return {
+        "status": OK if headroom >= settings.HEALTH_MIN_POOL_HEADROOM else FAIL,
+        "in_use": in_use,
+        "overflow": max(pool.overflow(), 0) if hasattr(pool, "overflow") else 0,
+        "capacity": capacity,
+        "headroom": headroom,
+    }
+
+
+def _check_scheduler() -> Dict[str, Any]:
+    try:
+        with open(settings.SCHEDULER_HEARTBEAT_FILE) as heartbeat:
+            last_success = float(heartbeat.read())
+    except (OSError, ValueError):
+        return {"status": UNKNOWN, "detail": "no scheduler heartbeat recorded"}
+    lag = time.time() - last_success
+    return {
+        "status": OK if lag <= settings.SCHEDULER_MAX_LAG_SECONDS else DEGRADED,
+        "lag_seconds": round(lag, 1),
+    }
+
+
+def _check_smtp() -> Dict[str, Any]:
+    if not settings.EMAIL_ENABLED:
+        return {"status": OK, "detail": "email disabled"}
+    with socket.create_connection(
+        (settings.SMTP_SERVER, settings.SMTP_PORT),
+        timeout=settings.HEALTH_SMTP_TIMEOUT_SECONDS
+    ):
+        pass
+    return {"status": OK}
+
+
+async def _run_checks() -> Dict[str, Any]:
+    # Critical dependencies take the worker out of rotation when they fail;
+    # the rest only mark it degraded
+    checks = {
+        "database": (_check_database, settings.HEALTH_DB_TIMEOUT_SECONDS, True),
+        "pool": (_check_pool, settings.HEALTH_DB_TIMEOUT_SECONDS, True),
+        "scheduler": (_check_scheduler, settings.HEALTH_DB_TIMEOUT_SECONDS, False),
+        "smtp": (_check_smtp, settings.HEALTH_SMTP_TIMEOUT_SECONDS, False),
+    }
+    results = await asyncio.gather(*(
+        _timed(check, timeout) for check, timeout, _ in checks.values()
+    ))
+
+    status = OK
+    dependencies = {}
+    for (name, (_, _, critical)), result in zip(checks.items(), results):
+        result["critical"] = critical
+        dependencies[name] = result
+        if result["status"] == FAIL and critical:
+            status = FAIL
+        elif result["status"] in (FAIL, DEGRADED) and status == OK:
+            status = DEGRADED
+
+    return {"status": status, "checked_at": time.time(), "dependencies": dependencies}
+
+
+async def get_readiness() -> Dict[str, Any]:
+    """Get dependency health, re-checking at most every HEALTH_CACHE_SECONDS"""
+    global _cached_result, _cached_at
+    if _cached_result is not None and time.monotonic() - _cached_at < settings.HEALTH_CACHE_SECONDS:
+        return _cached_result
+    async with _lock:
+        # Another probe may have refreshed the result while we waited
+        if _cached_result is None or time.monotonic() - _cached_at >= settings.HEALTH_CACHE_SECONDS:
+            _cached_result = await _run_checks()
+            _cached_at = time.monotonic()
+    return _cached_result
+
+
+@router.get("/health/live")
+async def liveness():
+    """The process is up and the event loop is responsive"""
+    return {"status": OK, "pid": os.getpid()}
+
+
+@router.get("/health/ready")
+async def readiness():
+    """Whether this worker should receive traffic; 503 when a critical dependency fails"""
+    result = await get_readiness()
+    return JSONResponse(result, status_code=503 if result["status"] == FAIL else 200)
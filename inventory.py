@@ -0,0 +1,236 @@
+"""
+Bulk inventory endpoints: streaming export and batched import of products
+"""
+
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Tuple
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import insert
+
+from app.api.deps import get_current_user
+from app.config import settings
+from app.database.session import SessionLocal
+from app.models.product import Product
+from app.models.user import User
+from app.schemas.product import ProductCreate
+from app.services.events import publish_product_changed
+
+router = APIRouter()
+
+EXPORT_FIELDS = [
+    "id", "name", "category_id", "barcode", "shop_name", "purchase_date",
+    "expiration_date", "amount", "unit", "notes", "image_url", "is_active",
+]
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _serialize(value: Any) -> Any:
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _export_rows(user_id: int, include_inactive: bool) -> Iterator[Dict[str, Any]]:
+    """Yield products straight from a server-side cursor"""
+    db = SessionLocal()
+    try:
+        columns = [getattr(Product, field) for field in EXPORT_FIELDS]
+        query = db.query(*columns).filter(Product.user_id == user_id)
+        if not include_inactive:
+            query = query.filter(Product.is_active == True)
+        query = query.order_by(Product.id).yield_per(settings.EXPORT_BATCH_SIZE)
+        for row in query:
+            yield {field: _serialize(value) for field, value in zip(EXPORT_FIELDS, row)}
+    finally:
+        db.close()
+
+
+def _export_csv(rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % settings.EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _export_ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    chunk: List[str] = []
+    for row in rows:
+        chunk.append(json.dumps(row, separators=(",", ":")))
+        if len(chunk) >= settings.EXPORT_BATCH_SIZE:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+@router.get("/products/export")
+def export_products(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    include_inactive: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream the current user's inventory as CSV or NDJSON"""
+    rows = _export_rows(current_user.id, include_inactive)
+    body = _export_csv(rows) if format == "csv" else _export_ndjson(rows)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
+
+
+def _parse_upload(upload: UploadFile, format: str) -> Iterator[Any]:
+    """Read an uploaded file record by record without loading it into memory
+
+    CSV rows come as dicts, NDJSON lines as undecoded text, so that a
+    malformed line fails on its own in _parse_record.
+    """
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    if format == "csv":
+        for row in csv.DictReader(text):
+            yield {key: (value if value != "" else None) for key, value in row.items() if key}
+    else:
+        for line in text:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def _parse_is_active(value: Any) -> bool:
+    """Read is_active from CSV text or JSON; missing means active"""
+    if value is None or isinstance(value, bool):
+        return value is not False
+    text = str(value).strip().lower()
+    if text in ("1", "true", "yes"):
+        return True
+    if text in ("0", "false", "no"):
+        return False
+    raise ValueError(f"is_active must be true or false, not {value!r}")
+
+
+def _parse_record(record: Any) -> Tuple[ProductCreate, bool]:
+    """Validate one uploaded record; raises ValueError or ValidationError"""
+    if isinstance(record, str):
+        try:
+            record = json.loads(record)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {str(e)}") from None
+    if not isinstance(record, dict):
+        raise ValueError("Expected a JSON object")
+    record.pop("id", None)
+    is_active = _parse_is_active(record.pop("is_active", None))
+    return ProductCreate(**record), is_active
+
+
+def _import_products(upload: UploadFile, format: str, user_id: int) -> Iterator[str]:
+    """Validate and insert uploaded products in batches, reporting progress"""
+    db = SessionLocal()
+    batch: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    processed = imported = failed = 0
+
+    def flush() -> str:
+        nonlocal imported
+        # Core inserts skip the ORM events, so the stream is told here
+        created = db.execute(insert(Product).returning(*Product.__table__.columns), batch).mappings().all()
+        db.commit()
+        for product in created:
+            publish_product_changed(user_id, product["id"], "created", dict(product))
+        imported += len(batch)
+        batch.clear()
+        return json.dumps({"processed": processed, "imported": imported, "failed": failed}) + "\n"
+
+    try:
+        for line_number, record in enumerate(_parse_upload(upload, format), 1):
+            processed += 1
+            try:
+                product, is_active = _parse_record(record)
+            except ValidationError as e:
+                failed += 1
+                if len(errors) < settings.IMPORT_MAX_ERRORS:
+                    errors.append({"line": line_number, "errors": e.errors()})
+                continue
+            except ValueError as e:
+                # Malformed JSON, a non-object record or a bad is_active
+                failed += 1
+                if len(errors) < settings.IMPORT_MAX_ERRORS:
+                    errors.append({"line": line_number, "errors": [{"msg": str(e)}]})
+                continue
+
+            row = product.model_dump()
+            row["user_id"] = user_id
+            row["is_active"] = is_active
+            batch.append(row)
+
+            if len(batch) >= settings.IMPORT_BATCH_SIZE:
+                yield flush()
+
+        if batch:
+            yield flush()
+        yield json.dumps({
+            "processed": processed,
+            "imported": imported,
+            "failed": failed,
+            "errors": errors,
+            "done": True,
+        }, default=str) + "\n"
+    except Exception as e:
+        db.rollback()
+        yield json.dumps({
+            "processed": processed,
+            "imported": imported,
+            "failed": failed,
+            "error": str(e),
+            "done": False,
+        }) + "\n"
+    finally:
+        db.close()
+        upload.file.close()
+
+
+@router.post("/products/import")
+def import_products(
+    file: UploadFile = File(...),
+    format: str = Query(None, pattern="^(csv|ndjson)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """Bulk import products from a CSV or NDJSON upload
+
+    The response is an NDJSON stream with one progress line per inserted
+    batch followed by a summary line.
+    """
+    if format is None:
+        filename = (file.filename or "").lower()
+        if filename.endswith((".ndjson", ".jsonl")):
+            format = "ndjson"
+        elif filename.endswith(".csv"):
+            format = "csv"
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Could not detect file format, pass ?format=csv or ?format=ndjson"
+            )
+
+    return StreamingResponse(
+        _import_products(file, format, current_user.id),
+        media_type=EXPORT_FORMATS["ndjson"],
+    )
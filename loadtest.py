@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Load tests for the Food Expiration Tracker API and notification scheduler
+
+Usage:
+    python loadtest.py seed --scale 100k [--products-per-user 20] [--force]
+    python loadtest.py api --clients 50 --duration 30 [--url http://127.0.0.1:8000]
+    python loadtest.py sweep
+    python loadtest.py scaling --workers 1,2,4 [--duration 20]
+    python loadtest.py compare baseline.json current.json [--threshold 10]
+
+Every command except compare writes its results as JSON (--output) so runs
+from different commits can be compared. The database is taken from
+--database-url (default sqlite:///./benchmark.db) and must be seeded first.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.append(str(Path(__file__).parent))
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+PRODUCTS_PER_USER = 20
+BENCHMARK_PASSWORD = "Benchmark1"
+SEED_BATCH_SIZE = 10_000
+CATEGORY_TREE = {
+    "Dairy": ["Milk", "Cheese", "Yogurt"],
+    "Meat": ["Poultry", "Beef", "Pork"],
+    "Produce": ["Fruit", "Vegetables", "Herbs"],
+    "Bakery": ["Bread", "Pastry"],
+    "Pantry": ["Canned", "Dry Goods", "Sauces"],
+    "Frozen": [],
+    "Beverages": [],
+}
+SHOPS = ["Corner Shop", "Supermarket", "Farmers Market", "Online", None]
+FOODS = [
+    "milk", "yogurt", "butter", "cheddar", "mozzarella", "cream", "eggs", "chicken", "beef", "pork",
+    "salmon", "tuna", "ham", "bacon", "sausages", "apples", "bananas", "oranges", "grapes", "strawberries",
+    "blueberries", "lettuce", "spinach", "tomatoes", "cucumber", "carrots", "broccoli", "peppers", "onions",
+    "potatoes", "mushrooms", "basil", "parsley", "bread", "bagels", "croissants", "tortillas", "rice",
+    "pasta", "beans", "lentils", "chickpeas", "soup", "ketchup", "mayonnaise", "mustard", "pesto", "hummus",
+    "juice", "lemonade", "tofu", "granola", "cereal", "crackers", "cookies", "chocolate", "peas", "corn",
+]
+QUALIFIERS = [
+    "", "", "organic", "greek", "whole", "fresh", "frozen", "smoked", "sliced", "wholegrain", "free range",
+    "low fat", "baby", "cherry", "red", "green", "sourdough", "wild", "vegan", "spicy",
+]
+TIMEZONES = ["UTC", "Europe/Berlin", "America/New_York", "America/Los_Angeles", "Asia/Tokyo", "Australia/Sydney"]
+
+
+def _configure_environment(args) -> None:
+    """Point the app at the benchmark database before anything imports it"""
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SQL_ECHO", "false")
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "count": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 2),
+        "p95_ms": round(pick(0.95), 2),
+        "p99_ms": round(pick(0.99), 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+def _is_benchmark_database(url) -> bool:
+    """SQLite file named as a benchmark database, e.g. benchmark.db"""
+    return url.get_backend_name() == "sqlite" and "bench" in Path(url.database or "").name.lower()
+
+
+def seed(args):
+    """Insert synthetic users, settings, categories and products"""
+    from sqlalchemy.engine import make_url
+
+    # Seeding drops every table first
+    url = make_url(args.database_url)
+    if not args.force and not _is_benchmark_database(url):
+        sys.exit(
+            f"Refusing to drop and reseed {url.render_as_string(hide_password=True)}: "
+            "seed only replaces SQLite benchmark databases (e.g. benchmark.db). Pass --force to override."
+        )
+
+    from sqlalchemy import insert, text
+
+    from app.database.session import engine
+    from app.models import Base, device_token, notification, notification_counter  # noqa: F401 - full schema
+    from app.models.category import Category
+    from app.models.product import Product
+    from app.models.user import User
+    from app.models.user_settings import UserSettings
+    from app.services import aggregates, search_index  # noqa: F401 - maintained as products are inserted
+    from app.services import expiry_window, retention  # noqa: F401 - their indexes
+    from app.services.auth import get_password_hash
+
+    product_count = SCALES[args.scale]
+    user_count = max(1, product_count // args.products_per_user)
+    rng = random.Random(args.seed)
+    today = date.today()
+    start = time.perf_counter()
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("PRAGMA journal_mode=WAL"))
+            conn.execute(text("PRAGMA synchronous=OFF"))
+
+        category_ids = []
+        for parent_name, children in CATEGORY_TREE.items():
+            parent_id = conn.execute(insert(Category).values(name=parent_name)).inserted_primary_key[0]
+            category_ids.append(parent_id)
+            for child_name in children:
+                category_ids.append(
+                    conn.execute(insert(Category).values(name=child_name, parent_id=parent_id)).inserted_primary_key[0]
+                )
+
+        # Hashing once keeps seeding fast; every user shares the password
+        password_hash = get_password_hash(BENCHMARK_PASSWORD)
+        for offset in range(0, user_count, SEED_BATCH_SIZE):
+            ids = range(offset + 1, min(offset + SEED_BATCH_SIZE, user_count) + 1)
+            conn.execute(insert(User), [
+                {"id": i, "username": f"user{i}", "email": f"user{i}@example.com",
+                 "password_hash": password_hash, "is_active": True}
+                for i in ids
+            ])
+            conn.execute(insert(UserSettings), [
+                {"user_id": i, "notification_days": rng.choice((1, 3, 3, 7, 14)),
+                 "email_enabled": rng.random() < 0.8, "push_enabled": rng.random() < 0.6,
+                 "timezone": rng.choice(TIMEZONES), "delivery_hour": rng.choice((7, 8, 9, 9, 18))}
+                for i in ids
+            ])
+
+        for offset in range(0, product_count, SEED_BATCH_SIZE):
+            rows = []
+            for i in range(offset, min(offset + SEED_BATCH_SIZE, product_count)):
+                purchase_date = today - timedelta(days=rng.randint(0, 60))
+                rows.append({
+                    "user_id": i % user_count + 1,
+                    "name": f"{rng.choice(QUALIFIERS)} {rng.choice(FOODS)}".strip().capitalize(),
+                    "notes": "opened" if rng.random() < 0.05 else None,
+                    "category_id": rng.choice(category_ids),
+                    "barcode": f"{rng.randrange(10 ** 12):013d}",
+                    "shop_name": rng.choice(SHOPS),
+                    "purchase_date": purchase_date,
+                    "expiration_date": today + timedelta(days=rng.randint(-30, 90)),
+                    "amount": round(rng.uniform(0.1, 5), 2),
+                    "unit": rng.choice(("kg", "l", "pcs")),
+                    "is_active": rng.random() < 0.9,
+                })
+            conn.execute(insert(Product), rows)
+
+    return {
+        "scale": args.scale,
+        "users": user_count,
+        "products": product_count,
+        "categories": len(category_ids),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+async def _client_session(client, user_id: int, deadline: float, ops: List[str],
+                          latencies: Dict[str, List[float]], errors: Dict[str, int]) -> None:
+    """One simulated app user: log in, then cycle through the selected operations"""
+
+    async def call(name, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except Exception:
+            response, ok = None, False
+        latencies[name].append((time.perf_counter() - start) * 1000)
+        if not ok:
+            errors[name] = errors.get(name, 0) + 1
+        return response if ok else None
+
+    response = await call("login", "POST", "/api/v1/auth/login",
+                          json={"username": f"user{user_id}", "password": BENCHMARK_PASSWORD})
+    if response is None:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    endpoints = {
+        "list": ("GET", "/api/v1/products", {}),
+        "expiring": ("GET", "/api/v1/products/expiring", {}),
+        "scan": ("POST", "/api/v1/products/scan", {"json": {"barcode": "3017620422003"}}),
+    }
+    while time.perf_counter() < deadline:
+        for op in ops:
+            if op == "create":
+                await call("create", "POST", "/api/v1/products", headers=headers, json={
+                    "name": "Load test item",
+                    "expiration_date": (date.today() + timedelta(days=10)).isoformat(),
+                })
+            elif op in endpoints:
+                method, url, kwargs = endpoints[op]
+                await call(op, method, url, headers=headers, **kwargs)
+
+
+def api(args):
+    """Drive the API with concurrent simulated clients, in-process or over HTTP
+
+    Scans are answered by barcode_stub.py: in-process it is started here; a
+    server given with --url must already point its barcode settings at one
+    (scaling does this for the servers it starts). In-process the rate
+    limiter is off, as it is for those servers: every client shares one
+    address and would be throttled long before the API is loaded.
+    """
+    import httpx
+
+    ops = args.ops.split(",")
+    barcode_server = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+        mode = "http"
+        if "scan" in ops and not getattr(args, "barcode_stub", False):
+            print("warning: scans go to the barcode service configured on the server", file=sys.stderr)
+    else:
+        from app.config import settings
+        from app.main import create_app
+        settings.RATE_LIMIT_ENABLED = False
+        app = create_app()
+        if "scan" in ops:
+            from barcode_stub import settings_for, start_stub_server
+            barcode_server, barcode_url = start_stub_server()
+            for name, value in settings_for(barcode_url).items():
+                setattr(settings, name, value)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                   base_url="http://loadtest", timeout=30)
+        mode = "in-process"
+
+    from app.database.session import SessionLocal
+    from app.models.user import User
+
+    db = SessionLocal()
+    user_count = db.query(User).count()
+    db.close()
+
+    latencies: Dict[str, List[float]] = {op: [] for op in ["login", *ops]}
+    errors: Dict[str, int] = {}
+
+    async def run():
+        deadline = time.perf_counter() + args.duration
+        users = random.Random(args.seed).sample(range(1, user_count + 1), min(args.clients, user_count))
+        async with client:
+            await asyncio.gather(*(
+                _client_session(client, user_id, deadline, ops, latencies, errors)
+                for user_id in users
+            ))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    if barcode_server is not None:
+        barcode_server.shutdown()
+
+    total = sum(len(samples) for samples in latencies.values())
+    return {
+        "mode": mode,
+        "clients": args.clients,
+        "wall_time": round(elapsed, 2),
+        "requests": total,
+        "requests_per_second": round(total / elapsed, 1),
+        "errors": errors,
+        "operations": {op: _percentiles(samples) for op, samples in latencies.items()},
+    }
+
+
+def sweep(args):
+    """Time one expiration notification sweep against local SMTP and push stand-ins"""
+    from fcm_stub import PROJECT_ID, StubCredentials, start_stub_server as start_push_stub
+    from smtp_stub import start_stub_server as start_smtp_stub
+
+    smtp_server, smtp_port = start_smtp_stub()
+    push_server, push_url = start_push_stub()
+
+    from app.config import settings
+    settings.SMTP_SERVER = "127.0.0.1"
+    settings.SMTP_PORT = smtp_port
+    settings.SMTP_USE_TLS = False
+    settings.SMTP_USERNAME = ""
+
+    from app.utils.push import FCMProvider, set_push_provider
+    set_push_provider("fcm", FCMProvider(
+        push_url, PROJECT_ID, StubCredentials(),
+        batch_size=settings.PUSH_MULTICAST_LIMIT, max_concurrency=settings.PUSH_MAX_CONCURRENCY,
+    ))
+
+    from app.utils.notifications import send_expiration_notifications
+
+    start = time.perf_counter()
+    asyncio.run(send_expiration_notifications())
+    elapsed = time.perf_counter() - start
+
+    smtp_server.shutdown()
+    push_server.shutdown()
+    return {
+        "sweep_seconds": round(elapsed, 3),
+        "emails_sent": smtp_server.messages_received,
+        "pushes_sent": push_server.messages_received,
+        "emails_per_second": round(smtp_server.messages_received / elapsed, 1),
+    }
+
+
+def scaling(args):
+    """Throughput of serve.py at several worker counts, driven over HTTP
+
+    The load generator is a single Python process; it needs a core of its
+    own, so keep the largest worker count below the machine's core count.
+    """
+    import httpx
+
+    from barcode_stub import settings_for, start_stub_server
+
+    barcode_server, barcode_url = start_stub_server()
+    runs = {}
+    for workers in [int(count) for count in args.workers.split(",")]:
+        server = subprocess.Popen(
+            [sys.executable, str(Path(__file__).parent / "serve.py"),
+             "--workers", str(workers), "--no-scheduler",
+             "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"],
+            env={**os.environ, "RATE_LIMIT_ENABLED": "false", **settings_for(barcode_url)},
+        )
+        url = f"http://127.0.0.1:{args.port}"
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    if httpx.get(f"{url}/health/live").status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"serve.py with {workers} workers did not start")
+                time.sleep(0.2)
+
+            result = api(argparse.Namespace(**{**vars(args), "url": url, "barcode_stub": True}))
+        finally:
+            server.terminate()
+            server.wait()
+        runs[str(workers)] = {
+            "requests_per_second": result["requests_per_second"],
+            "errors": result["errors"],
+        }
+
+    smallest = min(runs, key=int)
+    per_worker = runs[smallest]["requests_per_second"] / int(smallest)
+    for workers, run in runs.items():
+        # 1.0 is perfectly linear scaling from the smallest run
+        run["scaling_efficiency"] = round(run["requests_per_second"] / (per_worker * int(workers)), 2)
+    barcode_server.shutdown()
+    return {"cpu_count": os.cpu_count(), "workers": runs}
+
+
+def _flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(args):
+    """Compare two result files and fail on regressions beyond the threshold"""
+    baseline = _flatten(json.loads(Path(args.baseline).read_text()))
+    current = _flatten(json.loads(Path(args.current).read_text()))
+
+    changes, regressions = {}, []
+    for name in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[name], current[name]
+        if "per_second" in name:
+            higher_is_better = True
+        elif name.endswith(("_ms", "seconds")):
+            higher_is_better = False
+        else:
+            continue
+        if not before:
+            continue
+        change = (after - before) / before * 100
+        changes[name] = {"baseline": before, "current": after, "change_percent": round(change, 1)}
+        if (-change if higher_is_better else change) > args.threshold:
+            regressions.append(name)
+
+    return {"threshold_percent": args.threshold, "changes": changes, "regressions": regressions}
+
+
+COMMANDS = {
+    "seed": seed,
+    "api": api,
+    "sweep": sweep,
+    "scaling": scaling,
+    "compare": compare,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = subparsers.add_parser("seed", help=seed.__doc__)
+    seed_parser.add_argument("--scale", choices=SCALES, default="1k")
+    seed_parser.add_argument("--products-per-user", type=int, default=PRODUCTS_PER_USER)
+    seed_parser.add_argument("--force", action="store_true",
+                             help="Seed a database that does not look like a benchmark database (drops all tables)")
+
+    api_parser = subparsers.add_parser("api", help=api.__doc__)
+    api_parser.add_argument("--url", help="Base URL of a running server (default: in-process)")
+    api_parser.add_argument("--clients", type=int, default=20)
+    api_parser.add_argument("--duration", type=float, default=30)
+    api_parser.add_argument("--ops", default="list,create,scan,expiring")
+
+    subparsers.add_parser("sweep", help=sweep.__doc__)
+
+    scaling_parser = subparsers.add_parser("scaling", help=scaling.__doc__)
+    scaling_parser.add_argument("--workers", default="1,2,4")
+    scaling_parser.add_argument("--port", type=int, default=8765)
+    scaling_parser.add_argument("--clients", type=int, default=64)
+    scaling_parser.add_argument("--duration", type=float, default=20)
+    scaling_parser.add_argument("--ops", default="list,expiring")
+
+    compare_parser = subparsers.add_parser("compare", help=compare.__doc__)
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=10.0,
+                                help="Allowed slowdown in percent")
+
+    args = parser.parse_args()
+    _configure_environment(args)
+
+    results = {
+        "command": args.command,
+        "revision": _git_revision(),
+        "timestamp": datetime.utcnow().isoformat(),
+        **COMMANDS[args.command](args),
+    }
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if results.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
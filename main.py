@@ -3,13 +3,41 @@ Food Expiration Tracker API
 FastAPI backend application for managing food products and expiration notifications
 """
 
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
-from app.api import auth, products, categories, notifications
+from app.api import auth, products, categories, notifications, stream, inventory, search, product_patch, analytics, notification_history, devices, admin, health
 from app.database.session import create_tables
-from app.config import settings
+from app.config import handle_reload_signal, settings
+from app.utils.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from app.utils.profiling import ProfilingMiddleware, profile_sync_calls
+from app.utils.rate_limit import RateLimitMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown
+
+    Nothing here touches the database unless AUTO_CREATE_TABLES is set;
+    production schemas are managed with `alembic upgrade head`.
+    """
+    # Sync endpoints run on these threads, each holding at most one pooled
+    # connection; more threads than DB_POOL_SIZE + DB_MAX_OVERFLOW only queue
+    to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    handle_reload_signal()
+    if settings.AUTO_CREATE_TABLES:
+        await asyncio.to_thread(create_tables)
+        logger.info("Database tables created")
+    yield
 
 
 def create_app() -> FastAPI:
@@ -17,11 +45,19 @@ def create_app() -> FastAPI:
     app = FastAPI(
         title="Food Expiration Tracker API",
         description="API for managing food products and expiration notifications",
-        version="1.0.0"
+        version="1.0.0",
+        lifespan=lifespan
     )
 
-    # Startup: Create database tables
-    create_tables()
+    # Throttle clients before routing; inside CORS and metrics so 429s
+    # carry CORS headers and are counted
+    if settings.RATE_LIMIT_ENABLED:
+        app.add_middleware(RateLimitMiddleware)
+
+    # Record per-route latency and SQL usage
+    app.add_middleware(MetricsMiddleware)
+    if settings.PROFILING_ENABLED:
+        app.add_middleware(ProfilingMiddleware)
 
     # Add CORS middleware
     app.add_middleware(
@@ -36,19 +72,37 @@ def create_app() -> FastAPI:
     app.mount("/static", StaticFiles(directory="static"), name="static")
 
     # Include API routers
+    # Inventory and search routes first so /products/export and
+    # /products/search are not matched as /products/{id}
+    app.include_router(inventory.router, prefix="/api/v1", tags=["Products"])
+    app.include_router(search.router, prefix="/api/v1", tags=["Products"])
+    app.include_router(product_patch.router, prefix="/api/v1", tags=["Products"])
     app.include_router(auth.router, prefix="/api/v1", tags=["Authentication"])
     app.include_router(products.router, prefix="/api/v1", tags=["Products"])
     app.include_router(categories.router, prefix="/api/v1", tags=["Categories"])
+    app.include_router(analytics.router, prefix="/api/v1", tags=["Analytics"])
+    app.include_router(notification_history.router, prefix="/api/v1", tags=["Notifications"])
     app.include_router(notifications.router, prefix="/api/v1", tags=["Notifications"])
+    app.include_router(devices.router, prefix="/api/v1", tags=["Notifications"])
+    app.include_router(stream.router, prefix="/api/v1", tags=["Stream"])
+    app.include_router(admin.router, prefix="/api/v1", tags=["Admin"])
+    app.include_router(health.router, tags=["Health"])
 
     @app.get("/")
     def root():
         return {"message": "Food Expiration Tracker API"}
 
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
     @app.get("/health")
     def health_check():
         return {"status": "healthy", "version": "1.0.0"}
 
+    if settings.PROFILING_ENABLED:
+        profile_sync_calls(app)
+
     return app
 
 
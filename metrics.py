@@ -0,0 +1,307 @@
+"""
+Lightweight Prometheus-style metrics: counters, histograms and gauges
+rendered in the Prometheus text exposition format
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+INF_LABEL = 'le="+Inf"'
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonically increasing value per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for values, value in snapshot:
+            yield f"{self.name}{_format_labels(self.labels, values)} {value}"
+
+
+class Histogram:
+    """Bucketed distribution of observed values per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+
+    def time(self, *label_values: str) -> "_Timer":
+        """Context manager observing the elapsed wall time"""
+        return _Timer(self, label_values)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            snapshot = [(values, list(state)) for values, state in self._values.items()]
+        for values, state in sorted(snapshot):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = _format_labels(self.labels, values, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            cumulative += state[len(self.buckets)]
+            yield f"{self.name}_bucket{_format_labels(self.labels, values, INF_LABEL)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, values)} {state[-1]}"
+            yield f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}"
+
+
+class Gauge:
+    """Value read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Optional[float]]):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def samples(self) -> Iterable[str]:
+        value = self.callback()
+        if value is not None:
+            yield f"{self.name} {value}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "label_values", "start")
+
+    def __init__(self, histogram: Histogram, label_values: LabelValues):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                lines.extend(metric.samples())
+            except Exception:
+                # A failing gauge callback must not break the whole scrape
+                continue
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    labels=("method", "route", "status"),
+))
+DB_QUERIES_PER_REQUEST = registry.register(Histogram(
+    "db_queries_per_request", "Number of SQL statements executed per HTTP request",
+    labels=("route",), buckets=COUNT_BUCKETS,
+))
+DB_TIME_PER_REQUEST = registry.register(Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL statements per HTTP request",
+    labels=("route",),
+))
+DB_QUERY_DURATION = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement latency",
+))
+SCHEDULER_SWEEP_DURATION = registry.register(Histogram(
+    "scheduler_sweep_duration_seconds", "Duration of expiration notification sweeps",
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+))
+NOTIFICATION_SEND_DURATION = registry.register(Histogram(
+    "notification_send_duration_seconds", "Email/push send latency",
+    labels=("channel",),
+))
+NOTIFICATION_SENDS = registry.register(Counter(
+    "notification_sends_total", "Email/push send attempts by outcome",
+    labels=("channel", "outcome"),
+))
+
+
+class RequestStats:
+    """Per-request SQL counters, shared with threadpool-run endpoints"""
+
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request_stats", default=None
+)
+
+
+def _timed(execute: Callable) -> Callable:
+    def timed_execute(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return execute(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            DB_QUERY_DURATION.observe(elapsed)
+            stats = current_request_stats.get()
+            if stats is not None:
+                stats.queries += 1
+                stats.db_time += elapsed
+    return timed_execute
+
+
+def instrument_engine(engine) -> None:
+    """Record SQL statement counts and timings, and expose pool usage gauges
+
+    The dialect's execute methods are wrapped instead of listening for
+    cursor events: any engine event listener switches SQLAlchemy to a
+    slower instrumented execution path, which costs several times more
+    per statement than the timing itself.
+    """
+    engine = getattr(engine, "sync_engine", engine)
+    dialect = engine.dialect
+    for name in ("do_execute", "do_execute_no_params", "do_executemany"):
+        setattr(dialect, name, _timed(getattr(dialect, name)))
+
+    pool = engine.pool
+
+    def pool_stat(name: str) -> Callable[[], Optional[float]]:
+        method = getattr(pool, name, None)
+        return (lambda: method()) if callable(method) else (lambda: None)
+
+    registry.register(Gauge("db_pool_size", "Configured connection pool size", pool_stat("size")))
+    registry.register(Gauge("db_pool_checked_out", "Connections currently in use", pool_stat("checkedout")))
+    registry.register(Gauge("db_pool_overflow", "Connections opened beyond the pool size", pool_stat("overflow")))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency and SQL usage per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request_stats.reset(token)
+            # The router stores the matched route on the scope; use its
+            # template so /products/1 and /products/2 share a series
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.observe(elapsed, scope["method"], route_path, str(status_code))
+            DB_QUERIES_PER_REQUEST.observe(stats.queries, route_path)
+            DB_TIME_PER_REQUEST.observe(stats.db_time, route_path)
+
+
+def record_send(channel: str, seconds: Optional[float], success: bool, count: int = 1) -> None:
+    """Record the latency and outcome of an email or push send
+
+    seconds is None for sends never attempted (e.g. the rest of a batch
+    after the provider became unreachable); only their outcome is counted.
+    """
+    if seconds is not None:
+        NOTIFICATION_SEND_DURATION.observe(seconds, channel)
+    if count:
+        NOTIFICATION_SENDS.inc(channel, "success" if success else "failure", amount=count)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        data = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(host: str, port: int) -> ThreadingHTTPServer:
+    """Serve this process's registry at /metrics from a background thread
+
+    For processes without the API, such as the scheduler under serve.py.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -2,9 +2,12 @@
 Notification schemas for API validation and serialization
 """
 
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, validator
+from typing import List, Literal, Optional
 from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.config import settings
 
 
 class NotificationBase(BaseModel):
@@ -25,22 +28,76 @@ class NotificationResponse(NotificationBase):
     id: int
     sent_at: Optional[datetime] = None
     is_sent: bool
+    is_read: bool = False
     created_at: datetime
     
     class Config:
         from_attributes = True
 
 
+class NotificationPage(BaseModel):
+    """Schema for a keyset-paginated page of notifications"""
+    items: List[NotificationResponse]
+    next_cursor: Optional[str] = None
+
+
+class UnreadCountResponse(BaseModel):
+    """Schema for unread notification count response"""
+    unread_count: int
+
+
+class MarkReadResponse(BaseModel):
+    """Schema for mark-read response"""
+    updated: int
+    unread_count: int
+
+
+def validate_timezone(v: str) -> str:
+    """Accept IANA timezone names such as Europe/Berlin"""
+    try:
+        ZoneInfo(v)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError('Unknown timezone')
+    return v
+
+
+def validate_notification_days(v: int) -> int:
+    if not 0 <= v <= settings.NOTIFICATION_MAX_DAYS_BEFORE:
+        raise ValueError(
+            f'Notification days must be between 0 and {settings.NOTIFICATION_MAX_DAYS_BEFORE}'
+        )
+    return v
+
+
+def validate_delivery_hour(v: int) -> int:
+    if not 0 <= v <= 23:
+        raise ValueError('Delivery hour must be between 0 and 23')
+    return v
+
+
 class UserSettingsBase(BaseModel):
     """Base user settings schema"""
     notification_days: int = 3
     email_enabled: bool = True
     push_enabled: bool = True
+    timezone: str = "UTC"
+    delivery_hour: int = 9
 
 
 class UserSettingsCreate(UserSettingsBase):
     """Schema for user settings creation"""
-    pass
+    
+    @validator('notification_days')
+    def notification_days_in_range(cls, v):
+        return validate_notification_days(v)
+    
+    @validator('timezone')
+    def timezone_must_exist(cls, v):
+        return validate_timezone(v)
+    
+    @validator('delivery_hour')
+    def delivery_hour_in_range(cls, v):
+        return validate_delivery_hour(v)
 
 
 class UserSettingsUpdate(BaseModel):
@@ -48,15 +105,62 @@ class UserSettingsUpdate(BaseModel):
     notification_days: Optional[int] = None
     email_enabled: Optional[bool] = None
     push_enabled: Optional[bool] = None
+    timezone: Optional[str] = None
+    delivery_hour: Optional[int] = None
+    
+    @validator('notification_days')
+    def notification_days_in_range(cls, v):
+        return v if v is None else validate_notification_days(v)
+    
+    @validator('timezone')
+    def timezone_must_exist(cls, v):
+        return v if v is None else validate_timezone(v)
+    
+    @validator('delivery_hour')
+    def delivery_hour_in_range(cls, v):
+        return v if v is None else validate_delivery_hour(v)
 
 
 class UserSettingsResponse(UserSettingsBase):
-    """Schema for user settings response"""
+    """Schema for user settings response
+
+    Stored values are returned as they are; NULL columns (rows from before
+    a setting existed) are reported as the default that applies to them.
+    """
     id: int
     user_id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
     
+    @validator('notification_days', pre=True)
+    def default_notification_days(cls, v):
+        return settings.NOTIFICATION_DAYS_BEFORE if v is None else v
+    
+    @validator('timezone', pre=True)
+    def default_timezone(cls, v):
+        return "UTC" if v is None else v
+    
+    @validator('delivery_hour', pre=True)
+    def default_delivery_hour(cls, v):
+        return settings.NOTIFICATION_DEFAULT_DELIVERY_HOUR if v is None else v
+    
+    class Config:
+        from_attributes = True
+
+
+class DeviceTokenCreate(BaseModel):
+    """Schema for device token registration"""
+    token: str
+    provider: Literal["fcm"] = "fcm"  # FCM also delivers to iOS and web tokens
+    platform: Optional[str] = None  # 'android', 'ios', 'web'
+
+
+class DeviceTokenResponse(DeviceTokenCreate):
+    """Schema for device token response"""
+    id: int
+    user_id: int
+    created_at: datetime
+    
     class Config:
         from_attributes = True
 
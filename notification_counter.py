@@ -0,0 +1,24 @@
+"""
+Per-user unread notification counter for the Food Expiration Tracker application
+"""
+
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.models import Base
+
+
+class NotificationCounter(Base):
+    """Unread notification count, maintained on insert and on mark-read"""
+    
+    __tablename__ = "notification_counters"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            "user_id": self.user_id,
+            "unread_count": self.unread_count,
+        }
@@ -0,0 +1,153 @@
+"""
+Notification history paging and unread counter maintenance
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, func, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.notification import Notification
+from app.models.notification_counter import NotificationCounter
+
+_UPSERT_DIALECTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def encode_cursor(notification: Notification) -> str:
+    """Encode the keyset position of a notification as an opaque cursor"""
+    raw = json.dumps([notification.created_at.isoformat(), notification.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        created_at, notification_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(notification_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def unread_delta_stmt(dialect_name: str, user_id: int, delta: int):
+    """Build an upsert that adds delta to a user's unread counter, floored at zero"""
+    insert = _UPSERT_DIALECTS[dialect_name]
+    # SQLite's two-argument max() is the scalar greatest()
+    greatest = func.max if dialect_name == "sqlite" else func.greatest
+    return insert(NotificationCounter).values(
+        user_id=user_id, unread_count=max(delta, 0)
+    ).on_conflict_do_update(
+        index_elements=[NotificationCounter.user_id],
+        set_={"unread_count": greatest(NotificationCounter.unread_count + delta, 0)},
+    )
+
+
+def unread_decrement_stmt(dialect_name: str):
+    """Build an UPDATE subtracting :unread from :counter_user_id's counter, floored at zero
+
+    Execute it with one parameter set per user.
+    """
+    greatest = func.max if dialect_name == "sqlite" else func.greatest
+    counters = NotificationCounter.__table__
+    return (
+        counters.update()
+        .where(counters.c.user_id == bindparam("counter_user_id"))
+        .values(unread_count=greatest(counters.c.unread_count - bindparam("unread"), 0))
+    )
+
+
+def list_notifications(
+    db: Session,
+    user_id: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    unread_only: bool = False
+) -> Tuple[List[Notification], Optional[str]]:
+    """Return one page of a user's notifications, newest first
+
+    Pages are addressed by the (created_at, id) of the last row rather than
+    an offset, so every page is a bounded range scan on
+    ix_notifications_user_id_created_at.
+    """
+    query = db.query(Notification).filter(Notification.user_id == user_id)
+    if unread_only:
+        query = query.filter(Notification.is_read == False)
+    if cursor:
+        created_at, notification_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Notification.created_at < created_at,
+            and_(Notification.created_at == created_at, Notification.id < notification_id),
+        ))
+
+    items = (
+        query.order_by(Notification.created_at.desc(), Notification.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
+
+
+def get_unread_count(db: Session, user_id: int) -> int:
+    """Read the maintained unread counter (a primary-key lookup)"""
+    count = db.execute(
+        select(NotificationCounter.unread_count).where(NotificationCounter.user_id == user_id)
+    ).scalar()
+    return count or 0
+
+
+def mark_read(db: Session, user_id: int, notification_id: int) -> bool:
+    """Mark one notification read; returns False if it was not unread"""
+    result = db.execute(
+        update(Notification)
+        .where(
+            Notification.id == notification_id,
+            Notification.user_id == user_id,
+            Notification.is_read == False,
+        )
+        .values(is_read=True)
+    )
+    if result.rowcount:
+        db.execute(unread_delta_stmt(db.get_bind().dialect.name, user_id, -result.rowcount))
+    db.commit()
+    return bool(result.rowcount)
+
+
+def mark_all_read(db: Session, user_id: int) -> int:
+    """Mark every unread notification of a user read in a single statement"""
+    result = db.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read == False)
+        .values(is_read=True)
+    )
+    if result.rowcount:
+        # Not reset to zero: a notification created since the UPDATE is
+        # unread and already counted
+        db.execute(unread_delta_stmt(db.get_bind().dialect.name, user_id, -result.rowcount))
+    db.commit()
+    return result.rowcount
+
+
+def rebuild_unread_counter(db: Session, user_id: int) -> int:
+    """Recount a user's unread notifications, e.g. after a manual data fix"""
+    count = db.execute(
+        select(func.count(Notification.id))
+        .where(Notification.user_id == user_id, Notification.is_read == False)
+    ).scalar() or 0
+    dialect_name = db.get_bind().dialect.name
+    db.execute(
+        _UPSERT_DIALECTS[dialect_name](NotificationCounter)
+        .values(user_id=user_id, unread_count=count)
+        .on_conflict_do_update(
+            index_elements=[NotificationCounter.user_id],
+            set_={"unread_count": count},
+        )
+    )
+    db.commit()
+    return count
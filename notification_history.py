@@ -0,0 +1,72 @@
+"""
+Notification history endpoints: keyset-paginated listing and unread counters
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user
+from app.config import settings
+from app.database.session import get_db
+from app.models.user import User
+from app.schemas.notification import (
+    MarkReadResponse,
+    NotificationPage,
+    UnreadCountResponse,
+)
+from app.services import notification_feed
+
+router = APIRouter()
+
+
+@router.get("/notifications/history", response_model=NotificationPage)
+def get_notification_history(
+    limit: int = Query(settings.NOTIFICATION_PAGE_SIZE, ge=1, le=settings.NOTIFICATION_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    unread_only: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get one page of notifications, newest first; pass next_cursor to continue"""
+    try:
+        items, next_cursor = notification_feed.list_notifications(
+            db, current_user.id, limit, cursor, unread_only
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/notifications/unread-count", response_model=UnreadCountResponse)
+def get_unread_count(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the number of unread notifications for the badge"""
+    return {"unread_count": notification_feed.get_unread_count(db, current_user.id)}
+
+
+@router.post("/notifications/read-all", response_model=MarkReadResponse)
+def mark_all_notifications_read(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Mark every notification read"""
+    updated = notification_feed.mark_all_read(db, current_user.id)
+    return {"updated": updated, "unread_count": 0}
+
+
+@router.post("/notifications/{notification_id}/read", response_model=MarkReadResponse)
+def mark_notification_read(
+    notification_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Mark a single notification read"""
+    updated = notification_feed.mark_read(db, current_user.id, notification_id)
+    return {
+        "updated": int(updated),
+        "unread_count": notification_feed.get_unread_count(db, current_user.id),
+    }
@@ -4,19 +4,36 @@ Notification utilities for sending email and push notifications
 
 import smtplib
 import asyncio
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta
-from typing import List, Optional
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
 import logging
 
 from app.config import settings
 from app.models.notification import Notification
+from app.models.user import User
 from app.models.user_settings import UserSettings
 from app.models.product import Product
+from app.models.device_token import DeviceToken
 from app.database.session import get_async_session
+from app.services.delivery_schedule import DeliveryQueue, local_today
+from app.services.events import publish_notification_created
+from app.services.aggregates import run_daily_aggregation
+from app.services.expiry_window import expiring_products_query, window_days
+from app.services.retention import run_notification_compaction
+from app.services.notification_feed import unread_delta_stmt
+from app.utils.metrics import SCHEDULER_SWEEP_DURATION, record_send
+from app.utils.push import PushMessage, send_push
+from app.utils.email_templates import (
+    build_email_message,
+    load_templates,
+    render_expiration_batch,
+    render_expiration_email,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import delete, or_, select
 
 logger = logging.getLogger(__name__)
 
@@ -27,25 +44,24 @@ async def send_email_notification(
     body: str
 ) -> bool:
     """Send email notification"""
+    start = time.perf_counter()
     try:
-        msg = MIMEMultipart()
-        msg['From'] = settings.EMAIL_FROM
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        msg.attach(MIMEText(body, 'html'))
+        text = build_email_message(to_email, subject, body)
         
         server = smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT)
-        server.starttls()
-        server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-        text = msg.as_string()
+        if settings.SMTP_USE_TLS:
+            server.starttls()
+        if settings.SMTP_USERNAME:
+            server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
         server.sendmail(settings.EMAIL_FROM, to_email, text)
         server.quit()
         
+        record_send("email", time.perf_counter() - start, True)
         logger.info(f"Email sent successfully to {to_email}")
         return True
         
     except Exception as e:
+        record_send("email", time.perf_counter() - start, False)
         logger.error(f"Failed to send email to {to_email}: {str(e)}")
         return False
 
@@ -54,79 +70,178 @@ async def send_push_notification(
     user_id: int, 
     title: str, 
     body: str,
-    tokens: List[str]
+    tokens: List[Tuple[str, str]]
 ) -> bool:
-    """Send push notification via Firebase"""
+    """Send push notification to (token, provider) pairs"""
     try:
-        # This would integrate with Firebase Cloud Messaging
-        # For now, we'll log the notification
-        logger.info(f"Push notification sent to user {user_id}: {title}")
-        return True
+        if not tokens:
+            return False
+        
+        result = await send_push(
+            PushMessage(token=token, title=title, body=body, provider=provider)
+            for token, provider in tokens
+        )
+        logger.info(f"Push notification sent to {len(result.sent)} devices of user {user_id}: {title}")
+        return bool(result.sent)
         
     except Exception as e:
         logger.error(f"Failed to send push notification to user {user_id}: {str(e)}")
         return False
 
 
+async def get_device_tokens(db: AsyncSession, user_ids: List[int]) -> Dict[int, List[Tuple[str, str]]]:
+    """Load the registered (token, provider) pairs of many users in one query"""
+    tokens: Dict[int, List[Tuple[str, str]]] = defaultdict(list)
+    if not user_ids:
+        return tokens
+    result = await db.execute(
+        select(DeviceToken.user_id, DeviceToken.token, DeviceToken.provider)
+        .where(DeviceToken.user_id.in_(user_ids))
+    )
+    for user_id, token, provider in result.all():
+        tokens[user_id].append((token, provider))
+    return tokens
+
+
+async def prune_device_tokens(db: AsyncSession, tokens: List[str]) -> None:
+    """Delete tokens the provider reported as permanently invalid"""
+    if not tokens:
+        return
+    await db.execute(delete(DeviceToken).where(DeviceToken.token.in_(tokens)))
+    await db.commit()
+    logger.info(f"Pruned {len(tokens)} invalid device tokens")
+
+
 async def create_notification_record(
     db: AsyncSession,
     user_id: int,
     product_id: Optional[int],
     notification_type: str,
-    message: str
+    message: str,
+    is_read: bool = False
 ) -> Notification:
-    """Create notification record in database"""
+    """Create notification record in database
+
+    Records created read (e.g. the other channels of a reminder already
+    recorded) do not count towards the unread badge.
+    """
     notification = Notification(
         user_id=user_id,
         product_id=product_id,
         notification_type=notification_type,
         message=message,
         sent_at=datetime.utcnow(),
-        is_sent=True
+        is_sent=True,
+        is_read=is_read
     )
     
     db.add(notification)
+    if not is_read:
+        await db.execute(unread_delta_stmt(db.get_bind().dialect.name, user_id, 1))
     await db.commit()
     await db.refresh(notification)
     
+    publish_notification_created(user_id, {
+        "id": notification.id,
+        "product_id": product_id,
+        "notification_type": notification_type,
+        "message": message,
+        "created_at": notification.created_at,
+    })
+    
     return notification
 
 
-async def send_expiration_notifications():
-    """Send notifications for products expiring within the configured days"""
+async def send_expiration_notifications(
+    user_ids: Optional[List[int]] = None,
+    sent: Optional[Set[int]] = None
+) -> bool:
+    """Send notifications for products expiring within the configured days
+
+    Only the given users are swept; None sweeps everyone at once. Users
+    who were sent an email or push are added to sent as they go out, so
+    after a failed sweep only the others need to be retried.
+
+    The readiness heartbeat is written when the sweep delivered something
+    or had nothing to send, never for a sweep whose every send failed.
+    """
+    if sent is None:
+        sent = set()
+    already_sent = len(sent)
+    with SCHEDULER_SWEEP_DURATION.time():
+        attempted = await _send_expiration_notifications(user_ids, sent)
+    if attempted is not None and (not attempted or len(sent) > already_sent):
+        record_scheduler_heartbeat()
+    return attempted is not None
+
+
+def record_scheduler_heartbeat() -> None:
+    """Write the scheduler heartbeat read by the readiness probe (may be another process)"""
+    try:
+        path = settings.SCHEDULER_HEARTBEAT_FILE
+        with open(f"{path}.tmp", "w") as heartbeat:
+            heartbeat.write(str(time.time()))
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        logger.error(f"Failed to write scheduler heartbeat: {str(e)}")
+
+
+async def _send_expiration_notifications(user_ids: Optional[List[int]], sent: Set[int]) -> Optional[int]:
+    """Run one sweep; returns the number of sends attempted, None if it failed"""
+    attempted = 0
     async with get_async_session() as db:
         try:
-            # Get current date and target date range
-            today = datetime.utcnow().date()
-            target_date = today + timedelta(days=settings.NOTIFICATION_DAYS_BEFORE)
+            # Products inside each owner's notification_days window, in one
+            # query; rows are narrowed to their owner's local today below
+            now = datetime.now(timezone.utc)
+            result = await db.execute(expiring_products_query(
+                db.get_bind().dialect.name, now.date(), user_ids
+            ))
+            
+            notifications_to_send = []
+            for product, user, user_settings in result.all():
+                days_until = (product.expiration_date - local_today(user_settings.timezone, now)).days
+                if 0 <= days_until <= window_days(user_settings):
+                    notifications_to_send.append((product, user, user_settings, days_until))
             
-            # Find products expiring within the notification window
-            result = await db.execute(
-                select(Product, User, UserSettings)
-                .join(User, Product.user_id == User.id)
-                .join(UserSettings, User.id == UserSettings.user_id)
-                .where(
-                    Product.expiration_date >= today,
-                    Product.expiration_date <= target_date,
-                    Product.is_active == True,
-                    User.is_active == True
-                )
-            )
+            # Render every email of the sweep in one batch
+            email_rows = [
+                (product, days_until)
+                for product, user, user_settings, days_until in notifications_to_send
+                if user_settings.email_enabled and user.email
+            ]
+            email_bodies = dict(zip(
+                (product.id for product, _ in email_rows),
+                render_expiration_batch(email_rows)
+            ))
             
-            notifications_to_send = result.all()
+            device_tokens = await get_device_tokens(db, list({
+                user.id for _, user, user_settings, _ in notifications_to_send
+                if user_settings.push_enabled
+            }))
+            push_messages: List[PushMessage] = []
             
-            for product, user, user_settings in notifications_to_send:
+            # A reminder is one unread notification however many channels
+            # carried it; the records of the other channels are created read
+            recorded: Set[Tuple[int, int]] = set()
+            
+            def already_recorded(user_id: int, product_id: int) -> bool:
+                seen = (user_id, product_id) in recorded
+                recorded.add((user_id, product_id))
+                return seen
+            
+            for product, user, user_settings, days_until in notifications_to_send:
                 # Skip if user has disabled notifications
                 if not user_settings.email_enabled and not user_settings.push_enabled:
                     continue
                 
                 # Create notification message
-                days_until = (product.expiration_date - today).days
                 message = f"Reminder: {product.name} expires in {days_until} days"
                 
                 # Send email notification
                 if user_settings.email_enabled and user.email:
-                    email_body = create_email_template(product, days_until)
+                    email_body = email_bodies[product.id]
+                    attempted += 1
                     email_sent = await send_email_notification(
                         user.email, 
                         "Food Expiration Reminder", 
@@ -134,90 +249,152 @@ async def send_expiration_notifications():
                     )
                     
                     if email_sent:
+                        sent.add(user.id)
                         await create_notification_record(
-                            db, user.id, product.id, "email", message
+                            db, user.id, product.id, "email", message,
+                            is_read=already_recorded(user.id, product.id)
                         )
                 
-                # Send push notification
+                # Queue push notifications for one batched fan-out
                 if user_settings.push_enabled:
-                    push_sent = await send_push_notification(
-                        user.id, 
-                        "Expiration Reminder", 
-                        message,
-                        []  # Would get from user device tokens
-                    )
-                    
-                    if push_sent:
-                        await create_notification_record(
-                            db, user.id, product.id, "push", message
+                    push_messages.extend(
+                        PushMessage(
+                            token=token,
+                            title="Expiration Reminder",
+                            body=message,
+                            data={"user_id": str(user.id), "product_id": str(product.id)},
+                            provider=provider,
                         )
+                        for token, provider in device_tokens.get(user.id, [])
+                    )
                 
                 # Send combined notification
                 if user_settings.email_enabled and user_settings.push_enabled:
                     await create_notification_record(
-                        db, user.id, product.id, "both", message
+                        db, user.id, product.id, "both", message,
+                        is_read=already_recorded(user.id, product.id)
+                    )
+            
+            if push_messages:
+                attempted += len(push_messages)
+                push_result = await send_push(push_messages)
+                sent.update(int(m.data["user_id"]) for m in push_result.sent)
+                await prune_device_tokens(db, push_result.invalid_tokens)
+                
+                # One record per product that reached at least one device
+                delivered = {
+                    (int(m.data["user_id"]), int(m.data["product_id"])): m.body
+                    for m in push_result.sent
+                }
+                for (user_id, product_id), message in delivered.items():
+                    await create_notification_record(
+                        db, user_id, product_id, "push", message,
+                        is_read=already_recorded(user_id, product_id)
                     )
             
             logger.info(f"Processed {len(notifications_to_send)} expiration notifications")
+            return attempted
             
         except Exception as e:
             logger.error(f"Error sending expiration notifications: {str(e)}")
+            return None
 
 
 def create_email_template(product: Product, days_until: int) -> str:
     """Create HTML email template for expiration notification"""
-    return f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background-color: #f44336; color: white; padding: 20px; text-align: center; }}
-            .content {{ background-color: #f9f9f9; padding: 20px; border-radius: 5px; }}
-            .product-info {{ background-color: white; padding: 15px; margin: 15px 0; border-radius: 5px; }}
-            .footer {{ text-align: center; color: #666; font-size: 12px; margin-top: 20px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>Food Expiration Alert</h1>
-            </div>
-            <div class="content">
-                <p>Hello,</p>
-                <p>This is a reminder that one of your food items is approaching its expiration date:</p>
-                
-                <div class="product-info">
-                    <h3>{product.name}</h3>
-                    <p><strong>Expires in:</strong> {days_until} days</p>
-                    <p><strong>Expiration Date:</strong> {product.expiration_date}</p>
-                    {f'<p><strong>Shop:</strong> {product.shop_name}</p>' if product.shop_name else ''}
-                    {f'<p><strong>Amount:</strong> {product.amount} {product.unit}</p>' if product.amount and product.unit else ''}
-                </div>
-                
-                <p>Please check your food items and consider using them soon or disposing of them properly.</p>
-            </div>
-            <div class="footer">
-                <p>This is an automated message from your Food Expiration Tracker app.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    return render_expiration_email(product, days_until)
+
+
+async def refresh_delivery_schedule(
+    queue: DeliveryQueue,
+    since: Optional[datetime] = None
+) -> datetime:
+    """Load delivery preferences changed since the last refresh (all users when None)"""
+    started_at = datetime.utcnow()
+    now = datetime.now(timezone.utc)
+    query = (
+        select(UserSettings.user_id, UserSettings.timezone, UserSettings.delivery_hour, User.is_active)
+        .join(User, User.id == UserSettings.user_id)
+    )
+    if since is not None:
+        # The overlap catches changes committed while the last refresh ran
+        cutoff = since - timedelta(seconds=settings.SCHEDULER_BUCKET_SECONDS)
+        query = query.where(or_(
+            UserSettings.created_at >= cutoff,
+            UserSettings.updated_at >= cutoff,
+            User.updated_at >= cutoff
+        ))
+    
+    async with get_async_session() as db:
+        result = await db.stream(query)
+        async for rows in result.partitions(10000):
+            for user_id, zone_name, delivery_hour, is_active in rows:
+                if is_active:
+                    queue.set_preferences(user_id, zone_name, delivery_hour, now)
+                else:
+                    queue.remove(user_id)
+            # Let API requests run between chunks of a large initial load
+            await asyncio.sleep(0)
+    
+    logger.info(f"Delivery schedule refreshed: {len(queue)} users scheduled")
+    return started_at
 
 
 def start_notification_scheduler():
     """Start the notification scheduler"""
     async def notification_task():
+        load_templates()
+        queue = DeliveryQueue()
+        refreshed_at: Optional[datetime] = None
+        next_refresh = 0.0
+        bucket = settings.SCHEDULER_BUCKET_SECONDS
         while True:
             try:
-                await send_expiration_notifications()
-                # Run every hour
-                await asyncio.sleep(3600)
+                if time.time() >= next_refresh:
+                    refreshed_at = await refresh_delivery_schedule(queue, refreshed_at)
+                    next_refresh = time.time() + settings.SCHEDULER_REFRESH_SECONDS
+                
+                # Sweep everyone due within the current time bucket together
+                bucket_end = (time.time() // bucket + 1) * bucket
+                user_ids = queue.pop_due(bucket_end, settings.SCHEDULER_MAX_BATCH_USERS)
+                if user_ids:
+                    now = datetime.now(timezone.utc)
+                    sent: Set[int] = set()
+                    if await send_expiration_notifications(user_ids, sent):
+                        queue.mark_delivered(user_ids, now)
+                    else:
+                        # Users already reminded are done for today; a
+                        # reminder they missed comes again tomorrow while
+                        # the product is still in their window
+                        queue.mark_delivered([u for u in user_ids if u in sent], now)
+                        queue.retry(
+                            [u for u in user_ids if u not in sent],
+                            now + timedelta(seconds=settings.SCHEDULER_RETRY_SECONDS)
+                        )
+                    continue
+                
+                next_due = queue.next_due()
+                wake_at = next_refresh if next_due is None else min(next_due, next_refresh)
+                await asyncio.sleep(max(0.0, wake_at - time.time()))
             except Exception as e:
                 logger.error(f"Error in notification scheduler: {str(e)}")
-                await asyncio.sleep(3600)
+                await asyncio.sleep(settings.SCHEDULER_RETRY_SECONDS)
+    
+    async def compaction_task():
+        while True:
+            await run_notification_compaction()
+            await asyncio.sleep(settings.NOTIFICATION_COMPACTION_INTERVAL_HOURS * 3600)
+    
+    async def aggregation_task():
+        while True:
+            await run_daily_aggregation()
+            # Once a day, just after midnight UTC
+            now = datetime.now(timezone.utc)
+            tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+            await asyncio.sleep((tomorrow - now).total_seconds() + 60)
     
     # Start the scheduler in the background
     asyncio.create_task(notification_task())
+    asyncio.create_task(compaction_task())
+    asyncio.create_task(aggregation_task())
     logger.info("Notification scheduler started")
\ No newline at end of file
@@ -3,8 +3,8 @@ Product schemas for API validation and serialization
 """
 
 from pydantic import BaseModel, validator
-from typing import Optional
-from datetime import date
+from typing import List, Optional
+from datetime import date, datetime
 from decimal import Decimal
 
 
@@ -54,6 +54,11 @@ class ProductUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
+class ProductPatch(ProductUpdate):
+    """Schema for partial product updates"""
+    version: int  # as last read
+
+
 class ProductResponse(ProductBase):
     """Schema for product response"""
     id: int
@@ -62,8 +67,9 @@ class ProductResponse(ProductBase):
     days_until_expiration: int
     is_expired: bool
     is_near_expiration: bool
-    created_at: str
-    updated_at: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    version: int
     
     class Config:
         from_attributes = True
@@ -78,4 +84,35 @@ class BarcodeScanResponse(BaseModel):
     """Schema for barcode scan response"""
     success: bool
     message: str
-    product_data: Optional[dict] = None
\ No newline at end of file
+    product_data: Optional[dict] = None
+
+
+class CategoryStats(BaseModel):
+    """Consumption and waste of one category"""
+    category_id: Optional[int] = None
+    active: int
+    consumed: int
+    expired: int
+    waste_rate: Optional[float] = None  # expired / (consumed + expired)
+
+
+class ShopStats(BaseModel):
+    """Consumption, waste and shelf life of products bought at one shop"""
+    shop_name: Optional[str] = None
+    active: int
+    consumed: int
+    expired: int
+    average_shelf_life_days: Optional[float] = None  # purchase to expiration date
+
+
+class ExpiryWeekStats(BaseModel):
+    """Active products expiring in the week starting on week_start (a Monday)"""
+    week_start: date
+    expiring: int
+
+
+class ProductAnalyticsResponse(BaseModel):
+    """Schema for the analytics dashboard"""
+    categories: List[CategoryStats]
+    shops: List[ShopStats]
+    upcoming_weeks: List[ExpiryWeekStats]
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""
+Incrementally maintained product statistics for the analytics dashboard
+"""
+
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey
+from app.models import Base
+
+
+class ProductAggregate(Base):
+    """Per-user product counters for one category, shop or expiry week
+
+    Kept current by triggers on products (see app.services.aggregates).
+    active_count covers active products not yet past their expiry date;
+    consumed_count and expired_count are running totals of products used up
+    in time and products that went off, so deleting a product later does not
+    change them.
+    """
+
+    __tablename__ = "product_aggregates"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    dimension = Column(String(16), primary_key=True)  # 'category', 'shop', 'week'
+    bucket = Column(String(255), primary_key=True)  # category id, shop name, week start; '' for none
+    active_count = Column(Integer, nullable=False, default=0, server_default="0")
+    consumed_count = Column(Integer, nullable=False, default=0, server_default="0")
+    expired_count = Column(Integer, nullable=False, default=0, server_default="0")
+    shelf_life_days = Column(Integer, nullable=False, default=0, server_default="0")
+    shelf_life_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            "dimension": self.dimension,
+            "bucket": self.bucket,
+            "active_count": self.active_count,
+            "consumed_count": self.consumed_count,
+            "expired_count": self.expired_count,
+            "shelf_life_days": self.shelf_life_days,
+            "shelf_life_count": self.shelf_life_count,
+        }
+
+
+class AggregateWatermark(Base):
+    """Single row: products expiring before this date are counted as expired
+
+    Also holds the start time of the running rebuild, so only one runs
+    across all processes.
+    """
+
+    __tablename__ = "product_aggregate_watermark"
+
+    id = Column(Integer, primary_key=True, default=1)
+    expired_before = Column(Date, nullable=False)
+    rebuild_started_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,53 @@
+"""
+Partial product updates with optimistic concurrency
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user
+from app.database.session import get_db
+from app.models.user import User
+from app.schemas.product import ProductPatch, ProductResponse
+from app.services.events import publish_product_changed
+from app.services.product_updates import REQUIRED_FIELDS, current_version, update_product
+
+router = APIRouter()
+
+
+@router.patch("/products/{product_id}", response_model=ProductResponse)
+def patch_product(
+    product_id: int,
+    product_patch: ProductPatch,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Update the supplied fields of a product still at the given version
+
+    Responds 409 with the current version when the product was changed
+    since the client read it; fetch it again and reapply the edit.
+    """
+    changes = product_patch.model_dump(exclude_unset=True, exclude={"version"})
+    if not changes:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No fields to update")
+    cleared = [field for field in REQUIRED_FIELDS if field in changes and changes[field] is None]
+    if cleared:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{', '.join(cleared)} cannot be cleared"
+        )
+
+    product = update_product(db, current_user.id, product_id, product_patch.version, changes)
+    if product is None:
+        # Only a failed update reads the row, to tell the two cases apart
+        latest = current_version(db, current_user.id, product_id)
+        if latest is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Product was changed by someone else", "current_version": latest}
+        )
+
+    response = ProductResponse.model_validate(product)
+    publish_product_changed(current_user.id, product.id, "updated", response.model_dump(mode="json"))
+    return response
@@ -0,0 +1,54 @@
+"""
+Optimistic-concurrency product updates
+
+Every product carries a version that each update increments. A client
+sends back the version it last read, and the edit is a single
+UPDATE ... WHERE id = ? AND version = ? RETURNING ... that sets only the
+supplied columns: nothing is read before the write, and an edit made on
+a stale copy matches no row instead of overwriting a newer one.
+"""
+
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session, object_session
+
+from app.models.product import Product
+
+# Columns a partial update may not clear
+REQUIRED_FIELDS = ("name", "expiration_date", "is_active")
+
+
+@event.listens_for(Product, "before_update")
+def _bump_version(mapper, connection, target):
+    # ORM writes that load the row first (PUT, scripts) also invalidate the
+    # versions clients hold
+    if object_session(target).is_modified(target, include_collections=False):
+        target.version = Product.version + 1
+
+
+def update_product(db: Session, user_id: int, product_id: int, version: int,
+                   changes: Dict[str, Any]) -> Optional[Product]:
+    """Apply changes to a user's product if it is still at version
+
+    Returns the updated product, or None when the user has no such product
+    or it has moved on to another version.
+    """
+    product = db.scalars(
+        update(Product)
+        .where(Product.id == product_id, Product.user_id == user_id, Product.version == version)
+        .values(**changes, version=Product.version + 1)
+        .returning(Product)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if product is not None:
+        # Keep the returned values; committing would expire them and the
+        # response would read the row again
+        db.expunge(product)
+    db.commit()
+    return product
+
+
+def current_version(db: Session, user_id: int, product_id: int) -> Optional[int]:
+    """Version of a user's product, or None if they have no such product"""
+    return db.scalar(select(Product.version).where(Product.id == product_id, Product.user_id == user_id))
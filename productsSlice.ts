@@ -24,11 +24,14 @@ interface Product {
   is_near_expiration: boolean;
   created_at: string;
   updated_at?: string;
+  version: number;
 }
 
 interface ProductsState {
   products: Product[];
   expiringProducts: Product[];
+  searchQuery: string;
+  searchResults: Product[];
   isLoading: boolean;
   error: string | null;
 }
@@ -36,6 +39,8 @@ interface ProductsState {
 const initialState: ProductsState = {
   products: [],
   expiringProducts: [],
+  searchQuery: '',
+  searchResults: [],
   isLoading: false,
   error: null,
 };
@@ -73,6 +78,25 @@ export const fetchExpiringProducts = createAsyncThunk(
   }
 );
 
+export const searchProducts = createAsyncThunk(
+  'products/searchProducts',
+  async (query: string, { getState, rejectWithValue }) => {
+    try {
+      const state = getState() as any;
+      const token = state.auth.token;
+
+      const response = await axios.get(API_ENDPOINTS.PRODUCTS_SEARCH, {
+        ...getAxiosConfig(token),
+        params: { q: query },
+      });
+
+      return response.data;
+    } catch (error: any) {
+      return rejectWithValue(error.response?.data?.detail || 'Failed to search products');
+    }
+  }
+);
+
 export const createProduct = createAsyncThunk(
   'products/createProduct',
   async (productData: FormData, { getState, rejectWithValue }) => {
@@ -115,6 +139,33 @@ export const updateProduct = createAsyncThunk(
   }
 );
 
+// Sends only the changed fields; fails with 409 if someone else edited the
+// product since `version` was read (detail.current_version is the new one)
+export const patchProduct = createAsyncThunk(
+  'products/patchProduct',
+  async ({ id, version, changes }: { id: number; version: number; changes: Partial<Product> }, { getState, rejectWithValue }) => {
+    try {
+      const state = getState() as any;
+      const token = state.auth.token;
+      
+      const response = await axios.patch(API_ENDPOINTS.PRODUCT_BY_ID(id), { ...changes, version }, {
+        headers: {
+          Authorization: `Bearer ${token}`,
+        }
+      });
+      
+      return response.data;
+    } catch (error: any) {
+      const detail = error.response?.data?.detail;
+      if (Array.isArray(detail)) {
+        // 422: one entry per invalid field
+        return rejectWithValue(detail.map((item: any) => item.msg).join('; ') || 'Failed to update product');
+      }
+      return rejectWithValue(detail?.message || detail || 'Failed to update product');
+    }
+  }
+);
+
 export const deleteProduct = createAsyncThunk(
   'products/deleteProduct',
   async (productId: number, { getState, rejectWithValue }) => {
@@ -161,6 +212,12 @@ const productsSlice = createSlice({
     clearProducts: (state) => {
       state.products = [];
       state.expiringProducts = [];
+      state.searchQuery = '';
+      state.searchResults = [];
+    },
+    clearSearch: (state) => {
+      state.searchQuery = '';
+      state.searchResults = [];
     },
   },
   extraReducers: (builder) => {
@@ -191,6 +248,21 @@ const productsSlice = createSlice({
         state.isLoading = false;
         state.error = action.payload as string;
       })
+      // Search Products (as the user types, so no loading spinner)
+      .addCase(searchProducts.pending, (state, action) => {
+        state.searchQuery = action.meta.arg;
+      })
+      .addCase(searchProducts.fulfilled, (state, action) => {
+        // Ignore responses to queries the user has already typed past
+        if (action.meta.arg === state.searchQuery) {
+          state.searchResults = action.payload;
+        }
+      })
+      .addCase(searchProducts.rejected, (state, action) => {
+        if (action.meta.arg === state.searchQuery) {
+          state.error = action.payload as string;
+        }
+      })
       // Create Product
       .addCase(createProduct.pending, (state) => {
         state.isLoading = true;
@@ -220,6 +292,15 @@ const productsSlice = createSlice({
         state.isLoading = false;
         state.error = action.payload as string;
       })
+      .addCase(patchProduct.fulfilled, (state, action) => {
+        const index = state.products.findIndex(p => p.id === action.payload.id);
+        if (index !== -1) {
+          state.products[index] = action.payload;
+        }
+      })
+      .addCase(patchProduct.rejected, (state, action) => {
+        state.error = action.payload as string;
+      })
       // Delete Product
       .addCase(deleteProduct.pending, (state) => {
         state.isLoading = true;
@@ -250,5 +331,5 @@ const productsSlice = createSlice({
   },
 });
 
-export const { clearError, clearProducts } = productsSlice.actions;
+export const { clearError, clearProducts, clearSearch } = productsSlice.actions;
 export default productsSlice.reducer;
\ No newline at end of file
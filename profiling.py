@@ -0,0 +1,272 @@
+"""
+Opt-in per-request profiling and slow query logging
+"""
+
+import cProfile
+import functools
+import hmac
+import inspect
+import io
+import itertools
+import logging
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_PREFIXES = ("select", "update", "delete", "with")
+
+
+class RequestProfile:
+    """Call profiles and SQL statements captured for one request"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, method: str, path: str):
+        self.id = next(self._ids)
+        self.method = method
+        self.path = path
+        self.started_at = datetime.utcnow()
+        self.status_code: Optional[int] = None
+        self.duration_ms: Optional[float] = None
+        self.statements: List[Dict[str, Any]] = []
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def new_profiler(self) -> cProfile.Profile:
+        """Create a profiler for one thread's share of the request"""
+        profiler = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profiler)
+        return profiler
+
+    def add_statement(self, statement: str, duration_ms: float, rowcount: Optional[int]) -> None:
+        with self._lock:
+            self.statements.append({
+                "statement": statement,
+                "duration_ms": round(duration_ms, 3),
+                "rowcount": rowcount,
+            })
+
+    def call_tree(self, limit: int = 60) -> str:
+        """Merged cProfile statistics, sorted by cumulative time"""
+        if not self._profiles:
+            return ""
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profiles[0], stream=stream)
+        for profiler in self._profiles[1:]:
+            stats.add(profiler)
+        stats.sort_stats("cumulative").print_stats(limit)
+        stats.print_callees(limit // 3)
+        return stream.getvalue()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "sql_count": len(self.statements),
+            "sql_time_ms": round(sum(s["duration_ms"] for s in self.statements), 3),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **self.summary(),
+            "statements": self.statements,
+            "profile": self.call_tree(),
+        }
+
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+# Most recent profiles, oldest evicted first
+profiles: Deque[RequestProfile] = deque(maxlen=settings.PROFILING_BUFFER_SIZE)
+
+
+def get_profile(profile_id: int) -> Optional[RequestProfile]:
+    for profile in tuple(profiles):
+        if profile.id == profile_id:
+            return profile
+    return None
+
+
+# Profiling hooks are process-wide: on 3.12+ only one cProfile profiler may
+# be active at a time, and on older versions a second profiler enabled on
+# the event loop thread replaces the first. One request is profiled at a
+# time; requests arriving meanwhile are served unprofiled.
+_profiler_lock = threading.Lock()
+
+
+def _should_profile(scope) -> bool:
+    if settings.ADMIN_TOKEN:
+        header = settings.PROFILING_HEADER.lower().encode()
+        expected = settings.ADMIN_TOKEN.encode()
+        for name, value in scope.get("headers", ()):
+            if name == header and hmac.compare_digest(value, expected):
+                return True
+    return settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+class ProfilingMiddleware:
+    """Profile requests that carry the profiling header or fall in the sample"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not _should_profile(scope)
+                or not _profiler_lock.acquire(blocking=False)):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            profile = RequestProfile(scope["method"], scope["path"])
+            # Covers the event-loop side of the request (and, on 3.12+,
+            # every thread); before 3.12 sync endpoints and dependencies are
+            # profiled in their worker thread by profile_sync_calls
+            profiler = profile.new_profiler()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler (a debugger, coverage) owns the hook
+                await self.app(scope, receive, send)
+                return
+
+            token = current_profile.set(profile)
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    profile.status_code = message["status"]
+                await send(message)
+
+            start = time.perf_counter()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.disable()
+                profile.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+                current_profile.reset(token)
+                profiles.append(profile)
+        finally:
+            _profiler_lock.release()
+
+
+def _profiled(call: Callable) -> Callable:
+    @functools.wraps(call)
+    def profiled_call(*args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return call(*args, **kwargs)
+        profiler = profile.new_profiler()
+        profiler.enable()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            profiler.disable()
+    return profiled_call
+
+
+def _wrap_dependant(dependant, wrappers: Dict[Callable, Callable]) -> None:
+    call = dependant.call
+    if (call is not None
+            and call not in wrappers.values()
+            and not inspect.iscoroutinefunction(call)
+            and not inspect.isgeneratorfunction(call)):
+        # One wrapper per callable keeps FastAPI's per-request dependency
+        # cache (keyed by the callable) working across routes
+        if call not in wrappers:
+            wrappers[call] = _profiled(call)
+        dependant.call = wrappers[call]
+    for sub_dependant in dependant.dependencies:
+        _wrap_dependant(sub_dependant, wrappers)
+
+
+def profile_sync_calls(app) -> None:
+    """Profile sync endpoints and dependencies inside their threadpool thread
+
+    cProfile only sees the thread it is enabled in, so the calls FastAPI
+    hands to the threadpool (bcrypt, ORM loads, serialization in sync
+    routes) are wrapped to run under their own profiler when the current
+    request is being profiled. Must run after all routers are included.
+
+    From Python 3.12 cProfile hooks every thread, so the request's profiler
+    already covers them and nothing is wrapped.
+    """
+    if sys.version_info >= (3, 12):
+        return
+    wrappers: Dict[Callable, Callable] = {}
+    for route in app.routes:
+        dependant = getattr(route, "dependant", None)
+        if dependant is not None:
+            _wrap_dependant(dependant, wrappers)
+
+
+def _explain(cursor, statement: str, parameters, dialect_name: str) -> str:
+    prefix = "EXPLAIN QUERY PLAN " if dialect_name == "sqlite" else "EXPLAIN "
+    # A failed statement aborts the request's transaction on PostgreSQL;
+    # a savepoint confines a failed EXPLAIN to itself
+    savepoint = dialect_name == "postgresql"
+    explain_cursor = cursor.connection.cursor()
+    try:
+        if savepoint:
+            explain_cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            explain_cursor.execute(prefix + statement, parameters or ())
+            plan = explain_cursor.fetchall()
+        except Exception:
+            if savepoint:
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            raise
+        finally:
+            if savepoint:
+                explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        return "\n".join(" ".join(str(column) for column in row) for row in plan)
+    finally:
+        explain_cursor.close()
+
+
+def _traced(execute: Callable, method_name: str, dialect_name: str) -> Callable:
+    def traced_execute(cursor, statement, *args, **kwargs):
+        start = time.perf_counter()
+        result = execute(cursor, statement, *args, **kwargs)
+        duration_ms = (time.perf_counter() - start) * 1000
+        threshold = settings.SLOW_QUERY_THRESHOLD_MS
+
+        profile = current_profile.get()
+        if profile is not None:
+            rowcount = cursor.rowcount if cursor.rowcount >= 0 else None
+            profile.add_statement(statement, duration_ms, rowcount)
+
+        if threshold and duration_ms >= threshold:
+            plan = ""
+            parameters = args[0] if args and method_name == "do_execute" else None
+            if (method_name != "do_executemany"
+                    and statement.lstrip().lower().startswith(EXPLAIN_PREFIXES)):
+                try:
+                    plan = _explain(cursor, statement, parameters, dialect_name)
+                except Exception as e:
+                    plan = f"(EXPLAIN failed: {e})"
+            logger.warning(f"Slow query ({duration_ms:.1f} ms): {statement}\nPlan:\n{plan}")
+        return result
+
+    return traced_execute
+
+
+def instrument_engine(engine) -> None:
+    """Capture SQL for profiled requests and log statements over the slow threshold"""
+    engine = getattr(engine, "sync_engine", engine)
+    dialect = engine.dialect
+    for name in ("do_execute", "do_execute_no_params", "do_executemany"):
+        setattr(dialect, name, _traced(getattr(dialect, name), name, dialect.name))
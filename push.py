@@ -0,0 +1,276 @@
+"""
+Push notification delivery through the FCM HTTP v1 API
+
+FCM v1 accepts one message per request, so a fan-out is spread over
+``PUSH_MAX_CONCURRENCY`` chunks sent in parallel, each over a pooled
+keep-alive connection on a worker thread (like firebase-admin's
+``send_each``); a chunk holds at most ``PUSH_MULTICAST_LIMIT`` messages.
+FCM delivers to Android, iOS (through APNs) and web tokens alike.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import settings
+from app.utils.metrics import record_send
+
+logger = logging.getLogger(__name__)
+
+FCM_SCOPE = "https://www.googleapis.com/auth/firebase.messaging"
+
+# Errors meaning the token will never work again; anything else, including
+# INVALID_ARGUMENT (usually a bad payload), leaves the token registered
+UNREGISTERED_ERRORS = frozenset({"UNREGISTERED", "NOT_FOUND"})
+
+# Outcome of messages that never reached the provider
+TRANSPORT_ERROR = "TRANSPORT_ERROR"
+
+
+@dataclass
+class PushMessage:
+    """A single push notification addressed to one device token"""
+    token: str
+    title: str
+    body: str
+    data: Dict[str, str] = field(default_factory=dict)
+    provider: str = "fcm"
+
+    def to_payload(self) -> dict:
+        return {
+            "token": self.token,
+            "notification": {"title": self.title, "body": self.body},
+            "data": self.data,
+        }
+
+
+@dataclass
+class PushResult:
+    """Outcome of a fan-out"""
+    sent: List[PushMessage] = field(default_factory=list)
+    failed: List[PushMessage] = field(default_factory=list)
+    invalid_tokens: List[str] = field(default_factory=list)
+
+    def merge(self, other: "PushResult") -> None:
+        self.sent.extend(other.sent)
+        self.failed.extend(other.failed)
+        self.invalid_tokens.extend(other.invalid_tokens)
+
+
+class PushProvider:
+    """Base sender: batches, per-loop concurrency limit and outcome accounting
+
+    Subclasses implement ``_send_one``, returning None on success or the
+    provider's error code.
+    """
+
+    def __init__(self, batch_size: int = 500, max_concurrency: int = 4, timeout: float = 10.0):
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        # One semaphore per event loop: a semaphore is bound to the loop it
+        # first waits on, and the API workers and scheduler each run their own
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    def _send_one(self, message: PushMessage) -> Optional[str]:
+        raise NotImplementedError
+
+    def _send_batch_sync(self, batch: Sequence[PushMessage]) -> List[Tuple[PushMessage, Optional[str]]]:
+        """Send a batch on one connection; returns an outcome for every message"""
+        import requests
+
+        outcomes: List[Tuple[PushMessage, Optional[str]]] = []
+        for i, message in enumerate(batch):
+            start = time.perf_counter()
+            try:
+                error = self._send_one(message)
+            except requests.RequestException as e:
+                record_send("push", time.perf_counter() - start, False)
+                # The provider is unreachable; fail the rest of the batch
+                # rather than waiting out a timeout per message
+                logger.error(f"Push batch aborted after {i} of {len(batch)} messages: {str(e)}")
+                outcomes.extend((m, TRANSPORT_ERROR) for m in batch[i:])
+                record_send("push", None, False, count=len(batch) - i - 1)
+                break
+            record_send("push", time.perf_counter() - start, error is None)
+            outcomes.append((message, error))
+        return outcomes
+
+    async def _send_batch(self, batch: Sequence[PushMessage], result: PushResult) -> None:
+        async with self.semaphore:
+            try:
+                outcomes = await asyncio.to_thread(self._send_batch_sync, batch)
+            except Exception as e:
+                logger.error(f"Push batch of {len(batch)} failed: {str(e)}")
+                record_send("push", None, False, count=len(batch))
+                result.failed.extend(batch)
+                return
+
+        for message, error in outcomes:
+            if error is None:
+                result.sent.append(message)
+            else:
+                result.failed.append(message)
+                if error in UNREGISTERED_ERRORS:
+                    result.invalid_tokens.append(message.token)
+
+    async def send(self, messages: Iterable[PushMessage]) -> PushResult:
+        """Send messages in batches, concurrently up to the provider limit"""
+        messages = list(messages)
+        result = PushResult()
+        # Even a small fan-out uses every connection: each request carries
+        # one message, so one batch per thread would send them in series
+        size = min(self.batch_size, max(1, -(-len(messages) // self.max_concurrency)))
+        batches = [messages[i:i + size] for i in range(0, len(messages), size)]
+        await asyncio.gather(*(self._send_batch(batch, result) for batch in batches))
+        return result
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class FCMProvider(PushProvider):
+    """Firebase Cloud Messaging HTTP v1 sender
+
+    POSTs ``{"message": ...}`` to ``/v1/projects/{project_id}/messages:send``
+    with an OAuth2 access token from service-account ``credentials``
+    (anything with google-auth's ``token``/``valid``/``refresh`` interface).
+    """
+
+    def __init__(self, base_url: str, project_id: str, credentials: Any, **kwargs):
+        super().__init__(**kwargs)
+        self.url = f"{base_url.rstrip('/')}/v1/projects/{project_id}/messages:send"
+        self.credentials = credentials
+        self._token_lock = threading.Lock()
+
+    def _access_token(self, force_refresh: bool = False) -> str:
+        with self._token_lock:
+            if force_refresh or not self.credentials.valid:
+                from google.auth.transport.requests import Request
+                self.credentials.refresh(Request(self.session))
+            return self.credentials.token
+
+    def _post(self, message: PushMessage, token: str):
+        return self.session.post(
+            self.url,
+            json={"message": message.to_payload()},
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=self.timeout,
+        )
+
+    def _send_one(self, message: PushMessage) -> Optional[str]:
+        response = self._post(message, self._access_token())
+        if response.status_code == 401:
+            # Revoked or expired early; refresh once and retry
+            response = self._post(message, self._access_token(force_refresh=True))
+        if response.ok:
+            return None
+        return _fcm_error_code(response)
+
+    @classmethod
+    def from_settings(cls) -> "FCMProvider":
+        from google.oauth2 import service_account
+
+        credentials = service_account.Credentials.from_service_account_file(
+            settings.FIREBASE_CREDENTIALS_PATH, scopes=[FCM_SCOPE]
+        )
+        return cls(
+            settings.PUSH_PROVIDER_URL,
+            settings.FIREBASE_PROJECT_ID or credentials.project_id,
+            credentials,
+            batch_size=settings.PUSH_MULTICAST_LIMIT,
+            max_concurrency=settings.PUSH_MAX_CONCURRENCY,
+        )
+
+
+def _fcm_error_code(response) -> str:
+    """FcmError code of a failed send, else its canonical status"""
+    try:
+        error = response.json()["error"]
+    except (ValueError, KeyError, TypeError):
+        return "NOT_FOUND" if response.status_code == 404 else f"HTTP_{response.status_code}"
+    for detail in error.get("details", []):
+        if detail.get("@type", "").endswith("google.firebase.fcm.v1.FcmError") and detail.get("errorCode"):
+            return detail["errorCode"]
+    return error.get("status") or f"HTTP_{response.status_code}"
+
+
+# Providers device tokens may be registered with
+PROVIDER_FACTORIES: Dict[str, Callable[[], PushProvider]] = {
+    "fcm": FCMProvider.from_settings,
+}
+
+_providers: Dict[str, PushProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_push_provider(name: str = "fcm") -> PushProvider:
+    """Get the shared client of a provider, creating it on first use"""
+    provider = _providers.get(name)
+    if provider is None:
+        if name not in PROVIDER_FACTORIES:
+            raise ValueError(f"Unknown push provider: {name}")
+        with _providers_lock:
+            provider = _providers.get(name)
+            if provider is None:
+                provider = _providers[name] = PROVIDER_FACTORIES[name]()
+    return provider
+
+
+def set_push_provider(name: str, provider: PushProvider) -> None:
+    """Install a provider client, e.g. one pointed at fcm_stub.py"""
+    with _providers_lock:
+        previous = _providers.get(name)
+        _providers[name] = provider
+    if previous is not None and previous is not provider:
+        previous.close()
+
+
+async def send_push(messages: Iterable[PushMessage]) -> PushResult:
+    """Send messages through their tokens' providers concurrently
+
+    Messages for a provider that is unknown or cannot be configured are
+    counted as failed.
+    """
+    by_provider: Dict[str, List[PushMessage]] = defaultdict(list)
+    for message in messages:
+        by_provider[message.provider].append(message)
+
+    result = PushResult()
+    sends = []
+    for name, provider_messages in by_provider.items():
+        try:
+            provider = get_push_provider(name)
+        except Exception as e:
+            logger.error(f"Cannot send {len(provider_messages)} pushes via {name}: {str(e)}")
+            record_send("push", None, False, count=len(provider_messages))
+            result.failed.extend(provider_messages)
+            continue
+        sends.append(provider.send(provider_messages))
+
+    for provider_result in await asyncio.gather(*sends):
+        result.merge(provider_result)
+    return result
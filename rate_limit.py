@@ -0,0 +1,243 @@
+"""
+Token-bucket rate limiting keyed by user, or by client IP for anonymous
+requests
+"""
+
+import asyncio
+import ipaddress
+import json
+import math
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.auth import verify_token
+from app.utils.cache import LocalCache
+
+# Users of verified access tokens, so the signature is checked once per
+# token rather than on every request
+token_users = LocalCache("rate_limit_tokens", ttl=300, maxsize=10000)
+
+
+class MemoryBucketStore:
+    """Token buckets held in this process"""
+
+    PRUNE_EVERY = 10000
+    blocking = False
+
+    def __init__(self):
+        # key -> [tokens, last refill time]
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._operations = 0
+        self._max_refill_seconds = 0.0
+
+    def take(self, key: str, cost: float, rate: float, capacity: float) -> float:
+        """Take cost tokens; returns 0 if allowed, else seconds until it would be"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now]
+            else:
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+
+            self._operations += 1
+            self._max_refill_seconds = max(self._max_refill_seconds, capacity / rate)
+            if self._operations >= self.PRUNE_EVERY:
+                self._prune(now)
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / rate
+
+    def _prune(self, now: float) -> None:
+        # Buckets idle long enough to be full again carry no state
+        self._operations = 0
+        stale = [
+            key for key, (_, updated) in self._buckets.items()
+            if now - updated > self._max_refill_seconds
+        ]
+        for key in stale:
+            del self._buckets[key]
+
+
+class SQLiteBucketStore:
+    """Token buckets in a local SQLite file shared by all workers on a host
+
+    Each take is one short write transaction, so it costs far more than the
+    in-memory store; use it only when the limit must hold across workers.
+    Takes run on a worker thread, since one may wait for another
+    process's write lock.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, cost: float, rate: float, capacity: float) -> float:
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            wait = 0.0 if tokens >= cost else (cost - tokens) / rate
+            if not wait:
+                tokens -= cost
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+def create_bucket_store(url: str):
+    """Create the store named by RATE_LIMIT_STORE ('memory' or 'sqlite:///path')"""
+    if url.startswith("sqlite:///"):
+        return SQLiteBucketStore(url[len("sqlite:///"):])
+    return MemoryBucketStore()
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware applying per-user and per-IP buckets
+
+    Requests with a valid access token draw from their user's bucket,
+    however many devices or addresses they come from; the rest draw from
+    their client IP's. Each route has a cost (RATE_LIMIT_ROUTE_COSTS,
+    default 1), so expensive endpoints drain the bucket faster. Probes and
+    metrics (RATE_LIMIT_EXEMPT_PATHS) are never limited. Rejected requests
+    get a 429 with Retry-After.
+    """
+
+    def __init__(self, app, store=None):
+        self.app = app
+        self.store = store or create_bucket_store(settings.RATE_LIMIT_STORE)
+        self.configure()
+        settings.on_reload(self.configure)
+
+    def configure(self, changed=None) -> None:
+        """Read the limits and route costs from settings"""
+        self.costs: Dict[Tuple[str, str], float] = {
+            tuple(route.split(" ", 1)): cost
+            for route, cost in settings.RATE_LIMIT_ROUTE_COSTS.items()
+        }
+        self.ip_limit = (settings.RATE_LIMIT_IP_PER_SECOND, settings.RATE_LIMIT_IP_BURST)
+        self.user_limit = (settings.RATE_LIMIT_USER_PER_SECOND, settings.RATE_LIMIT_USER_BURST)
+        self.trusted_proxies = [
+            ipaddress.ip_network(proxy, strict=False) for proxy in settings.RATE_LIMIT_TRUSTED_PROXIES
+        ]
+        self.exempt_paths = tuple(path.rstrip("/") for path in settings.RATE_LIMIT_EXEMPT_PATHS)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._is_exempt(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        cost = self.costs.get((scope["method"], scope["path"]), 1)
+        key, limit = self._bucket(scope)
+        if self.store.blocking:
+            wait = await asyncio.to_thread(self.store.take, key, cost, *limit)
+        else:
+            wait = self.store.take(key, cost, *limit)
+        if wait:
+            await self._reject(send, wait)
+            return
+        await self.app(scope, receive, send)
+
+    def _is_exempt(self, path: str) -> bool:
+        return any(path == prefix or path.startswith(prefix + "/") for prefix in self.exempt_paths)
+
+    def _bucket(self, scope) -> Tuple[str, Tuple[float, float]]:
+        token = _bearer_token(scope)
+        if token:
+            username = _token_user(token)
+            if username is not None:
+                return f"user:{username}", self.user_limit
+        return f"ip:{self._client_ip(scope)}", self.ip_limit
+
+    def _is_trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def _client_ip(self, scope) -> str:
+        """The peer address, or the client a trusted proxy forwarded for"""
+        client = scope.get("client")
+        address = client[0] if client else "-"
+        if not self._is_trusted(address):
+            return address
+        for name, value in scope.get("headers", ()):
+            if name == b"x-forwarded-for":
+                # Walk back from the nearest hop; the first address not
+                # added by one of our proxies is the client
+                for hop in reversed(value.decode("latin-1").split(",")):
+                    address = hop.strip()
+                    if not self._is_trusted(address):
+                        break
+                break
+        return address
+
+    @staticmethod
+    async def _reject(send, wait: float) -> None:
+        retry_after = str(max(1, math.ceil(wait)))
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", retry_after.encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _token_user(token: str) -> Optional[str]:
+    """Username of a valid access token, None for an invalid one"""
+    entry = token_users.get(token)
+    if entry is None:
+        payload = verify_token(token)
+        if payload is None:
+            return None
+        entry = (payload["sub"], payload.get("exp"))
+        token_users.set(token, entry)
+    username, expires_at = entry
+    if expires_at is not None and expires_at < time.time():
+        return None
+    return username
+
+
+def _bearer_token(scope) -> Optional[str]:
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            if value[:7].lower() == b"bearer ":
+                return value[7:].decode("latin-1")
+            return None
+    return None
@@ -0,0 +1,130 @@
+"""
+Notification history retention: archives old notifications to compressed
+NDJSON files and removes them from the live table
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from collections import Counter
+from typing import Dict, List, Optional
+
+from sqlalchemy import Index, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database.session import get_async_session
+from app.models.notification import Notification
+from app.services.notification_feed import unread_decrement_stmt
+
+logger = logging.getLogger(__name__)
+
+# Serves the per-user history listing (newest first). The retention scan
+# filters on created_at alone and walks the primary key instead.
+notifications_user_created_index = Index(
+    "ix_notifications_user_id_created_at",
+    Notification.user_id,
+    Notification.created_at.desc(),
+)
+
+ARCHIVE_COLUMNS = [column.name for column in Notification.__table__.columns]
+
+
+def _archive_path(month: str, first_id: int, last_id: int) -> str:
+    return os.path.join(
+        settings.NOTIFICATION_ARCHIVE_DIR, f"notifications-{month}-{first_id}-{last_id}.ndjson.gz"
+    )
+
+
+def _write_archive(rows_by_month: Dict[str, List[dict]], first_id: int, last_id: int) -> None:
+    """Write one batch to a file per month, named by the batch's id range
+
+    Files are replaced rather than appended to, so a batch archived again
+    after an interrupted run overwrites its earlier copy.
+    """
+    os.makedirs(settings.NOTIFICATION_ARCHIVE_DIR, exist_ok=True)
+    for month, rows in rows_by_month.items():
+        path = _archive_path(month, first_id, last_id)
+        with gzip.open(f"{path}.tmp", "wt", encoding="utf-8") as archive:
+            for row in rows:
+                archive.write(json.dumps(row, default=str, separators=(",", ":")))
+                archive.write("\n")
+        os.replace(f"{path}.tmp", path)
+
+
+async def archive_notifications(
+    db: AsyncSession,
+    before: Optional[datetime] = None,
+    batch_size: Optional[int] = None
+) -> int:
+    """Move notifications created before the cutoff into the archive
+
+    Rows are processed in primary-key order, one batch per transaction, so
+    the job holds no long-lived locks and can be interrupted safely: a
+    batch is only deleted after it has been written to disk, and writing
+    it again replaces the earlier file.
+    """
+    if before is None:
+        before = datetime.utcnow() - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS)
+    batch_size = batch_size or settings.NOTIFICATION_ARCHIVE_BATCH_SIZE
+    columns = [getattr(Notification, name) for name in ARCHIVE_COLUMNS]
+
+    archived = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(*columns)
+            .where(Notification.created_at < before, Notification.id > last_id)
+            .order_by(Notification.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+
+        rows_by_month: Dict[str, List[dict]] = {}
+        unread: Counter = Counter()
+        for row in rows:
+            record = dict(zip(ARCHIVE_COLUMNS, row))
+            month = record["created_at"].strftime("%Y-%m") if record["created_at"] else "unknown"
+            rows_by_month.setdefault(month, []).append(record)
+            if not record["is_read"]:
+                unread[record["user_id"]] += 1
+
+        first_id, max_id = rows[0].id, rows[-1].id
+        await asyncio.to_thread(_write_archive, rows_by_month, first_id, max_id)
+
+        # The id window holds exactly the rows just read, however large the
+        # batch; no bound parameter per row
+        await db.execute(delete(Notification).where(
+            Notification.id > last_id,
+            Notification.id <= max_id,
+            Notification.created_at < before,
+        ))
+        # Unread rows leave the badge count with them, in the same transaction
+        if unread:
+            await db.execute(unread_decrement_stmt(db.get_bind().dialect.name), [
+                {"counter_user_id": user_id, "unread": count} for user_id, count in unread.items()
+            ])
+        await db.commit()
+
+        archived += len(rows)
+        last_id = max_id
+        if len(rows) < batch_size:
+            break
+
+    if archived:
+        logger.info(f"Archived {archived} notifications created before {before.isoformat()}")
+    return archived
+
+
+async def run_notification_compaction():
+    """Archive expired notification history"""
+    async with get_async_session() as db:
+        try:
+            await archive_notifications(db)
+        except Exception as e:
+            logger.error(f"Error archiving notifications: {str(e)}")
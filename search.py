@@ -0,0 +1,32 @@
+"""
+Product search endpoint
+"""
+
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user
+from app.config import settings
+from app.database.session import get_db
+from app.models.user import User
+from app.schemas.product import ProductResponse
+from app.services.search_index import search_products
+
+router = APIRouter()
+
+
+@router.get("/products/search", response_model=List[ProductResponse])
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(settings.SEARCH_DEFAULT_LIMIT, ge=1, le=settings.SEARCH_MAX_LIMIT),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Search the current user's products as they type, tolerating typos
+
+    Matches name, shop, notes and barcode; the most urgent products come
+    first.
+    """
+    return search_products(db, current_user.id, q, limit)
@@ -0,0 +1,302 @@
+"""
+Product search: prefix and typo-tolerant matching over name, shop, notes
+and barcode
+
+SQLite uses an FTS5 table with external content, kept in sync with
+products by triggers; PostgreSQL uses a pg_trgm GIN index over the same
+columns, which the database maintains itself. Either way every write path
+(API, bulk import, scripts) keeps the index current.
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import DDL, and_, event, literal, literal_column, or_, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import column, table
+
+from app.config import settings
+from app.models.product import Product
+from app.utils.cache import LocalCache
+
+SEARCH_COLUMNS = ("name", "shop_name", "notes", "barcode")
+
+# Columns holding words, as opposed to the numeric barcode
+TEXT_COLUMNS = ("name", "shop_name", "notes")
+
+# user_id is indexed as a token so a user's matches are intersected inside
+# the index instead of filtered afterwards
+SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        user_id, {", ".join(SEARCH_COLUMNS)},
+        content='products', content_rowid='id', prefix='2 3'
+    )""",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts_vocab USING fts5vocab(products_fts, 'row')",
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, user_id, {", ".join(SEARCH_COLUMNS)})
+        VALUES (new.id, new.user_id, {", ".join(f"new.{c}" for c in SEARCH_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, user_id, {", ".join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, old.user_id, {", ".join(f"old.{c}" for c in SEARCH_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_fts_update
+    AFTER UPDATE OF user_id, {", ".join(SEARCH_COLUMNS)} ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, user_id, {", ".join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, old.user_id, {", ".join(f"old.{c}" for c in SEARCH_COLUMNS)});
+        INSERT INTO products_fts(rowid, user_id, {", ".join(SEARCH_COLUMNS)})
+        VALUES (new.id, new.user_id, {", ".join(f"new.{c}" for c in SEARCH_COLUMNS)});
+    END""",
+]
+
+POSTGRES_DOCUMENT = "lower(" + " || ' ' || ".join(f"coalesce({c}, '')" for c in SEARCH_COLUMNS) + ")"
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_products_search_trgm ON products USING gin (({POSTGRES_DOCUMENT}) gin_trgm_ops)",
+]
+
+for statement in SQLITE_DDL:
+    event.listen(Product.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in POSTGRES_DDL:
+    event.listen(Product.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+# Alphabetic index terms by first letter, for prefix expansion. A word
+# first indexed within the TTL matches once typed in full, and as a prefix
+# (or with typos, from the user vocabulary below) after the next refresh.
+vocabulary_cache = LocalCache("search_vocabulary", ttl=settings.SEARCH_VOCABULARY_SECONDS, maxsize=64)
+
+# Each user's own words by first letter, for typo correction: other users'
+# words would only crowd out the user's and cannot match their products
+user_vocabulary_cache = LocalCache(
+    "search_user_vocabulary", ttl=settings.SEARCH_VOCABULARY_SECONDS, maxsize=1024
+)
+
+
+@settings.on_reload
+def _update_vocabulary_ttl(changed):
+    vocabulary_cache.ttl = settings.SEARCH_VOCABULARY_SECONDS
+    user_vocabulary_cache.ttl = settings.SEARCH_VOCABULARY_SECONDS
+
+products_fts = table("products_fts", column("rowid"))
+
+# Letters and digits, like the FTS5 unicode61 tokenizer
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def create_search_index(connection: Connection) -> None:
+    """Create any missing search index objects and index existing products"""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+        )).first()
+        for statement in SQLITE_DDL:
+            connection.execute(text(statement))
+        if not exists:
+            # Index the products written before the triggers existed
+            connection.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        for statement in POSTGRES_DDL:
+            connection.execute(text(statement))
+
+
+def _words(value: str) -> List[str]:
+    """Split text the way the index does: lowercase words without accents"""
+    normalized = unicodedata.normalize("NFKD", value.lower())
+    stripped = "".join(c for c in normalized if not unicodedata.combining(c))
+    return _TOKEN.findall(stripped)
+
+
+def tokenize(query: str) -> List[str]:
+    """The words of a query, up to SEARCH_MAX_TERMS"""
+    return _words(query)[:settings.SEARCH_MAX_TERMS]
+
+
+def max_typos(token: str) -> int:
+    """Typos tolerated in a word: none for short words, numbers or barcodes"""
+    if len(token) < 4 or not token.isalpha():
+        return 0
+    return 1 if len(token) <= 6 else 2
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _vocabulary(db: Session, letter: str) -> List[str]:
+    """Sorted alphabetic index terms starting with a letter"""
+    terms = vocabulary_cache.get(letter)
+    if terms is None:
+        rows = db.execute(
+            text("SELECT term FROM products_fts_vocab WHERE term >= :start AND term < :end"),
+            {"start": letter, "end": chr(ord(letter) + 1)},
+        )
+        terms = [term for (term,) in rows if term.isalpha()]
+        vocabulary_cache.set(letter, terms)
+    return terms
+
+
+def completions(db: Session, token: str) -> Optional[List[str]]:
+    """Index terms the token is a prefix of, or None to let FTS5 expand it
+
+    FTS5 answers prefixes of the indexed lengths (up to 3 characters) from
+    its prefix index, but merges the whole doclist of every matching term
+    for longer ones, which costs milliseconds on common words. A short list
+    of exact terms is looked up by rowid instead.
+    """
+    if len(token) <= 3 or not token.isalpha():
+        return None
+    vocabulary = _vocabulary(db, token[0])
+    start = bisect_left(vocabulary, token)
+    end = bisect_left(vocabulary, token + "\uffff", start)
+    if end - start > settings.SEARCH_MAX_CORRECTIONS:
+        return None
+    return vocabulary[start:end]
+
+
+def _user_vocabulary(db: Session, user_id: int) -> Dict[str, List[str]]:
+    """Alphabetic words of a user's products, sorted and grouped by first letter"""
+    vocabulary = user_vocabulary_cache.get(user_id)
+    if vocabulary is None:
+        words = set()
+        rows = db.execute(
+            select(*(getattr(Product, name) for name in TEXT_COLUMNS)).where(Product.user_id == user_id)
+        )
+        for row in rows:
+            for value in row:
+                if value:
+                    words.update(word for word in _words(value) if word.isalpha())
+        grouped = defaultdict(list)
+        for word in sorted(words):
+            grouped[word[0]].append(word)
+        vocabulary = dict(grouped)
+        user_vocabulary_cache.set(user_id, vocabulary)
+    return vocabulary
+
+
+def corrections(db: Session, user_id: int, token: str) -> List[str]:
+    """The user's words within max_typos of the token, or of its typed-so-far prefix"""
+    limit = max_typos(token)
+    if not limit:
+        return []
+    matches = []
+    for term in _user_vocabulary(db, user_id).get(token[0], ()):
+        if len(term) < len(token) - limit:
+            # Too short to be within the limit
+            continue
+        if len(term) <= len(token) + limit:
+            distance = _edit_distance(token, term, limit)
+        else:
+            # As-you-type: "yigu" is a prefix typo of "yogurt"
+            distance = _edit_distance(token, term[:len(token)], limit)
+        if 0 < distance <= limit:
+            matches.append(term)
+    return matches[:settings.SEARCH_MAX_CORRECTIONS]
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _fts_match(user_id: int, alternatives: List[List[str]]) -> str:
+    """FTS5 query: the user's products matching one of the alternatives for every word
+
+    Each alternative is an index term; a trailing * marks a prefix for FTS5
+    to expand.
+    """
+    groups = []
+    for options in alternatives:
+        groups.append("(" + " OR ".join(
+            _quote(term[:-1]) + "*" if term.endswith("*") else _quote(term) for term in options
+        ) + ")")
+    columns = " ".join(SEARCH_COLUMNS)
+    return f'user_id:{_quote(str(user_id))} AND {{{columns}}}: ({" AND ".join(groups)})'
+
+
+def _urgency_order(query):
+    # Most urgent first: active products by expiry date, expired ones leading
+    return query.order_by(Product.is_active.desc(), Product.expiration_date, Product.id)
+
+
+def _prefix_alternatives(db: Session, token: str) -> List[str]:
+    terms = completions(db, token)
+    if terms is None:
+        return [token + "*"]
+    # The token itself covers a word first indexed after the vocabulary was cached
+    return [token] + [term for term in terms if term != token]
+
+
+def _search_sqlite(db: Session, user_id: int, alternatives: List[List[str]], limit: int,
+                   exclude: Tuple[int, ...] = ()) -> List[Product]:
+    query = (
+        select(Product)
+        .join(products_fts, products_fts.c.rowid == Product.id)
+        .where(literal_column("products_fts").op("MATCH")(_fts_match(user_id, alternatives)))
+    )
+    if exclude:
+        query = query.where(Product.id.notin_(exclude))
+    return list(db.scalars(_urgency_order(query).limit(limit)))
+
+
+def _search_postgresql(db: Session, user_id: int, tokens: List[str], limit: int) -> List[Product]:
+    document = literal_column(POSTGRES_DOCUMENT)
+    exact, conditions = [], []
+    for token in tokens:
+        contains = document.contains(token, autoescape=True)
+        exact.append(contains)
+        # word_similarity via the trigram index tolerates typos
+        conditions.append(or_(contains, literal(token).op("<%")(document)) if max_typos(token) else contains)
+    query = (
+        select(Product)
+        .where(Product.user_id == user_id, *conditions)
+        .order_by(and_(*exact).desc())
+    )
+    return list(db.scalars(_urgency_order(query).limit(limit)))
+
+
+def search_products(db: Session, user_id: int, query: str, limit: int) -> List[Product]:
+    """Find a user's products matching every word of the query
+
+    Each word matches as a prefix ("gre yog" finds "Greek Yogurt"). When
+    that finds fewer than limit products, words are also matched against
+    index terms within one or two typos and those products follow the exact
+    matches. Within each group the most urgent products come first.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+
+    if db.get_bind().dialect.name == "postgresql":
+        return _search_postgresql(db, user_id, tokens, limit)
+
+    prefixes = [_prefix_alternatives(db, token) for token in tokens]
+    results = _search_sqlite(db, user_id, prefixes, limit)
+    if len(results) < limit and any(max_typos(token) for token in tokens):
+        typos = [corrections(db, user_id, token) for token in tokens]
+        if any(typos):
+            alternatives = [options + terms for options, terms in zip(prefixes, typos)]
+            results += _search_sqlite(
+                db, user_id, alternatives, limit - len(results),
+                exclude=tuple(product.id for product in results)
+            )
+    return results
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Production launcher for the Food Expiration Tracker API
+
+Usage:
+    python serve.py [--workers N] [--host 0.0.0.0] [--port 8000] [--no-scheduler]
+
+The app is imported once by the supervisor and inherited by every worker
+through fork, so workers start instantly and share its code pages. All
+workers accept connections from one listening socket. The notification
+scheduler runs in a dedicated process, never inside a web worker.
+
+The supervisor relays messages between its children over local datagram
+sockets (cache invalidations and stream events, see app.utils.channel),
+restarts children that die and shuts everything down on SIGTERM/SIGINT.
+The scheduler serves its own metrics on SCHEDULER_METRICS_PORT.
+SIGHUP is forwarded to every child, which reloads its settings in place
+(see app.config).
+POSIX only; use `uvicorn app.main:app --reload` for development.
+"""
+
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import selectors
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+sys.path.append(str(Path(__file__).parent))
+
+from app.config import handle_reload_signal, settings
+
+logger = logging.getLogger("serve")
+
+WEB, SCHEDULER = "web", "scheduler"
+RESTART_DELAY_SECONDS = 1.0
+
+
+def default_workers() -> int:
+    """One worker per CPU core available to this process"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def load_app(target: str):
+    module_name, _, attribute = target.partition(":")
+    return getattr(importlib.import_module(module_name), attribute or "app")
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run(main) -> None:
+    try:
+        import uvloop
+        uvloop.run(main)
+    except ImportError:
+        asyncio.run(main)
+
+
+def run_web_worker(app, listener: socket.socket, channel_end: socket.socket) -> None:
+    import uvicorn
+
+    from app.database.session import engine
+    from app.utils import channel
+
+    # Pooled connections must never be shared with the parent
+    engine.dispose(close=False)
+
+    server = uvicorn.Server(uvicorn.Config(
+        app,
+        lifespan="on",
+        access_log=False,
+        log_config=None,
+        log_level=logging.getLevelName(logger.getEffectiveLevel()).lower(),
+    ))
+
+    async def serve():
+        channel.connect(channel_end)
+        await server.serve(sockets=[listener])
+
+    _run(serve())
+
+
+def run_scheduler(channel_end: socket.socket) -> None:
+    from app.database.session import engine
+    from app.utils import channel
+    from app.utils.metrics import start_metrics_server
+    from app.utils.notifications import start_notification_scheduler
+
+    engine.dispose(close=False)
+
+    # Sweep and send metrics are recorded here, not in the web workers
+    if settings.SCHEDULER_METRICS_PORT:
+        try:
+            start_metrics_server(settings.SCHEDULER_METRICS_HOST, settings.SCHEDULER_METRICS_PORT)
+        except OSError as e:
+            logger.error(f"Scheduler metrics not served on port {settings.SCHEDULER_METRICS_PORT}: {str(e)}")
+
+    async def schedule():
+        channel.connect(channel_end)
+        handle_reload_signal()
+        start_notification_scheduler()
+        await asyncio.Event().wait()
+
+    _run(schedule())
+
+
+class Supervisor:
+    """Forks the children, relays their channel messages and restarts them"""
+
+    def __init__(self, app, listener: socket.socket, workers: int, scheduler: bool,
+                 graceful_timeout: float):
+        self.app = app
+        self.listener = listener
+        self.roles = [WEB] * workers + ([SCHEDULER] if scheduler else [])
+        self.graceful_timeout = graceful_timeout
+        # pid -> (role, supervisor end of its channel, start time)
+        self.children: Dict[int, Tuple[str, socket.socket, float]] = {}
+        self.selector = selectors.DefaultSelector()
+        self.stopping = False
+        self.reload_requested = False
+
+    def spawn(self, role: str) -> None:
+        supervisor_end, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        pid = os.fork()
+        if pid == 0:
+            self._become_child(role, supervisor_end, child_end)
+        child_end.close()
+        supervisor_end.setblocking(False)
+        self.children[pid] = (role, supervisor_end, time.monotonic())
+        self.selector.register(supervisor_end, selectors.EVENT_READ, pid)
+        logger.info(f"Started {role} process {pid}")
+
+    def _become_child(self, role: str, supervisor_end: socket.socket, child_end: socket.socket) -> None:
+        # Ctrl-C reaches the whole process group; the supervisor turns it
+        # into SIGTERM so children stop in order
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        # Until the child's own handler is installed; by default SIGHUP kills
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        supervisor_end.close()
+        for _, sibling_end, _ in self.children.values():
+            sibling_end.close()
+        self.selector.close()
+
+        code = 0
+        try:
+            if role == WEB:
+                run_web_worker(self.app, self.listener, child_end)
+            else:
+                self.listener.close()
+                run_scheduler(child_end)
+        except BaseException:
+            logger.exception(f"{role} process failed")
+            code = 1
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def relay(self, source_pid: int, source: socket.socket) -> None:
+        """Pass every waiting message from one child to all the others"""
+        while True:
+            try:
+                message = source.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                return
+            for pid, (_, peer, _) in self.children.items():
+                if pid == source_pid:
+                    continue
+                try:
+                    peer.send(message)
+                except OSError as e:
+                    logger.warning(f"Dropped channel message for process {pid}: {str(e)}")
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0 or pid not in self.children:
+                return
+            role, supervisor_end, started_at = self.children.pop(pid)
+            self.selector.unregister(supervisor_end)
+            supervisor_end.close()
+            if self.stopping:
+                continue
+            logger.warning(f"{role} process {pid} exited with code {os.waitstatus_to_exitcode(status)}; restarting")
+            # Avoid a tight restart loop when a child fails on startup
+            if time.monotonic() - started_at < RESTART_DELAY_SECONDS:
+                time.sleep(RESTART_DELAY_SECONDS)
+            self.spawn(role)
+
+    def stop(self, signum=None, frame=None) -> None:
+        self.stopping = True
+
+    def request_reload(self, signum=None, frame=None) -> None:
+        self.reload_requested = True
+
+    def forward_reload(self) -> None:
+        """Have every child reload its settings"""
+        self.reload_requested = False
+        logger.info("Reloading settings in all processes")
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGHUP, self.request_reload)
+        for role in self.roles:
+            self.spawn(role)
+
+        while not self.stopping:
+            for key, _ in self.selector.select(timeout=1.0):
+                self.relay(key.data, key.fileobj)
+            self.reap()
+            if self.reload_requested:
+                self.forward_reload()
+
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        logger.info("Shutting down")
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in self.children:
+            logger.warning(f"Killing process {pid} after {self.graceful_timeout}s")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app", default="app.main:app", help="ASGI app to serve (module:attribute)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.WEB_CONCURRENCY or default_workers())
+    parser.add_argument("--no-scheduler", dest="scheduler", action="store_false",
+                        help="Do not run the notification scheduler (e.g. on all but one host)")
+    parser.add_argument("--graceful-timeout", type=float, default=settings.WORKER_GRACEFUL_TIMEOUT)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format="%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s",
+    )
+
+    from app.services import events
+
+    # Stream events reach clients connected to any worker
+    events.set_broker(events.ChannelEventBroker(queue_size=settings.STREAM_QUEUE_SIZE))
+
+    # Preload everything the children run before forking
+    importlib.import_module("uvicorn")
+    app = load_app(args.app)
+    if args.scheduler:
+        importlib.import_module("app.utils.notifications")
+
+    listener = bind_socket(args.host, args.port)
+    logger.info(f"Listening on {args.host}:{args.port} with {args.workers} workers"
+                f"{' and the scheduler' if args.scheduler else ''}")
+    Supervisor(app, listener, args.workers, args.scheduler, args.graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    main()
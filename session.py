@@ -2,17 +2,67 @@
 Database session management for the Food Expiration Tracker application
 """
 
-from sqlalchemy import create_engine, MetaData
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event, MetaData
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.utils import metrics, profiling
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """create_engine() arguments for the configured pool"""
+    url = make_url(url)
+    options: Dict[str, Any] = {"echo": settings.SQL_ECHO, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}  # Required for SQLite
+        if url.database in (None, "", ":memory:"):
+            # One shared connection; there is no pool to size
+            return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def sqlite_pragmas() -> Dict[str, Any]:
+    """PRAGMA statements from the SQLITE_* settings, skipping those left unset"""
+    pragmas = {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        # Negative sizes are in KiB rather than pages
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KB if settings.SQLITE_CACHE_SIZE_KB else 0,
+        "mmap_size": settings.SQLITE_MMAP_SIZE_MB * 1024 * 1024,
+    }
+    return {name: value for name, value in pragmas.items() if value}
+
+
+def apply_sqlite_pragmas(engine) -> None:
+    """Run the configured pragmas on every new connection of a SQLite engine"""
+    engine = getattr(engine, "sync_engine", engine)
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
 
 # Create sync engine for SQLite
-engine = create_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    connect_args={"check_same_thread": False}  # Required for SQLite
-)
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+apply_sqlite_pragmas(engine)
+metrics.instrument_engine(engine)
+profiling.instrument_engine(engine)
 
 # Create session factory
 SessionLocal = sessionmaker(
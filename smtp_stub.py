@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Local SMTP sink for development and benchmarks
+
+Accepts every message and discards it. It does not offer STARTTLS or
+AUTH, so point the app at it with SMTP_USE_TLS=false and no
+SMTP_USERNAME.
+
+Usage:
+    python smtp_stub.py --port 2525
+    SMTP_SERVER=127.0.0.1 SMTP_PORT=2525 SMTP_USE_TLS=false uvicorn app.main:app
+"""
+
+import argparse
+import socketserver
+import threading
+from typing import Tuple
+
+
+class SMTPStubHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP dialogue: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 smtp-stub ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().upper()
+
+            if command.startswith("EHLO"):
+                self.wfile.write(b"250-smtp-stub\r\n250-8BITMIME\r\n250 SIZE 52428800\r\n")
+            elif command.startswith(("HELO", "MAIL", "RCPT", "RSET", "NOOP")):
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                for data_line in iter(self.rfile.readline, b""):
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                self.server.messages_received += 1
+                self.reply("250 OK: queued")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPStubServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    messages_received = 0
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0) -> Tuple[SMTPStubServer, int]:
+    """Start the sink in a background thread; returns the server and its port"""
+    server = SMTPStubServer((host, port), SMTPStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SMTP sink")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    args = parser.parse_args()
+
+    server = SMTPStubServer((args.host, args.port), SMTPStubHandler)
+    print(f"SMTP stub listening on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
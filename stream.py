@@ -0,0 +1,83 @@
+"""
+Server-Sent Events stream of product and notification changes
+"""
+
+import asyncio
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import get_user_from_token
+from app.config import settings
+from app.database.session import SessionLocal
+from app.services import events
+
+router = APIRouter()
+
+HEARTBEAT = ": ping\n\n"
+
+
+def _authenticate(token: str) -> int:
+    """Resolve the token to a user ID without holding a session open"""
+    db = SessionLocal()
+    try:
+        return get_user_from_token(db, token).id
+    finally:
+        db.close()
+
+
+async def _event_stream(request: Request, subscription: events.Subscription) -> AsyncIterator[str]:
+    """Yield queued events, sending a heartbeat while the connection is idle"""
+    try:
+        yield f"retry: {settings.STREAM_RETRY_MS}\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    subscription.queue.get(),
+                    timeout=settings.STREAM_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield HEARTBEAT
+                continue
+            yield message
+    finally:
+        events.broker.unsubscribe(subscription)
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    token: Optional[str] = Query(None, description="Access token (EventSource cannot send headers)"),
+    authorization: Optional[str] = Header(None)
+):
+    """Stream product-changed and notification-created events for the current user"""
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    user_id = await asyncio.to_thread(_authenticate, token)
+
+    if events.broker.connection_count >= settings.STREAM_MAX_CONNECTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many open streams",
+            headers={"Retry-After": str(settings.STREAM_HEARTBEAT_SECONDS)},
+        )
+
+    subscription = events.broker.subscribe(user_id)
+    return StreamingResponse(
+        _event_stream(request, subscription),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )